@@ -0,0 +1,435 @@
+"""
+Columnar archive of historical verification results
+Compacts old rows out of the hot table into memory-mapped segment files
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, VerificationRecord
+
+# Columns stored through a per-segment dictionary (small uint codes)
+ENUM_COLUMNS = ("file_type", "ai_classification", "blockchain_uploader")
+# Columns stored as float32 with NaN for missing values
+FLOAT_COLUMNS = ("ai_confidence", "fake_probability", "real_probability")
+# Free-text columns stored as a UTF-8 blob plus offsets
+TEXT_COLUMNS = ("file_name", "perceptual_hash")
+
+MISSING_CODE = np.iinfo(np.uint32).max
+# created_at is stored as naive-UTC seconds since this instant
+EPOCH = datetime(1970, 1, 1)
+
+
+class ArchiveSegment:
+    """
+    One immutable, hash-sorted segment
+
+    Files inside the segment directory:
+        hashes.npy              S32 raw SHA-256 digests, sorted
+        <enum>.npy              uint32 dictionary codes (MISSING_CODE = NULL)
+        <float>.npy             float32 (NaN = NULL)
+        <text>.bin/.idx/.null   UTF-8 blob, int64 end offsets, NULL mask
+        id, created_at,
+        blockchain_timestamp    int64 (-1 = NULL; created_at in epoch seconds)
+        blockchain_verified     bool
+        meta.json               enum dictionaries and row count
+
+    Every file is mapped when the segment is opened, so a segment that a
+    merge in another process deletes stays readable here until dropped.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        with open(directory / "meta.json", "r") as f:
+            self.meta = json.load(f)
+        self.hashes = np.load(directory / "hashes.npy", mmap_mode="r")
+        names = ["id", "created_at", "blockchain_timestamp", "blockchain_verified", *ENUM_COLUMNS, *FLOAT_COLUMNS]
+        for name in TEXT_COLUMNS:
+            names += [f"{name}.idx", f"{name}.null"]
+        self.columns = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in names}
+        self.blobs = {}
+        for name in TEXT_COLUMNS:
+            path = directory / f"{name}.bin"
+            self.blobs[name] = np.memmap(path, dtype=np.uint8, mode="r") \
+                if os.path.getsize(path) else np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def _column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def _text(self, name: str, row: int) -> Optional[str]:
+        if self._column(f"{name}.null")[row]:
+            return None
+        offsets = self._column(f"{name}.idx")
+        start = int(offsets[row - 1]) if row else 0
+        return bytes(self.blobs[name][start:int(offsets[row])]).decode("utf-8")
+
+    def _text_bounds(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Start and end offset of every row's value in the column's blob"""
+        ends = np.asarray(self._column(f"{name}.idx"))
+        starts = np.concatenate(([0], ends[:-1])).astype(np.int64)
+        return starts, ends
+
+    def find(self, digest: bytes) -> Optional[int]:
+        """Binary-search the sorted hash column; returns the row or None"""
+        row = int(np.searchsorted(self.hashes, digest))
+        if row < len(self.hashes) and self.hashes[row].ljust(32, b"\0") == digest:
+            return row
+        return None
+
+    def record(self, row: int) -> VerificationRecord:
+        """Materialize a transient VerificationRecord for one row"""
+        values = {
+            "media_hash": self.hashes[row].ljust(32, b"\0").hex(),
+            "id": int(self._column("id")[row]),
+            "blockchain_verified": bool(self._column("blockchain_verified")[row]),
+            "created_at": EPOCH + timedelta(seconds=int(self._column("created_at")[row])),
+        }
+        timestamp = int(self._column("blockchain_timestamp")[row])
+        values["blockchain_timestamp"] = None if timestamp < 0 else timestamp
+        for name in ENUM_COLUMNS:
+            code = int(self._column(name)[row])
+            values[name] = None if code == MISSING_CODE else self.meta["dictionaries"][name][code]
+        for name in FLOAT_COLUMNS:
+            value = float(self._column(name)[row])
+            values[name] = None if np.isnan(value) else round(value, 2)
+        for name in TEXT_COLUMNS:
+            values[name] = self._text(name, row)
+        return VerificationRecord(**values)
+
+    def counts(self) -> Counter:
+        """Row counts grouped by (file_type, ai_classification, blockchain_verified)"""
+        dictionaries = self.meta["dictionaries"]
+        # One integer per row packing the three codes, grouped by np.unique
+        keys = (
+            (np.asarray(self._column("file_type"), dtype=np.uint64) << np.uint64(33))
+            | (np.asarray(self._column("ai_classification"), dtype=np.uint64) << np.uint64(1))
+            | np.asarray(self._column("blockchain_verified"), dtype=np.uint64)
+        )
+        counts = Counter()
+        for key, count in zip(*np.unique(keys, return_counts=True)):
+            key = int(key)
+            file_code, class_code, verified = key >> 33, (key >> 1) & 0xFFFFFFFF, bool(key & 1)
+            classification = None if class_code == MISSING_CODE else dictionaries["ai_classification"][class_code]
+            counts[(dictionaries["file_type"][file_code], classification, verified)] += int(count)
+        return counts
+
+    def perceptual_hashes(self) -> Iterator[Tuple[str, str, str]]:
+        """(media_hash, file_type, perceptual_hash) of AI-classified rows with a fingerprint"""
+        starts, ends = self._text_bounds("perceptual_hash")
+        rows = np.flatnonzero(
+            ~np.asarray(self._column("perceptual_hash.null"))
+            & (np.asarray(self._column("ai_classification")) != MISSING_CODE)
+            & (ends > starts)
+        )
+        if len(rows) == 0:
+            return
+        file_types = self.meta["dictionaries"]["file_type"]
+        file_codes = np.asarray(self._column("file_type"))[rows]
+        blob = bytes(self.blobs["perceptual_hash"])
+        hashes = np.asarray(self.hashes)[rows]
+        for digest, file_code, start, end in zip(hashes, file_codes, starts[rows], ends[rows]):
+            yield digest.ljust(32, b"\0").hex(), file_types[file_code], blob[start:end].decode("ascii")
+
+    @staticmethod
+    def write(directory: Path, records: List[VerificationRecord]):
+        """Write records (any order) as a new segment directory, atomically"""
+        records = sorted(records, key=lambda r: r.media_hash)
+        tmp = directory.with_name(directory.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        np.save(tmp / "hashes.npy", np.array([bytes.fromhex(r.media_hash) for r in records], dtype="S32"))
+        np.save(tmp / "id.npy", np.array([r.id for r in records], dtype=np.int64))
+        np.save(tmp / "blockchain_verified.npy", np.array([bool(r.blockchain_verified) for r in records]))
+        np.save(tmp / "created_at.npy", np.array(
+            [int(((r.created_at or datetime.utcnow()) - EPOCH).total_seconds()) for r in records], dtype=np.int64
+        ))
+        np.save(tmp / "blockchain_timestamp.npy", np.array(
+            [-1 if r.blockchain_timestamp is None else r.blockchain_timestamp for r in records], dtype=np.int64
+        ))
+
+        dictionaries: Dict[str, List[str]] = {}
+        for name in ENUM_COLUMNS:
+            values = [getattr(r, name) for r in records]
+            dictionary = sorted({v for v in values if v is not None})
+            codes = {v: i for i, v in enumerate(dictionary)}
+            dictionaries[name] = dictionary
+            np.save(tmp / f"{name}.npy", np.array(
+                [MISSING_CODE if v is None else codes[v] for v in values], dtype=np.uint32
+            ))
+
+        for name in FLOAT_COLUMNS:
+            np.save(tmp / f"{name}.npy", np.array(
+                [np.nan if getattr(r, name) is None else getattr(r, name) for r in records], dtype=np.float32
+            ))
+
+        for name in TEXT_COLUMNS:
+            values = [getattr(r, name) for r in records]
+            encoded = [(v or "").encode("utf-8") for v in values]
+            with open(tmp / f"{name}.bin", "wb") as blob:
+                for data in encoded:
+                    blob.write(data)
+            np.save(tmp / f"{name}.idx.npy", np.cumsum([len(data) for data in encoded], dtype=np.int64))
+            np.save(tmp / f"{name}.null.npy", np.array([v is None for v in values]))
+
+        with open(tmp / "meta.json", "w") as f:
+            json.dump({"rows": len(records), "dictionaries": dictionaries,
+                       "created": datetime.utcnow().isoformat()}, f)
+
+        os.replace(tmp, directory)
+
+    @staticmethod
+    def merge(directory: Path, segments: List["ArchiveSegment"]):
+        """
+        Write the rows of several segments as one new segment, atomically
+
+        Works on the column arrays; rows are never materialized. A hash
+        present in more than one segment keeps the row of the latest
+        segment in `segments`.
+        """
+        tmp = directory.with_name(directory.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        newest_first = list(reversed(segments))
+        hashes = np.concatenate([np.asarray(segment.hashes) for segment in newest_first])
+        order = np.argsort(hashes, kind="stable")
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = hashes[order][1:] != hashes[order][:-1]
+        order = order[keep]
+        np.save(tmp / "hashes.npy", hashes[order])
+
+        def concat(name):
+            return np.concatenate([np.asarray(segment._column(name)) for segment in newest_first])
+
+        for name in ("id", "created_at", "blockchain_timestamp", "blockchain_verified", *FLOAT_COLUMNS):
+            np.save(tmp / f"{name}.npy", concat(name)[order])
+
+        dictionaries: Dict[str, List[str]] = {}
+        for name in ENUM_COLUMNS:
+            dictionary = sorted({v for segment in segments for v in segment.meta["dictionaries"][name]})
+            codes = {v: i for i, v in enumerate(dictionary)}
+            dictionaries[name] = dictionary
+            remapped = []
+            for segment in newest_first:
+                column = np.asarray(segment._column(name))
+                mapping = np.array([codes[v] for v in segment.meta["dictionaries"][name]], dtype=np.uint32)
+                out = np.full(len(column), MISSING_CODE, dtype=np.uint32)
+                present = column != MISSING_CODE
+                out[present] = mapping[column[present]]
+                remapped.append(out)
+            np.save(tmp / f"{name}.npy", np.concatenate(remapped)[order])
+
+        for name in TEXT_COLUMNS:
+            blob = np.concatenate([np.asarray(segment.blobs[name]) for segment in newest_first])
+            starts, ends, base = [], [], 0
+            for segment in newest_first:
+                segment_starts, segment_ends = segment._text_bounds(name)
+                starts.append(segment_starts + base)
+                ends.append(segment_ends + base)
+                base += len(segment.blobs[name])
+            starts = np.concatenate(starts)[order]
+            lengths = np.concatenate(ends)[order] - starts
+            new_ends = np.cumsum(lengths, dtype=np.int64)
+            # Byte i of the new blob comes from its row's start plus its offset in the row
+            gather = np.repeat(starts - (new_ends - lengths), lengths) + np.arange(int(new_ends[-1]) if len(new_ends) else 0)
+            with open(tmp / f"{name}.bin", "wb") as f:
+                f.write(blob[gather].tobytes())
+            np.save(tmp / f"{name}.idx.npy", new_ends)
+            np.save(tmp / f"{name}.null.npy", concat(f"{name}.null")[order])
+
+        with open(tmp / "meta.json", "w") as f:
+            json.dump({"rows": int(len(order)), "dictionaries": dictionaries,
+                       "created": datetime.utcnow().isoformat()}, f)
+
+        os.replace(tmp, directory)
+
+
+class ColumnarArchive:
+    """
+    Archival tier for verification records
+
+    compact() moves rows older than a cutoff from the hot table into a new
+    segment and merges the segments once there are more than
+    `max_segments`; find() answers hash lookups from all segments, newest
+    first.
+
+    `segments` is never modified in place: refresh() and compact() build
+    a new sorted list and swap it in, so readers iterate a consistent
+    snapshot without locking.
+    """
+
+    def __init__(self, directory: str, max_segments: int = 8):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.segments: List[ArchiveSegment] = []
+        self.directory_mtime = None
+        self.refresh()
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def refresh(self):
+        """Pick up segments added or merged away since the last call (e.g. by another worker)"""
+        mtime = os.path.getmtime(self.directory)
+        if mtime == self.directory_mtime:
+            return
+        with self.refresh_lock:
+            if mtime == self.directory_mtime:
+                return
+
+            known = {segment.directory.name: segment for segment in self.segments}
+            segments = []
+            for path in sorted(self.directory.glob("segment-*")):
+                if not path.is_dir() or path.name.endswith(".tmp"):
+                    continue
+                segment = known.get(path.name)
+                if segment is None:
+                    try:
+                        segment = ArchiveSegment(path)
+                    except FileNotFoundError:
+                        continue  # merged away while we listed the directory
+                segments.append(segment)
+            self.segments = segments
+            self.directory_mtime = mtime
+
+    def _swap(self, add: List[ArchiveSegment] = (), remove: List[ArchiveSegment] = ()):
+        with self.refresh_lock:
+            removed = {id(segment) for segment in remove}
+            self.segments = sorted(
+                [segment for segment in self.segments if id(segment) not in removed] + list(add),
+                key=lambda segment: segment.directory.name
+            )
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    def find(self, media_hash: str) -> Optional[VerificationRecord]:
+        """Look up an archived record by hex media hash"""
+        try:
+            digest = bytes.fromhex(media_hash)
+        except ValueError:
+            return None
+        if len(digest) != 32:
+            return None
+
+        self.refresh()
+        for segment in reversed(self.segments):
+            row = segment.find(digest)
+            if row is not None:
+                return segment.record(row)
+        return None
+
+    def counts(self) -> Counter:
+        """Row counts grouped like StatsAggregator.seed()"""
+        counts = Counter()
+        for segment in self.segments:
+            counts.update(segment.counts())
+        return counts
+
+    def iter_perceptual_hashes(self) -> Iterator[Tuple[str, str, str]]:
+        """Yield (media_hash, file_type, perceptual_hash) for AI-classified rows"""
+        for segment in self.segments:
+            yield from segment.perceptual_hashes()
+
+    def compact(self, db: Session, older_than: timedelta, max_rows: int = 1_000_000) -> int:
+        """
+        Move old rows from the hot table into a new segment
+
+        The segment is fully written and renamed into place before any row
+        is deleted, so a crash leaves at worst a row present in both tiers.
+
+        Args:
+            db: Database session
+            older_than: Archive rows created before now - older_than
+            max_rows: Upper bound on rows moved in one run
+
+        Returns:
+            Number of rows archived
+        """
+        cutoff = datetime.utcnow() - older_than
+        with self.lock, open(self.directory / ".compact.lock", "a") as lock_file:
+            # Only one worker process compacts at a time; others skip the run
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+            self.refresh()
+
+            records = db.query(VerificationRecord).filter(
+                VerificationRecord.created_at < cutoff
+            ).order_by(VerificationRecord.created_at).limit(max_rows).all()
+            if not records:
+                return 0
+
+            # Rows left behind by an interrupted run are already archived
+            fresh = [r for r in records if self.find(r.media_hash) is None]
+            if fresh:
+                path = self.directory / f"segment-{int(time.time() * 1000):015d}"
+                ArchiveSegment.write(path, fresh)
+                self._swap(add=[ArchiveSegment(path)])
+
+            ids = [r.id for r in records]
+            db.expunge_all()
+            for start in range(0, len(ids), 5000):
+                db.query(VerificationRecord).filter(
+                    VerificationRecord.id.in_(ids[start:start + 5000])
+                ).delete(synchronize_session=False)
+            db.commit()
+
+            if len(self.segments) > self.max_segments:
+                self._merge_all()
+            return len(fresh)
+
+    def _merge_all(self):
+        """Replace all segments by one; call with the compaction lock held"""
+        segments = list(self.segments)
+        # Sorts right after the newest merged segment and before any later one
+        path = self.directory / f"{segments[-1].directory.name}-{len(segments)}"
+        ArchiveSegment.merge(path, segments)
+        self._swap(add=[ArchiveSegment(path)], remove=segments)
+        for segment in segments:
+            shutil.rmtree(segment.directory, ignore_errors=True)
+        print(f"🗄️ Merged {len(segments)} archive segments")
+
+    def start_periodic(self, older_than: timedelta, interval: float, session_factory=SessionLocal):
+        """Run compact() every `interval` seconds on a background thread"""
+        if self.thread:
+            return
+
+        def run():
+            while not self.stop_event.wait(interval):
+                db = session_factory()
+                try:
+                    archived = self.compact(db, older_than)
+                    if archived:
+                        print(f"🗄️ Archived {archived} verification records")
+                except Exception as e:
+                    db.rollback()
+                    print(f"⚠ Archive compaction failed: {e}")
+                finally:
+                    db.close()
+
+        self.thread = threading.Thread(target=run, name="archive-compaction", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,98 @@
+"""
+Verification history queries
+Keyset (cursor) pagination and streaming export over verification records
+"""
+
+import base64
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from .database import VerificationRecord
+
+
+def encode_cursor(record: VerificationRecord) -> str:
+    """Opaque cursor pointing just after the given record"""
+    raw = f"{record.created_at.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Parse a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(record_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def history_query(db: Session,
+                  cursor: Optional[str] = None,
+                  file_type: Optional[str] = None,
+                  ai_classification: Optional[str] = None,
+                  blockchain_verified: Optional[bool] = None,
+                  since: Optional[datetime] = None,
+                  until: Optional[datetime] = None):
+    """
+    Build a newest-first history query
+
+    Ordering is on (created_at, id) so the composite indexes serve both
+    the filter and the sort, and a cursor resumes with a range seek
+    instead of an OFFSET scan.
+    """
+    query = db.query(VerificationRecord)
+
+    if file_type is not None:
+        query = query.filter(VerificationRecord.file_type == file_type)
+    if ai_classification is not None:
+        query = query.filter(VerificationRecord.ai_classification == ai_classification)
+    if blockchain_verified is not None:
+        query = query.filter(VerificationRecord.blockchain_verified == blockchain_verified)
+    if since is not None:
+        query = query.filter(VerificationRecord.created_at >= since)
+    if until is not None:
+        query = query.filter(VerificationRecord.created_at < until)
+
+    if cursor:
+        created_at, record_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            VerificationRecord.created_at < created_at,
+            and_(VerificationRecord.created_at == created_at, VerificationRecord.id < record_id)
+        ))
+
+    return query.order_by(VerificationRecord.created_at.desc(), VerificationRecord.id.desc())
+
+
+def get_history_page(db: Session, limit: int = 10, **filters) -> Tuple[List[VerificationRecord], Optional[str]]:
+    """
+    Fetch one page of history
+
+    Returns:
+        (records, next_cursor) where next_cursor is None on the last page
+    """
+    records = history_query(db, **filters).limit(limit + 1).all()
+    next_cursor = encode_cursor(records[limit - 1]) if len(records) > limit else None
+    return records[:limit], next_cursor
+
+
+def iter_history(db: Session, chunk_size: int = 1000, **filters) -> Iterator[VerificationRecord]:
+    """
+    Stream every matching record, newest first
+
+    Walks the range in keyset chunks so no long-lived server cursor or
+    offset scan is needed, however large the range.
+    """
+    cursor = filters.pop("cursor", None)
+    while True:
+        records, cursor = get_history_page(db, limit=chunk_size, cursor=cursor, **filters)
+        yield from records
+        db.expunge_all()
+        if cursor is None:
+            return
@@ -0,0 +1,284 @@
+"""
+Write-behind persistence for verification records
+Buffers new records in memory and flushes them in bulk inserts
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from .database import SessionLocal, VerificationRecord
+
+
+class WriteBehindFull(Exception):
+    """Too many records are waiting to be written (the database is down or too slow)"""
+
+
+class WriteBehindBuffer:
+    """
+    Accumulates new VerificationRecords and writes them in batches
+
+    Records become visible to get() immediately and are inserted by a
+    background thread once `max_batch` records are pending or
+    `flush_interval` seconds have passed, one transaction per batch.
+    stop() performs a final synchronous flush so nothing is lost on a
+    clean shutdown. With enabled=False every add() is flushed inline.
+
+    A batch stays visible to get() and update() while it is being
+    written; updates made meanwhile are applied once it has committed.
+    If applying them fails, the batch stays in flight and the next flush
+    retries them before writing anything new.
+    At most `max_pending` records wait for the database, after which
+    add() raises WriteBehindFull.
+
+    Hooks run inside the writing transaction, so whatever they store
+    commits with the rows: `on_written(db, rows)` gets the values of the
+    rows actually inserted (not those another writer had already stored)
+    and `on_updated(db, before, changes)` each update applied to a
+    stored row.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = 200,
+                 flush_interval: float = 0.5, enabled: bool = True, max_pending: int = 10000,
+                 on_written: Optional[Callable[[Any, List[Dict[str, Any]]], None]] = None,
+                 on_updated: Optional[Callable[[Any, VerificationRecord, Dict[str, Any]], None]] = None):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self.on_written = on_written
+        self.on_updated = on_updated
+
+        self.pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Batch being written (as inserted), and changes made to it in the meantime
+        self.in_flight: Dict[str, Dict[str, Any]] = {}
+        self.late_updates: Dict[str, Dict[str, Any]] = {}
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+
+        # Metrics
+        self.flushed_records = 0
+        self.duplicate_records = 0
+        self.rejected_records = 0
+        self.flush_count = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        """Start the background flush thread"""
+        if not self.enabled or self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the flush thread and durably write everything still pending"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+        with self.condition:
+            unwritten, unapplied = len(self.pending), len(self.late_updates)
+        if unwritten or unapplied:
+            print(f"⚠ Write-behind stopped with {unwritten} records and {unapplied} updates unwritten")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.running and len(self.pending) < self.max_batch:
+                    self.condition.wait(self.flush_interval)
+                if not self.running:
+                    return
+            self.flush()
+
+    def add(self, **values) -> VerificationRecord:
+        """
+        Queue a new record for insertion
+
+        Args:
+            **values: VerificationRecord column values
+
+        Returns:
+            Transient VerificationRecord carrying the queued values
+
+        Raises:
+            WriteBehindFull when max_pending records are already waiting
+        """
+        values.setdefault("created_at", datetime.utcnow())
+        with self.condition:
+            if len(self.pending) >= self.max_pending and values["media_hash"] not in self.pending:
+                self.rejected_records += 1
+                raise WriteBehindFull(f"{len(self.pending)} records are waiting for the database")
+            self.pending[values["media_hash"]] = values
+            if len(self.pending) >= self.max_batch:
+                self.condition.notify()
+
+        if not self.enabled:
+            self.flush()
+        return VerificationRecord(**values)
+
+    def get(self, media_hash: str) -> Optional[VerificationRecord]:
+        """Return a not-yet-committed record, if any"""
+        with self.condition:
+            values = self.pending.get(media_hash)
+            if values is None and media_hash in self.in_flight:
+                values = dict(self.in_flight[media_hash], **self.late_updates.get(media_hash, {}))
+            return VerificationRecord(**values) if values else None
+
+    def update(self, media_hash: str, **changes) -> bool:
+        """
+        Apply changes to a not-yet-committed record
+
+        Returns:
+            True if the record was pending or being written and has been
+            updated (in the latter case once the batch commits)
+        """
+        with self.condition:
+            values = self.pending.get(media_hash)
+            if values is not None:
+                values.update(changes)
+                return True
+            if media_hash not in self.in_flight:
+                return False
+            self.late_updates.setdefault(media_hash, {}).update(changes)
+            return True
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def flush(self) -> int:
+        """
+        Insert all pending records
+
+        Returns:
+            Number of records written
+        """
+        with self.flush_lock:
+            # Updates left over from a failed attempt go first; while the
+            # database is unreachable nothing else is attempted
+            if self.in_flight and not self._apply_late_updates():
+                return 0
+
+            with self.condition:
+                if not self.pending:
+                    return 0
+                batch = list(self.pending.values())
+                self.in_flight = dict(self.pending)
+                self.pending.clear()
+
+            start = time.perf_counter()
+            try:
+                inserted = self._write(batch)
+            except Exception as e:
+                # Keep the rows for the next attempt; newer values win
+                print(f"⚠ Write-behind flush failed, will retry: {e}")
+                with self.condition:
+                    for values in batch:
+                        changes = self.late_updates.get(values["media_hash"], {})
+                        self.pending.setdefault(values["media_hash"], dict(values, **changes))
+                    self.in_flight, self.late_updates = {}, {}
+                return 0
+
+            self._apply_late_updates()
+
+            self.flushed_records += len(inserted)
+            self.duplicate_records += len(batch) - len(inserted)
+            self.flush_count += 1
+            self.last_flush_seconds = time.perf_counter() - start
+            return len(inserted)
+
+    def _apply_late_updates(self) -> bool:
+        """
+        Write changes made to the batch while it was committing, then release it
+
+        Returns:
+            False if the database rejected them; they stay queued (and the
+            batch in flight) for the next flush
+        """
+        while True:
+            with self.condition:
+                late, self.late_updates = self.late_updates, {}
+                if not late:
+                    self.in_flight = {}
+                    return True
+            db = self.session_factory()
+            try:
+                stored = {
+                    record.media_hash: record for record in db.query(VerificationRecord).filter(
+                        VerificationRecord.media_hash.in_(list(late))
+                    )
+                }
+                for media_hash, changes in late.items():
+                    if media_hash not in stored:
+                        continue
+                    if self.on_updated:
+                        self.on_updated(db, stored[media_hash], changes)
+                    db.execute(
+                        update(VerificationRecord)
+                        .where(VerificationRecord.media_hash == media_hash)
+                        .values(**changes)
+                    )
+                db.commit()
+            except Exception as e:
+                # The rows are stored; re-queue the changes for the next flush
+                print(f"⚠ Write-behind late update failed, will retry: {e}")
+                with self.condition:
+                    for media_hash, changes in late.items():
+                        # Changes made since this attempt started are newer
+                        self.late_updates[media_hash] = dict(changes, **self.late_updates.get(media_hash, {}))
+                return False
+            finally:
+                db.close()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert a batch and return the rows that were new"""
+        db = self.session_factory()
+        try:
+            try:
+                db.execute(insert(VerificationRecord), batch)
+                if self.on_written:
+                    self.on_written(db, batch)
+                db.commit()
+                return batch
+            except IntegrityError:
+                # Another writer already stored some of these hashes
+                db.rollback()
+
+            existing = {
+                media_hash for (media_hash,) in db.query(VerificationRecord.media_hash).filter(
+                    VerificationRecord.media_hash.in_([values["media_hash"] for values in batch])
+                )
+            }
+            fresh = [values for values in batch if values["media_hash"] not in existing]
+            if fresh:
+                db.execute(insert(VerificationRecord), fresh)
+                if self.on_written:
+                    self.on_written(db, fresh)
+            db.commit()
+            return fresh
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.pending),
+            "in_flight": len(self.in_flight),
+            "max_pending": self.max_pending,
+            "flushed_records": self.flushed_records,
+            "duplicate_records": self.duplicate_records,
+            "rejected_records": self.rejected_records,
+            "flush_count": self.flush_count,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+        }
@@ -1,21 +1,68 @@
 import os
-import shutil
+import json
+import asyncio
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from dotenv import load_dotenv
 
-from services.hash_service import HashService
-from services.blockchain_service import BlockchainService
-from services.ai_service import DeepfakeDetector
-from database.database import init_db, get_db, VerificationRecord
+if __name__ == "__main__":
+    # Started as a script: hand over to uvicorn or the pre-fork server,
+    # which import this file as "main". The app is never built in
+    # __main__, because processes started with spawn (video decoders,
+    # uvicorn's reloader) re-run the __main__ script before anything else.
+    import sys
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        # Pre-fork workers sharing one copy of the model weights
+        os.execv(sys.executable, [sys.executable, os.path.join(app_dir, "server.py")])
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "main:app", "--app-dir", app_dir,
+        "--host", "0.0.0.0", "--port", os.getenv("BACKEND_PORT", "8000"), "--reload"
+    ])
+
+from services.startup_timer import StartupTimer
+
+startup_timer = StartupTimer()
+
+with startup_timer.phase("imports"):
+    from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, StreamingResponse
+    from sqlalchemy.orm import Session
+    from dotenv import load_dotenv
+    
+    from services.hash_service import HashService
+    from services.blockchain_service import BlockchainService
+    from services.ai_service import DeepfakeDetector
+    from services.perceptual_hash_service import PerceptualHashService, NearDuplicateIndex
+    from services.vector_index import VectorIndexRegistry
+    from services.stats_service import StatsAggregator, CachedValue
+    from services.upload_store import UploadStore
+    from services.upload_sessions import UploadSessions, UploadSessionError
+    from services.feature_store import AGGREGATIONS, FeatureStore, is_media_hash, load_head, rescore
+    from services.cpu_scheduler import CPUScheduler
+    from services.single_flight import SingleFlight
+    from services.speculation import Speculation
+    from services.registry_mirror import RegistryMirror
+    from services.pipeline import Pipeline, PipelineContext, Stage
+    from services.admission_control import AdmissionController, AdmissionRejected, Ticket
+    from database.database import init_db, get_db, SessionLocal, VerificationRecord
+    from database.write_behind import WriteBehindBuffer, WriteBehindFull
+    from database.history import get_history_page, iter_history
+    from database.archive import ColumnarArchive
 
 # Load environment variables
 load_dotenv()
 
+# Fast start: load each model (and torch/OpenCV/librosa) on first use and
+# skip the blockchain connectivity check during startup. Weights then come
+# from MODEL_CACHE_DIR only (see models/weights.py), so a first request
+# never waits on a download
+FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Blockchain AI Deepfake Detection API",
@@ -35,24 +82,498 @@ app.add_middleware(
 # Initialize services
 hash_service = HashService()
 blockchain_service = BlockchainService()
-ai_detector = DeepfakeDetector(
-    confidence_threshold=float(os.getenv("CONFIDENCE_THRESHOLD", "0.7"))
+# Per-modality CPU lanes so concurrent inference calls don't oversubscribe cores
+cpu_scheduler = CPUScheduler.from_env()
+# Per-frame model outputs, for re-scoring without the media (/api/rescore)
+FEATURE_STORE_ENABLED = os.getenv("FEATURE_STORE_ENABLED", "true").lower() == "true"
+FEATURE_HEADS_DIR = Path(os.getenv("FEATURE_HEADS_DIR", "./model_cache/heads"))
+feature_store = FeatureStore(os.getenv("FEATURE_STORE_DIR", "./feature_store"))
+with startup_timer.phase("ai_models"):
+    ai_detector = DeepfakeDetector(
+        confidence_threshold=float(os.getenv("CONFIDENCE_THRESHOLD", "0.7")),
+        lazy=FAST_START,
+        scheduler=cpu_scheduler,
+        # Two-stage cascade: modalities with screening weights skip the full
+        # model unless the screening score lands in the escalation band
+        screening_model_paths={
+            "image": os.getenv("SCREEN_IMAGE_MODEL_PATH"),
+            "video": os.getenv("SCREEN_VIDEO_MODEL_PATH"),
+            "audio": os.getenv("SCREEN_AUDIO_MODEL_PATH"),
+        },
+        escalation_band=(
+            float(os.environ["CASCADE_BAND_LOW"]) if os.getenv("CASCADE_BAND_LOW") else None,
+            float(os.environ["CASCADE_BAND_HIGH"]) if os.getenv("CASCADE_BAND_HIGH") else None,
+        ),
+        escalation_margin=float(os.getenv("CASCADE_MARGIN", "0.1")),
+        # Spend the video frame budget on distinct scenes instead of a fixed interval
+        frame_selection=os.getenv("VIDEO_FRAME_SELECTION", "adaptive"),
+        scene_threshold=float(os.getenv("VIDEO_SCENE_THRESHOLD", "0.06")),
+        # Score a video's soundtrack alongside its frames (needs ffmpeg)
+        joint_audio=os.getenv("VIDEO_JOINT_AUDIO", "true").lower() == "true",
+        # Long videos are decoded in timeline segments by separate processes
+        decode_processes=int(os.getenv("VIDEO_DECODE_PROCESSES", "4")),
+        segment_min_frames=int(os.getenv("VIDEO_SEGMENT_MIN_FRAMES", "1500")),
+        frame_batch_size=int(os.getenv("VIDEO_FRAME_BATCH_SIZE", "16")),
+        keep_frame_outputs=FEATURE_STORE_ENABLED
+    )
+# Concurrent uploads of the same media wait on one analysis
+in_flight = SingleFlight()
+
+# Start AI analysis in /api/verify while the registry lookup is in flight
+speculation = Speculation(enabled=os.getenv("SPECULATIVE_VERIFY", "true").lower() == "true")
+
+# Per-modality concurrency budgets and bounded queues for analysis work
+admission = AdmissionController.from_env()
+near_duplicate_index = NearDuplicateIndex(
+    max_distance_ratio=float(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "0.15"))
 )
 
-# Create upload directory
+# Embedding index for similarity search over verified media
+EMBEDDING_INDEX_ENABLED = os.getenv("EMBEDDING_INDEX_ENABLED", "true").lower() == "true"
+vector_index = VectorIndexRegistry(os.getenv("VECTOR_INDEX_DIR", "./vector_index"))
+
+# Content-addressed upload staging
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
-UPLOAD_DIR.mkdir(exist_ok=True)
+upload_store = UploadStore(
+    UPLOAD_DIR,
+    retention_seconds=float(os.getenv("UPLOAD_RETENTION_SECONDS", "0"))
+)
+# Resumable chunked uploads; sessions live beside the store so finalize is a rename
+upload_sessions = UploadSessions(
+    UPLOAD_DIR / "sessions",
+    upload_store,
+    max_size=int(os.getenv("UPLOAD_MAX_BYTES", str(4 * 1024 ** 3))),
+    ttl_seconds=float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+)
 
 # Initialize database
-init_db()
+with startup_timer.phase("database"):
+    init_db()
+
+# Local copy of MediaRegistered events; registry reads only hit RPC while it lags
+REGISTRY_MIRROR_ENABLED = os.getenv("REGISTRY_MIRROR_ENABLED", "true").lower() == "true"
+registry_mirror = RegistryMirror(
+    blockchain_service,
+    SessionLocal,
+    start_block=int(os.getenv("REGISTRY_START_BLOCK", "0")),
+    reorg_depth=int(os.getenv("REGISTRY_REORG_DEPTH", "64")),
+    poll_interval=float(os.getenv("REGISTRY_POLL_INTERVAL", "5")),
+    max_staleness=float(os.getenv("REGISTRY_MAX_STALENESS", "30")),
+    lock_path=os.getenv("REGISTRY_MIRROR_LOCK", "./registry_mirror.lock")
+)
+if REGISTRY_MIRROR_ENABLED:
+    blockchain_service.mirror = registry_mirror
+
+# Statistics counters shared by all workers
+stats_aggregator = StatsAggregator()
+registry_stats = CachedValue(
+    blockchain_service.get_registry_stats,
+    refresh_interval=float(os.getenv("REGISTRY_STATS_REFRESH_INTERVAL", "60"))
+)
+
+# Batched persistence of new verification records; statistics count the
+# rows and updates in the transactions that write them
+write_buffer = WriteBehindBuffer(
+    max_batch=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5")),
+    enabled=os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true",
+    max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000")),
+    on_written=stats_aggregator.record_inserts,
+    on_updated=stats_aggregator.record_change
+)
+
+def save_record(**values) -> VerificationRecord:
+    """
+    Queue a new verification record
+    
+    Raises:
+        HTTPException 503 when the database has fallen too far behind
+    """
+    try:
+        return write_buffer.add(**values)
+    except WriteBehindFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+# Columnar archive for old records (ARCHIVE_AFTER_DAYS=0 disables compaction)
+archive = ColumnarArchive(os.getenv("ARCHIVE_DIR", "./archive"))
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+
+def get_record(db: Session, media_hash: str) -> Optional[VerificationRecord]:
+    """
+    Look up a record by hash across all tiers: records not yet flushed,
+    the hot table, then the columnar archive
+    """
+    record = write_buffer.get(media_hash)
+    if record is not None:
+        return record
+    
+    record = db.query(VerificationRecord).filter(
+        VerificationRecord.media_hash == media_hash
+    ).first()
+    if record is not None:
+        return record
+    
+    return archive.find(media_hash)
+
+async def get_record_or_lead(db: Session, media_hash: str) -> Optional[VerificationRecord]:
+    """
+    get_record(), but if the same media is being analyzed right now, wait
+    for that request and return the record it saved
+    
+    Returns None when the caller should run the analysis itself; it then
+    leads the flight for media_hash and must call in_flight.leave().
+    """
+    while True:
+        record = get_record(db, media_hash)
+        if record is not None or not await in_flight.join(media_hash):
+            return record
+
+def load_near_duplicate_index():
+    """Rebuild the perceptual hash index from AI-classified records"""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            VerificationRecord.media_hash,
+            VerificationRecord.file_type,
+            VerificationRecord.perceptual_hash
+        ).filter(
+            VerificationRecord.perceptual_hash != None,
+            VerificationRecord.ai_classification != None
+        ).yield_per(1000)
+        
+        for media_hash, file_type, perceptual_hash in rows:
+            near_duplicate_index.add(
+                file_type, PerceptualHashService.decode(perceptual_hash), media_hash
+            )
+    finally:
+        db.close()
+    
+    for media_hash, file_type, perceptual_hash in archive.iter_perceptual_hashes():
+        near_duplicate_index.add(
+            file_type, PerceptualHashService.decode(perceptual_hash), media_hash
+        )
+
+def find_near_duplicate(db: Session, media_type: str, perceptual_hashes):
+    """
+    Look up a previously AI-classified record that is a near-duplicate
+    
+    Returns:
+        (record, match) tuple, or None if there is no usable match
+    """
+    if not perceptual_hashes:
+        return None
+    
+    match = near_duplicate_index.find(media_type, perceptual_hashes)
+    if not match:
+        return None
+    
+    record = get_record(db, match["media_hash"])
+    if record is None or record.ai_classification is None:
+        return None
+    
+    return record, match
+
+def near_duplicate_response(source: VerificationRecord, match, media_hash: str,
+                            file_name: str, media_type: str, perceptual_hashes):
+    """Persist the prior verdict under the new hash and return it"""
+    print(f"♻️ Near-duplicate of {source.media_hash} (distance {match['distance']})")
+    record = save_record(
+        media_hash=media_hash,
+        file_name=file_name,
+        file_type=media_type,
+        blockchain_verified=False,
+        ai_classification=source.ai_classification,
+        ai_confidence=source.ai_confidence,
+        fake_probability=source.fake_probability,
+        real_probability=source.real_probability,
+        perceptual_hash=PerceptualHashService.encode(perceptual_hashes)
+    )
+    near_duplicate_index.add(media_type, perceptual_hashes, media_hash)
+    
+    return JSONResponse(content={
+        "success": True,
+        "cached": True,
+        "media_hash": media_hash,
+        "near_duplicate": match,
+        "verification": record.to_dict()
+    })
+
+async def admit(media_type: str, file_path) -> Optional[Ticket]:
+    """
+    Reserve analysis capacity for a staged upload
+    
+    Raises:
+        HTTPException 429 with Retry-After when the modality is saturated
+    """
+    cost = await asyncio.to_thread(admission.estimate_cost, str(file_path), media_type)
+    try:
+        return await admission.acquire(media_type, cost)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+
+# Verification pipeline stages
+#
+# Each stage reads and sets attributes on the PipelineContext:
+#   inputs    upload, file_name, db, media_type (None on /api/verify), specialized
+#   ingest    stored, file_path, media_hash (preset for finalized chunked uploads)
+#   registry  blockchain_result
+#   analysis  ticket, perceptual_hashes, ai_result, embedding (frame outputs go to the feature store)
+
+MEDIA_EXTENSIONS = {
+    "image": ('.jpg', '.jpeg', '.png', '.bmp', '.gif'),
+    "video": ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'),
+    "audio": ('.mp3', '.wav', '.m4a', '.flac', '.ogg', '.aac'),
+}
+
+def resolve_media_type(file_name: str, media_type: Optional[str] = None) -> str:
+    """Check the file extension against media_type, or infer the type from it"""
+    file_ext = Path(file_name).suffix.lower()
+    allowed = MEDIA_EXTENSIONS[media_type] if media_type else \
+        [ext for extensions in MEDIA_EXTENSIONS.values() for ext in extensions]
+    
+    if file_ext not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported {media_type or 'file'} type. Allowed: {', '.join(allowed)}"
+        )
+    
+    return media_type or next(m for m, extensions in MEDIA_EXTENSIONS.items() if file_ext in extensions)
+
+def ingest_stage(ctx):
+    """Validate the extension and stage the upload, hashing as it streams"""
+    ctx.media_type = resolve_media_type(ctx.file_name, ctx.media_type)
+    ctx.stored = upload_store.ingest(ctx.upload.file, Path(ctx.file_name).suffix.lower())
+    ctx.defer(upload_store.release, ctx.stored)
+    ctx.file_path, ctx.media_hash = ctx.stored.path, ctx.stored.media_hash
+    print(f"📝 Generated hash: {ctx.media_hash}")
+
+async def cache_stage(ctx):
+    """Answer from any record tier, waiting on an identical in-flight upload"""
+    ctx.defer(in_flight.leave, ctx.media_hash)
+    existing_record = await get_record_or_lead(ctx.db, ctx.media_hash)
+    
+    if existing_record:
+        print(f"📚 Found existing record in database")
+        ctx.finish(JSONResponse(content={
+            "success": True,
+            "cached": True,
+            "media_hash": ctx.media_hash,
+            "verification": existing_record.to_dict()
+        }))
+
+async def admit_stage(ctx):
+    ctx.ticket = await admit(ctx.media_type, ctx.file_path)
+    ctx.defer(admission.release, ctx.ticket)
+
+def fingerprint_stage(ctx):
+    ctx.perceptual_hashes = PerceptualHashService.generate(str(ctx.file_path), ctx.media_type)
+
+def near_duplicate_stage(ctx):
+    """Re-encoded copies of known media reuse the prior verdict (saved by persist)"""
+    ctx.near_duplicate = find_near_duplicate(ctx.db, ctx.media_type, ctx.perceptual_hashes)
+
+async def detect_stage(ctx):
+    print(f"🤖 Running {ctx.media_type} deepfake detection...")
+    ai_result = await ai_detector.detect_async(
+        str(ctx.file_path), ctx.media_type, return_embedding=EMBEDDING_INDEX_ENABLED
+    )
+    if "error" in ai_result:
+        raise HTTPException(status_code=500, detail=ai_result["error"])
+    ctx.embedding = ai_result.pop("embedding", None)
+    ctx.frame_outputs = ai_result.pop("frame_outputs", None)
+    ctx.ai_result = ai_result
+
+ANALYSIS_STAGES = [
+    Stage("admit", admit_stage),
+    Stage("fingerprint", fingerprint_stage, mode="thread"),
+    Stage("near_duplicate", near_duplicate_stage, mode="sync"),
+    Stage("detect", detect_stage, when=lambda ctx: not ctx.get("near_duplicate")),
+]
+analysis_pipeline = Pipeline("analysis", ANALYSIS_STAGES)
+
+async def registry_stage(ctx):
+    """
+    Registry lookup with the analysis stages started speculatively
+    alongside it; their work is dropped if the media is registered
+
+    The analysis stages only leave their results on the forked context;
+    anything that is stored or indexed is done by the persist stage once
+    the chain has answered.
+    """
+    print(f"🔗 Checking blockchain...")
+    analysis = ctx.fork()
+    ctx.blockchain_result, _ = await speculation.run(
+        blockchain_service.verify_media_async(ctx.media_hash),
+        lambda: analysis_pipeline.execute(analysis),
+        needed=lambda chain: not chain.get("exists")
+    )
+    if not ctx.blockchain_result.get("exists"):
+        ctx.merge(analysis)
+
+def persist_stage(ctx):
+    """Save the verdict, index the fingerprint/embedding and build the response"""
+    chain = ctx.get("blockchain_result") or {}
+    if not chain.get("exists") and ctx.get("near_duplicate"):
+        ctx.finish(near_duplicate_response(
+            *ctx.near_duplicate, ctx.media_hash, ctx.file_name, ctx.media_type, ctx.perceptual_hashes
+        ))
+        return
+    
+    result = {
+        "media_hash": ctx.media_hash,
+        "file_name": ctx.file_name,
+        "file_type": ctx.media_type,
+        "blockchain_verified": chain.get("exists", False),
+    }
+    
+    if chain.get("exists"):
+        print(f"✅ Media verified on blockchain")
+        result.update({
+            "status": "Verified Authentic",
+            "blockchain_uploader": chain.get("uploader"),
+            "blockchain_timestamp": chain.get("timestamp"),
+            "message": "Media is registered on blockchain as authentic"
+        })
+        save_record(
+            media_hash=ctx.media_hash,
+            file_name=ctx.file_name,
+            file_type=ctx.media_type,
+            blockchain_verified=True,
+            blockchain_uploader=chain.get("uploader"),
+            blockchain_timestamp=chain.get("timestamp")
+        )
+    
+    else:
+        ai_result = ctx.ai_result
+        perceptual_hashes = ctx.get("perceptual_hashes")
+        if ctx.specialized:
+            message = f"{ctx.media_type.capitalize()} analyzed with {ai_result['confidence_score']}% confidence"
+        else:
+            message = f"AI classified as {ai_result['classification']} with {ai_result['confidence_score']}% confidence"
+        result.update({
+            "status": f"AI-Detected {ai_result['classification']}",
+            "ai_classification": ai_result["classification"],
+            "ai_confidence": ai_result["confidence_score"],
+            "fake_probability": ai_result.get("fake_probability"),
+            "real_probability": ai_result.get("real_probability"),
+            "is_deepfake": ai_result.get("is_deepfake"),
+            "ai_details": ai_result.get("details"),
+            "message": message
+        })
+        save_record(
+            media_hash=ctx.media_hash,
+            file_name=ctx.file_name,
+            file_type=ctx.media_type,
+            blockchain_verified=False,
+            ai_classification=ai_result["classification"],
+            ai_confidence=ai_result["confidence_score"],
+            fake_probability=ai_result.get("fake_probability"),
+            real_probability=ai_result.get("real_probability"),
+            perceptual_hash=PerceptualHashService.encode(perceptual_hashes) if perceptual_hashes else None
+        )
+        
+        if perceptual_hashes:
+            near_duplicate_index.add(ctx.media_type, perceptual_hashes, ctx.media_hash)
+        if ctx.embedding is not None:
+            vector_index.add(ctx.media_type, ctx.media_hash, ctx.embedding)
+        if ctx.get("frame_outputs"):
+            feature_store.put(ctx.media_hash, ctx.frame_outputs)
+    
+    ctx.finish(JSONResponse(content={"success": True, "verification": result}))
+
+INGEST = Stage("ingest", ingest_stage, mode="thread", when=lambda ctx: ctx.get("stored") is None)
+CACHE = Stage("cache", cache_stage)
+# Thread: writes the feature store and may retrain the vector index
+PERSIST = Stage("persist", persist_stage, mode="thread")
+
+# /api/verify: registry first (with speculative analysis), then AI
+verify_pipeline = Pipeline("verify", [INGEST, CACHE, Stage("registry", registry_stage), PERSIST])
+# /api/verify/{image,video,audio}: AI only
+modality_pipeline = Pipeline("verify_modality", [INGEST, CACHE, *ANALYSIS_STAGES, PERSIST])
+PIPELINES = (verify_pipeline, modality_pipeline, analysis_pipeline)
+
+async def run_verification(pipeline: Pipeline, db: Session, media_type: Optional[str] = None,
+                           specialized: Optional[bool] = None, **inputs):
+    """
+    Run an upload through a verification pipeline and map failures to HTTP errors
+    
+    inputs are either upload/file_name (a multipart upload, staged by the
+    ingest stage) or stored/file_name (a finalized chunked upload, whose
+    lease is released here)
+    """
+    if specialized is None:
+        specialized = media_type is not None
+    ctx = PipelineContext(db=db, media_type=media_type, specialized=specialized,
+                          embedding=None, **inputs)
+    if ctx.get("stored") is not None:
+        ctx.defer(upload_store.release, ctx.stored)
+        ctx.file_path, ctx.media_hash = ctx.stored.path, ctx.stored.media_hash
+    try:
+        return await pipeline.execute(ctx)
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.on_event("startup")
 async def startup_event():
     """Run on application startup"""
     print("🚀 Starting Blockchain AI Deepfake Detection API...")
     print(f"📁 Upload directory: {UPLOAD_DIR}")
-    print(f"🔗 Blockchain connected: {blockchain_service.is_connected()}")
+    if FAST_START:
+        print("🔗 Blockchain connection deferred until first use")
+    else:
+        print(f"🔗 Blockchain connected: {blockchain_service.is_connected()}")
     print(f"🤖 AI detector initialized on device: {ai_detector.device}")
+    cpu_scheduler.start()
+    print(f"🧮 CPU lanes: {cpu_scheduler.config()['lanes']}")
+    
+    with startup_timer.phase("near_duplicate_index"):
+        load_near_duplicate_index()
+    print(f"🧬 Near-duplicate index: {len(near_duplicate_index)} fingerprints")
+    print(f"🧭 Embedding index: {vector_index.stats()}")
+    
+    with startup_timer.phase("statistics"):
+        db = SessionLocal()
+        try:
+            if stats_aggregator.seed(db, archive):
+                print("📊 Statistics counters seeded from the database")
+        finally:
+            db.close()
+    print(f"📊 Statistics: {stats_aggregator.snapshot()['total_verifications']} verifications")
+    print(f"🗄️ Archive: {len(archive)} records")
+    if ARCHIVE_AFTER_DAYS > 0:
+        archive.start_periodic(
+            timedelta(days=ARCHIVE_AFTER_DAYS), interval=ARCHIVE_INTERVAL_HOURS * 3600
+        )
+    if REGISTRY_MIRROR_ENABLED:
+        registry_mirror.start()
+    registry_stats.start()
+    upload_store.start_sweeper()
+    upload_sessions.start_sweeper()
+    write_buffer.start()
+    
+    print("⏱️ Startup timing:")
+    startup_timer.print_report()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Run on application shutdown"""
+    registry_stats.stop()
+    registry_mirror.stop()
+    upload_store.stop()
+    upload_sessions.stop()
+    archive.stop()
+    write_buffer.stop()
+    cpu_scheduler.shutdown()
+    ai_detector.shutdown()
+    await blockchain_service.close()
+    print(f"💾 Flushed pending verification records ({write_buffer.flushed_records} total)")
 
 @app.get("/")
 async def root():
@@ -68,8 +589,22 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "blockchain_connected": blockchain_service.is_connected(),
-        "ai_model_loaded": ai_detector.model is not None
+        "blockchain_connected": await blockchain_service.is_connected_async(),
+        "rpc": blockchain_service.rpc_pool.stats(),
+        "registry_mirror": registry_mirror.stats(),
+        "ai_model_loaded": bool(ai_detector.loaded_modalities()),
+        "ai_models_loaded": ai_detector.loaded_modalities(),
+        "write_behind": write_buffer.stats(),
+        "upload_sessions": upload_sessions.stats(),
+        "cascade": ai_detector.cascade_stats(),
+        "video_decode": ai_detector.decode_stats(),
+        "feature_store": dict(feature_store.stats(), enabled=FEATURE_STORE_ENABLED),
+        "admission": admission.stats(),
+        "coalescing": in_flight.stats(),
+        "speculation": speculation.stats(),
+        "pipelines": {pipeline.name: pipeline.stats() for pipeline in PIPELINES},
+        "cpu_scheduler": dict(cpu_scheduler.config(), lane_metrics=cpu_scheduler.stats()),
+        "startup": dict(startup_timer.report(), model_load_seconds=ai_detector.load_times)
     }
 
 @app.post("/api/verify")
@@ -86,134 +621,7 @@ async def verify_media(
     3. If not found, run AI deepfake detection
     4. Return verification results
     """
-    
-    # Validate file type
-    allowed_extensions = {
-        '.jpg', '.jpeg', '.png', '.bmp', '.gif',  # Images
-        '.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv',  # Videos
-        '.mp3', '.wav', '.m4a', '.flac', '.ogg', '.aac'  # Audio
-    }
-    file_ext = Path(file.filename).suffix.lower()
-    
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"
-        )
-    
-    # Determine media type
-    if file_ext in {'.jpg', '.jpeg', '.png', '.bmp', '.gif'}:
-        media_type = "image"
-    elif file_ext in {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'}:
-        media_type = "video"
-    else:
-        media_type = "audio"
-    
-    try:
-        # Save uploaded file temporarily
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Generate hash
-        media_hash = hash_service.generate_file_hash(file_path)
-        print(f"📝 Generated hash: {media_hash}")
-        
-        # Check if already verified in database
-        existing_record = db.query(VerificationRecord).filter(
-            VerificationRecord.media_hash == media_hash
-        ).first()
-        
-        if existing_record:
-            print(f"📚 Found existing record in database")
-            return JSONResponse(content={
-                "success": True,
-                "cached": True,
-                "media_hash": media_hash,
-                "verification": existing_record.to_dict()
-            })
-        
-        # Check blockchain
-        print(f"🔗 Checking blockchain...")
-        blockchain_result = blockchain_service.verify_media(media_hash)
-        
-        # Initialize result object
-        result = {
-            "media_hash": media_hash,
-            "file_name": file.filename,
-            "file_type": media_type,
-            "blockchain_verified": blockchain_result.get("exists", False),
-        }
-        
-        # If verified on blockchain
-        if blockchain_result.get("exists"):
-            print(f"✅ Media verified on blockchain")
-            result.update({
-                "status": "Verified Authentic",
-                "blockchain_uploader": blockchain_result.get("uploader"),
-                "blockchain_timestamp": blockchain_result.get("timestamp"),
-                "message": "Media is registered on blockchain as authentic"
-            })
-            
-            # Save to database
-            record = VerificationRecord(
-                media_hash=media_hash,
-                file_name=file.filename,
-                file_type=media_type,
-                blockchain_verified=True,
-                blockchain_uploader=blockchain_result.get("uploader"),
-                blockchain_timestamp=blockchain_result.get("timestamp")
-            )
-            db.add(record)
-            db.commit()
-        
-        else:
-            # Run AI detection
-            print(f"🤖 Running AI deepfake detection...")
-            ai_result = ai_detector.detect(str(file_path), media_type)
-            
-            if "error" in ai_result:
-                raise HTTPException(status_code=500, detail=ai_result["error"])
-            
-            result.update({
-                "status": f"AI-Detected {ai_result['classification']}",
-                "ai_classification": ai_result["classification"],
-                "ai_confidence": ai_result["confidence_score"],
-                "fake_probability": ai_result.get("fake_probability"),
-                "real_probability": ai_result.get("real_probability"),
-                "is_deepfake": ai_result.get("is_deepfake"),
-                "ai_details": ai_result.get("details"),
-                "message": f"AI classified as {ai_result['classification']} with {ai_result['confidence_score']}% confidence"
-            })
-            
-            # Save to database
-            record = VerificationRecord(
-                media_hash=media_hash,
-                file_name=file.filename,
-                file_type=media_type,
-                blockchain_verified=False,
-                ai_classification=ai_result["classification"],
-                ai_confidence=ai_result["confidence_score"],
-                fake_probability=ai_result.get("fake_probability"),
-                real_probability=ai_result.get("real_probability")
-            )
-            db.add(record)
-            db.commit()
-        
-        # Clean up temporary file
-        file_path.unlink()
-        
-        return JSONResponse(content={
-            "success": True,
-            "verification": result
-        })
-    
-    except Exception as e:
-        # Clean up on error
-        if file_path.exists():
-            file_path.unlink()
-        
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_verification(verify_pipeline, db, upload=file, file_name=file.filename)
 
 @app.post("/api/verify/image")
 async def verify_image(
@@ -224,80 +632,8 @@ async def verify_image(
     Verify image file authenticity using Image Model
     Specialized endpoint for image deepfake detection
     """
-    # Validate file type
-    allowed_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif'}
-    file_ext = Path(file.filename).suffix.lower()
-    
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported image type. Allowed: {', '.join(allowed_extensions)}"
-        )
-    
-    try:
-        # Save and process
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        media_hash = hash_service.generate_file_hash(file_path)
-        
-        # Check cache
-        existing_record = db.query(VerificationRecord).filter(
-            VerificationRecord.media_hash == media_hash
-        ).first()
-        
-        if existing_record:
-            return JSONResponse(content={
-                "success": True,
-                "cached": True,
-                "media_hash": media_hash,
-                "verification": existing_record.to_dict()
-            })
-        
-        # Run image detection
-        print(f"🤖 Running Image Model detection...")
-        ai_result = ai_detector.detect_image(str(file_path))
-        
-        if "error" in ai_result:
-            raise HTTPException(status_code=500, detail=ai_result["error"])
-        
-        result = {
-            "media_hash": media_hash,
-            "file_name": file.filename,
-            "file_type": "image",
-            "blockchain_verified": False,
-            "status": f"AI-Detected {ai_result['classification']}",
-            "ai_classification": ai_result["classification"],
-            "ai_confidence": ai_result["confidence_score"],
-            "fake_probability": ai_result.get("fake_probability"),
-            "real_probability": ai_result.get("real_probability"),
-            "is_deepfake": ai_result.get("is_deepfake"),
-            "ai_details": ai_result.get("details"),
-            "message": f"Image analyzed with {ai_result['confidence_score']}% confidence"
-        }
-        
-        # Save to database
-        record = VerificationRecord(
-            media_hash=media_hash,
-            file_name=file.filename,
-            file_type="image",
-            blockchain_verified=False,
-            ai_classification=ai_result["classification"],
-            ai_confidence=ai_result["confidence_score"],
-            fake_probability=ai_result.get("fake_probability"),
-            real_probability=ai_result.get("real_probability")
-        )
-        db.add(record)
-        db.commit()
-        
-        file_path.unlink()
-        return JSONResponse(content={"success": True, "verification": result})
-    
-    except Exception as e:
-        if file_path.exists():
-            file_path.unlink()
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_verification(modality_pipeline, db, media_type="image",
+                                  upload=file, file_name=file.filename)
 
 @app.post("/api/verify/video")
 async def verify_video(
@@ -308,80 +644,8 @@ async def verify_video(
     Verify video file authenticity using Video Model
     Specialized endpoint for video deepfake detection
     """
-    # Validate file type
-    allowed_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'}
-    file_ext = Path(file.filename).suffix.lower()
-    
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported video type. Allowed: {', '.join(allowed_extensions)}"
-        )
-    
-    try:
-        # Save and process
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        media_hash = hash_service.generate_file_hash(file_path)
-        
-        # Check cache
-        existing_record = db.query(VerificationRecord).filter(
-            VerificationRecord.media_hash == media_hash
-        ).first()
-        
-        if existing_record:
-            return JSONResponse(content={
-                "success": True,
-                "cached": True,
-                "media_hash": media_hash,
-                "verification": existing_record.to_dict()
-            })
-        
-        # Run video detection
-        print(f"🤖 Running Video Model detection...")
-        ai_result = ai_detector.detect_video(str(file_path))
-        
-        if "error" in ai_result:
-            raise HTTPException(status_code=500, detail=ai_result["error"])
-        
-        result = {
-            "media_hash": media_hash,
-            "file_name": file.filename,
-            "file_type": "video",
-            "blockchain_verified": False,
-            "status": f"AI-Detected {ai_result['classification']}",
-            "ai_classification": ai_result["classification"],
-            "ai_confidence": ai_result["confidence_score"],
-            "fake_probability": ai_result.get("fake_probability"),
-            "real_probability": ai_result.get("real_probability"),
-            "is_deepfake": ai_result.get("is_deepfake"),
-            "ai_details": ai_result.get("details"),
-            "message": f"Video analyzed with {ai_result['confidence_score']}% confidence"
-        }
-        
-        # Save to database
-        record = VerificationRecord(
-            media_hash=media_hash,
-            file_name=file.filename,
-            file_type="video",
-            blockchain_verified=False,
-            ai_classification=ai_result["classification"],
-            ai_confidence=ai_result["confidence_score"],
-            fake_probability=ai_result.get("fake_probability"),
-            real_probability=ai_result.get("real_probability")
-        )
-        db.add(record)
-        db.commit()
-        
-        file_path.unlink()
-        return JSONResponse(content={"success": True, "verification": result})
-    
-    except Exception as e:
-        if file_path.exists():
-            file_path.unlink()
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_verification(modality_pipeline, db, media_type="video",
+                                  upload=file, file_name=file.filename)
 
 @app.post("/api/verify/audio")
 async def verify_audio(
@@ -392,80 +656,207 @@ async def verify_audio(
     Verify audio file authenticity using Audio Model
     Specialized endpoint for audio deepfake detection
     """
-    # Validate file type
-    allowed_extensions = {'.mp3', '.wav', '.m4a', '.flac', '.ogg', '.aac'}
-    file_ext = Path(file.filename).suffix.lower()
+    return await run_verification(modality_pipeline, db, media_type="audio",
+                                  upload=file, file_name=file.filename)
+
+def upload_session_error(e: UploadSessionError) -> HTTPException:
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+@app.post("/api/uploads")
+async def create_upload(filename: str, size: int):
+    """
+    Start a resumable upload
+
+    Send the file with PUT /api/uploads/{upload_id}?offset=N in any number
+    of chunks, then POST /api/uploads/{upload_id}/finalize to verify it
+    """
+    resolve_media_type(filename)
+    try:
+        return upload_sessions.create(filename, size)
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    Append the request body at `offset`
+
+    offset must equal the bytes received so far; on a mismatch the reply
+    is 409 with the expected offset in the Upload-Offset header. After a
+    dropped connection, GET the session and resume from its offset.
+    """
+    try:
+        return await upload_sessions.append(upload_id, offset, request.stream())
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Resumable upload progress"""
+    try:
+        return upload_sessions.status(upload_id)
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Discard a resumable upload"""
+    try:
+        upload_sessions.abort(upload_id)
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+    return {"success": True}
+
+@app.post("/api/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str, media_type: Optional[str] = None,
+                          db: Session = Depends(get_db)):
+    """
+    Verify a completed resumable upload
+
+    The hash was computed as chunks arrived, so a known file is answered
+    from the cache without re-reading it. media_type=image|video|audio
+    runs that modality's detector only (like /api/verify/{type});
+    without it the registry is checked first (like /api/verify).
+    """
+    if media_type is not None and media_type not in MEDIA_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown media type: {media_type}")
+
+    try:
+        file_name = upload_sessions.status(upload_id)["filename"]
+        resolved = resolve_media_type(file_name, media_type)
+        stored = await asyncio.to_thread(upload_sessions.finalize, upload_id)
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+    print(f"📝 Assembled upload {upload_id}, hash: {stored.media_hash}")
+
+    pipeline = modality_pipeline if media_type else verify_pipeline
+    return await run_verification(pipeline, db, media_type=resolved, specialized=media_type is not None,
+                                  stored=stored, file_name=file_name)
+
+@app.post("/api/reanalyze")
+async def reanalyze_media(media_hash: str, db: Session = Depends(get_db)):
+    """
+    Re-run AI detection on a retained upload without re-sending it
     
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported audio type. Allowed: {', '.join(allowed_extensions)}"
-        )
+    Only works while the file is inside the upload retention window
+    (UPLOAD_RETENTION_SECONDS). The stored verdict is replaced; archived
+    records are immutable and answer 409.
+    
+    Args:
+        media_hash: SHA-256 hash of a previously uploaded media file
+    """
+    # Only the buffered and hot tiers can be updated
+    record = write_buffer.get(media_hash) or db.query(VerificationRecord).filter(
+        VerificationRecord.media_hash == media_hash
+    ).first()
+    if record is None:
+        if archive.find(media_hash) is not None:
+            raise HTTPException(status_code=409, detail="Archived verification records cannot be re-analyzed")
+        raise HTTPException(status_code=404, detail="Media hash not found")
+    
+    stored = upload_store.acquire(media_hash)
+    if stored is None:
+        raise HTTPException(status_code=410, detail="Upload is no longer retained; please upload again")
     
+    ticket = None
     try:
-        # Save and process
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        media_hash = hash_service.generate_file_hash(file_path)
-        
-        # Check cache
-        existing_record = db.query(VerificationRecord).filter(
-            VerificationRecord.media_hash == media_hash
-        ).first()
-        
-        if existing_record:
-            return JSONResponse(content={
-                "success": True,
-                "cached": True,
-                "media_hash": media_hash,
-                "verification": existing_record.to_dict()
-            })
-        
-        # Run audio detection
-        print(f"🤖 Running Audio Model detection...")
-        ai_result = ai_detector.detect_audio(str(file_path))
+        # The verdict is stored under media_hash, so the content must match it
+        if not await asyncio.to_thread(hash_service.verify_file_integrity, stored.path, media_hash):
+            raise HTTPException(status_code=410, detail="Retained upload is damaged; please upload again")
         
+        ticket = await admit(ai_detector.modality_of(record.file_type), stored.path)
+        ai_result = await ai_detector.detect_async(str(stored.path), record.file_type)
         if "error" in ai_result:
             raise HTTPException(status_code=500, detail=ai_result["error"])
         
-        result = {
-            "media_hash": media_hash,
-            "file_name": file.filename,
-            "file_type": "audio",
-            "blockchain_verified": False,
-            "status": f"AI-Detected {ai_result['classification']}",
+        changes = {
             "ai_classification": ai_result["classification"],
             "ai_confidence": ai_result["confidence_score"],
             "fake_probability": ai_result.get("fake_probability"),
             "real_probability": ai_result.get("real_probability"),
-            "is_deepfake": ai_result.get("is_deepfake"),
-            "ai_details": ai_result.get("details"),
-            "message": f"Audio analyzed with {ai_result['confidence_score']}% confidence"
         }
+        if not write_buffer.update(media_hash, **changes):
+            if not db.query(VerificationRecord).filter(
+                VerificationRecord.media_hash == media_hash
+            ).update(changes, synchronize_session=False):
+                # Archived while the analysis ran
+                db.rollback()
+                raise HTTPException(status_code=409, detail="Archived verification records cannot be re-analyzed")
+            stats_aggregator.record_change(db, record, changes)
+            db.commit()
         
-        # Save to database
-        record = VerificationRecord(
-            media_hash=media_hash,
-            file_name=file.filename,
-            file_type="audio",
-            blockchain_verified=False,
-            ai_classification=ai_result["classification"],
-            ai_confidence=ai_result["confidence_score"],
-            fake_probability=ai_result.get("fake_probability"),
-            real_probability=ai_result.get("real_probability")
+        ai_result.pop("embedding", None)
+        frame_outputs = ai_result.pop("frame_outputs", None)
+        if frame_outputs:
+            await asyncio.to_thread(feature_store.put, media_hash, frame_outputs)
+        return JSONResponse(content={
+            "success": True,
+            "media_hash": media_hash,
+            "verification": ai_result
+        })
+    
+    finally:
+        admission.release(ticket)
+        upload_store.release(stored)
+
+def feature_head(name: str):
+    """Load a classifier head exported to FEATURE_HEADS_DIR/<name>.npz"""
+    if Path(name).name != name:
+        raise HTTPException(status_code=400, detail="Head must be a file name in the heads directory")
+    path = FEATURE_HEADS_DIR / f"{name}.npz"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=f"Classifier head not found: {name}")
+    return load_head(path)
+
+@app.post("/api/rescore")
+async def rescore_media(
+    media_hash: str,
+    threshold: Optional[float] = None,
+    aggregation: str = "mean",
+    head: Optional[str] = None,
+    audio_head: Optional[str] = None
+):
+    """
+    Recompute a verdict from stored per-frame outputs, without the media
+    
+    Nothing is decoded or run through a backbone, and the stored record
+    is left unchanged, so thresholds, aggregations and heads can be
+    tried on past items cheaply.
+    
+    Args:
+        media_hash: SHA-256 hash of previously analyzed media
+        threshold: Confidence threshold (default CONFIDENCE_THRESHOLD)
+        aggregation: How frame scores are combined (mean, median, max,
+            top_quartile_mean, trimmed_mean)
+        head: Classifier head for image/video features (name of an .npz
+            with weight and bias in FEATURE_HEADS_DIR)
+        audio_head: Classifier head for audio features
+    """
+    if not is_media_hash(media_hash):
+        raise HTTPException(status_code=400, detail="media_hash must be a lowercase hex SHA-256")
+    if aggregation not in AGGREGATIONS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown aggregation. Allowed: {', '.join(AGGREGATIONS)}"
         )
-        db.add(record)
-        db.commit()
-        
-        file_path.unlink()
-        return JSONResponse(content={"success": True, "verification": result})
     
-    except Exception as e:
-        if file_path.exists():
-            file_path.unlink()
-        raise HTTPException(status_code=500, detail=str(e))
+    tracks = await asyncio.to_thread(feature_store.get, media_hash)
+    if not tracks:
+        raise HTTPException(status_code=404, detail="No stored model outputs for this media")
+    
+    heads = {}
+    if head:
+        heads["image"] = heads["video"] = feature_head(head)
+    if audio_head:
+        heads["audio"] = feature_head(audio_head)
+    
+    try:
+        result = rescore(
+            tracks, ai_detector.confidence_threshold if threshold is None else threshold, aggregation, heads
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "media_hash": media_hash, "verification": result}
 
 @app.post("/api/register")
 async def register_media(
@@ -486,13 +877,18 @@ async def register_media(
         result = blockchain_service.register_media(media_hash, metadata)
         
         if result.get("success"):
-            # Update database record
-            record = db.query(VerificationRecord).filter(
-                VerificationRecord.media_hash == media_hash
-            ).first()
+            # Update the pending or stored record
+            record = get_record(db, media_hash)
             
-            if record:
-                record.blockchain_verified = True
+            if record and not record.blockchain_verified:
+                # Pending rows are counted when written; archived rows are
+                # immutable and keep their original status
+                if not write_buffer.update(media_hash, blockchain_verified=True) and db.query(
+                    VerificationRecord
+                ).filter(
+                    VerificationRecord.media_hash == media_hash
+                ).update({"blockchain_verified": True}, synchronize_session=False):
+                    stats_aggregator.record_change(db, record, {"blockchain_verified": True})
                 db.commit()
         
         return JSONResponse(content=result)
@@ -501,40 +897,128 @@ async def register_media(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/stats")
-async def get_stats(db: Session = Depends(get_db)):
-    """Get system statistics"""
+async def get_stats():
+    """
+    Get system statistics
     
-    total_verifications = db.query(VerificationRecord).count()
-    blockchain_verified_count = db.query(VerificationRecord).filter(
-        VerificationRecord.blockchain_verified == True
-    ).count()
-    ai_detected_count = db.query(VerificationRecord).filter(
-        VerificationRecord.ai_classification != None
-    ).count()
+    Served from counters maintained as records are written (shared by
+    all workers) and a registry count refreshed in the background, so
+    the cost is independent of table size.
+    """
+    stats = stats_aggregator.snapshot()
+    stats["blockchain_registry"] = registry_stats.get()
+    return stats
+
+@app.get("/api/history")
+async def get_history(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    file_type: Optional[str] = None,
+    ai_classification: Optional[str] = None,
+    blockchain_verified: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get verification history, newest first
     
-    blockchain_stats = blockchain_service.get_registry_stats()
+    Args:
+        limit: Page size (max 100)
+        cursor: next_cursor from the previous page
+        file_type: Only 'image', 'video' or 'audio' records
+        ai_classification: Only records with this AI classification
+        blockchain_verified: Only records with this blockchain status
+        since: Only records created at or after this time
+        until: Only records created before this time
+    """
+    try:
+        records, next_cursor = get_history_page(
+            db,
+            limit=max(1, min(limit, 100)),
+            cursor=cursor,
+            file_type=file_type,
+            ai_classification=ai_classification,
+            blockchain_verified=blockchain_verified,
+            since=since,
+            until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
-        "total_verifications": total_verifications,
-        "blockchain_verified": blockchain_verified_count,
-        "ai_detected": ai_detected_count,
-        "blockchain_registry": blockchain_stats
+        "history": [record.to_dict() for record in records],
+        "next_cursor": next_cursor
     }
 
-@app.get("/api/history")
-async def get_history(limit: int = 10, db: Session = Depends(get_db)):
-    """Get recent verification history"""
-    
-    records = db.query(VerificationRecord).order_by(
-        VerificationRecord.created_at.desc()
-    ).limit(limit).all()
+@app.get("/api/history/export")
+async def export_history(
+    file_type: Optional[str] = None,
+    ai_classification: Optional[str] = None,
+    blockchain_verified: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Stream all matching history records as newline-delimited JSON
     
-    return {
-        "history": [record.to_dict() for record in records]
+    Accepts the same filters as /api/history without a page limit.
+    """
+    filters = {
+        "file_type": file_type,
+        "ai_classification": ai_classification,
+        "blockchain_verified": blockchain_verified,
+        "since": since,
+        "until": until,
     }
+    
+    def generate():
+        db = SessionLocal()
+        try:
+            for record in iter_history(db, **filters):
+                yield json.dumps(record.to_dict()) + "\n"
+        finally:
+            db.close()
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
-if __name__ == "__main__":
-    import uvicorn
+@app.get("/api/similar")
+async def get_similar(media_hash: str, k: int = 10, db: Session = Depends(get_db)):
+    """
+    Find previously verified media whose model embeddings are closest
+    to the given item
     
-    port = int(os.getenv("BACKEND_PORT", "8000"))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    Args:
+        media_hash: SHA-256 hash of an already verified media item
+        k: Number of neighbours to return
+    """
+    record = get_record(db, media_hash)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Media hash not found")
+    
+    index = vector_index.get(record.file_type)
+    query = index.get(media_hash) if index else None
+    if query is None:
+        raise HTTPException(status_code=404, detail="No embedding stored for this media")
+    
+    neighbours = index.search(query, k=max(1, min(k, 100)), exclude=media_hash)
+    records = {
+        r.media_hash: r for r in db.query(VerificationRecord).filter(
+            VerificationRecord.media_hash.in_([key for key, _ in neighbours])
+        )
+    }
+    for key, _ in neighbours:
+        if key not in records:
+            # Not flushed yet, or already compacted into the archive
+            record_for_key = write_buffer.get(key) or archive.find(key)
+            if record_for_key is not None:
+                records[key] = record_for_key
+    
+    return {
+        "media_hash": media_hash,
+        "file_type": record.file_type,
+        "similar": [
+            {"similarity": score, "verification": records[key].to_dict()}
+            for key, score in neighbours if key in records
+        ]
+    }
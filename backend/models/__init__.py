@@ -1,14 +1,30 @@
 """
 AI Models Package
 Separate models for audio, image, and video deepfake detection
+
+Model classes are imported on first attribute access so that importing
+the package does not pull in torch, torchvision or OpenCV.
 """
 
-from .image_model import ImageDeepfakeModel
-from .video_model import VideoDeepfakeModel
-from .audio_model import AudioDeepfakeModel
+import importlib
+
+_LAZY_ATTRS = {
+    'ImageDeepfakeModel': '.image_model',
+    'VideoDeepfakeModel': '.video_model',
+    'AudioDeepfakeModel': '.audio_model',
+    'ScreeningModel': '.screening_model',
+}
 
 __all__ = [
     'ImageDeepfakeModel',
     'VideoDeepfakeModel',
-    'AudioDeepfakeModel'
+    'AudioDeepfakeModel',
+    'ScreeningModel'
 ]
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
@@ -8,6 +8,7 @@ import torch.nn as nn
 import numpy as np
 from typing import Dict, Any
 import warnings
+from .weights import load_model, model_version, pretrained_backbone
 
 
 class AudioDeepfakeModel(nn.Module):
@@ -15,12 +16,10 @@ class AudioDeepfakeModel(nn.Module):
     CNN-based deepfake classifier for audio
     Uses ResNet-inspired architecture on mel-spectrograms
     """
-    def __init__(self):
+    def __init__(self, pretrained: bool = True):
         super().__init__()
         # Using ResNet18 architecture adapted for spectrograms
-        from torchvision.models import resnet18
-        
-        self.model = resnet18(pretrained=True)
+        self.model = pretrained_backbone("resnet18", pretrained)
         
         # Modify first layer to accept 1-channel spectrogram input
         self.model.conv1 = nn.Conv2d(1, 64, kernel_size=7, stride=2, padding=3, bias=False)
@@ -29,9 +28,31 @@ class AudioDeepfakeModel(nn.Module):
         num_features = self.model.fc.in_features
         self.model.fc = nn.Linear(num_features, 2)  # Binary: Real / Fake
 
+    @property
+    def head(self) -> nn.Linear:
+        """Final classification layer (a property, so state_dict keys stay unchanged)"""
+        return self.model.fc
+
     def forward(self, x):
         return self.model(x)
 
+    def forward_with_embedding(self, x):
+        """
+        Run the model and also capture the penultimate-layer features
+        
+        Returns:
+            (logits, embedding) where embedding is the pooled ResNet output
+        """
+        captured = {}
+        handle = self.head.register_forward_hook(
+            lambda module, inputs, output: captured.setdefault("embedding", inputs[0])
+        )
+        try:
+            logits = self.model(x)
+        finally:
+            handle.remove()
+        return logits, captured["embedding"]
+
 
 class AudioDeepfakeDetector:
     """
@@ -51,18 +72,16 @@ class AudioDeepfakeDetector:
         self.device = torch.device(device if device else ("cuda" if torch.cuda.is_available() else "cpu"))
         self.confidence_threshold = confidence_threshold
         
-        # Load model
-        self.model = AudioDeepfakeModel().to(self.device)
+        # Load model (memory-mapped snapshot when available)
+        self.model = load_model(AudioDeepfakeModel, "audio", model_path, self.device)
+        self.model_version = model_version("audio", model_path)
         
-        if model_path:
-            try:
-                self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-                print(f"✔ Loaded trained audio model from {model_path}")
-            except Exception as e:
-                print(f"⚠ Could not load custom audio model: {e}")
-                print("  Using pretrained base model")
+        # Optional cheap first cascade stage (models.screening_model)
+        self.screening_model = None
+        self.escalation_band = None
         
-        self.model.eval()
+        # Attach full-model outputs under "frame_outputs" for the feature store
+        self.keep_frame_outputs = False
         
         # Try to import audio libraries
         try:
@@ -93,6 +112,20 @@ class AudioDeepfakeDetector:
         # Load audio
         y, sr = self.librosa.load(audio_path, duration=duration, sr=None)
         
+        return self.waveform_to_spectrogram(y, sr, n_mels), sr, len(y) / sr
+    
+    def waveform_to_spectrogram(self, y: np.ndarray, sr: int, n_mels: int = 128):
+        """
+        Convert decoded mono samples to a mel-spectrogram
+        
+        Args:
+            y: Mono float samples
+            sr: Sample rate
+            n_mels: Number of mel bands
+            
+        Returns:
+            Spectrogram tensor ready for model
+        """
         # Generate mel-spectrogram
         mel_spec = self.librosa.feature.melspectrogram(
             y=y, 
@@ -116,18 +149,38 @@ class AudioDeepfakeDetector:
         
         spec_tensor = transform(mel_spec_norm.astype(np.float32))
         
-        return spec_tensor.unsqueeze(0).to(self.device), sr, len(y) / sr
+        return spec_tensor.unsqueeze(0).to(self.device)
     
-    def detect(self, audio_path: str) -> Dict[str, Any]:
+    def detect(self, audio_path: str, return_embedding: bool = False) -> Dict[str, Any]:
         """
         Detect if audio is a deepfake
         
         Args:
             audio_path: Path to the audio file
+            return_embedding: Also return the penultimate-layer features
             
         Returns:
-            Dictionary with detection results
+            Dictionary with detection results ("embedding" holds a float32
+            numpy array when return_embedding is set)
+        """
+        return self._detect(lambda: self.audio_to_spectrogram(audio_path), return_embedding)
+    
+    def detect_waveform(self, y: np.ndarray, sr: int, duration: float = 5.0,
+                        return_embedding: bool = False) -> Dict[str, Any]:
+        """
+        detect() for samples that are already decoded, e.g. a video's soundtrack
+        
+        Args:
+            y: Mono float samples
+            sr: Sample rate
+            duration: Seconds analyzed, as in audio_to_spectrogram()
+            return_embedding: Also return the penultimate-layer features
         """
+        y = y[:int(duration * sr)]
+        return self._detect(lambda: (self.waveform_to_spectrogram(y, sr), sr, len(y) / sr), return_embedding)
+    
+    def _detect(self, spectrogram, return_embedding: bool) -> Dict[str, Any]:
+        """Classify the (tensor, sample rate, duration) returned by spectrogram()"""
         if not self.audio_available:
             return {
                 "classification": "Error",
@@ -137,14 +190,36 @@ class AudioDeepfakeDetector:
         
         try:
             # Convert to spectrogram
-            spec_tensor, sample_rate, audio_duration = self.audio_to_spectrogram(audio_path)
+            spec_tensor, sample_rate, audio_duration = spectrogram()
+            
+            # Cascade: a decisive screening score skips the full model
+            screen_fake = None
+            if self.screening_model is not None:
+                with torch.no_grad():
+                    screen_fake = torch.softmax(self.screening_model(spec_tensor), dim=1)[0][1].item()
+            screened = screen_fake is not None and self.escalation_band.decides(screen_fake)
             
             # Run inference
-            with torch.no_grad():
-                logits = self.model(spec_tensor)
-                probs = torch.softmax(logits, dim=1)
-                real_prob = probs[0][0].item()
-                fake_prob = probs[0][1].item()
+            embedding = None
+            frame_outputs = None
+            if screened:
+                real_prob, fake_prob = 1 - screen_fake, screen_fake
+            else:
+                with torch.no_grad():
+                    if return_embedding or self.keep_frame_outputs:
+                        logits, features = self.model.forward_with_embedding(spec_tensor)
+                        embedding = features[0].float().cpu().numpy()
+                    else:
+                        logits = self.model(spec_tensor)
+                    probs = torch.softmax(logits, dim=1)
+                    real_prob = probs[0][0].item()
+                    fake_prob = probs[0][1].item()
+                if self.keep_frame_outputs:
+                    frame_outputs = {"audio": {
+                        "version": self.model_version,
+                        "probabilities": probs.float().cpu().numpy(),
+                        "features": embedding[None],
+                    }}
             
             # Classify based on threshold
             is_fake = fake_prob > self.confidence_threshold
@@ -160,7 +235,7 @@ class AudioDeepfakeDetector:
                 classification = "Unverifiable"
                 confidence = max(real_prob, fake_prob)
             
-            return {
+            result = {
                 "classification": classification,
                 "confidence_score": round(confidence * 100, 2),
                 "fake_probability": round(fake_prob * 100, 2),
@@ -168,7 +243,7 @@ class AudioDeepfakeDetector:
                 "is_deepfake": is_fake,
                 "model_type": "Audio",
                 "details": {
-                    "model": "ResNet18",
+                    "model": "MobileNetV3-Small (screening)" if screened else "ResNet18",
                     "architecture": "CNN on Mel-Spectrogram",
                     "analysis_type": "Frequency + Time",
                     "sample_rate": sample_rate,
@@ -179,6 +254,16 @@ class AudioDeepfakeDetector:
                     "device": str(self.device)
                 }
             }
+            if screen_fake is not None:
+                result["details"]["cascade"] = {
+                    "stage": "screening" if screened else "full",
+                    "screening_fake_probability": round(screen_fake * 100, 2)
+                }
+            if embedding is not None and return_embedding:
+                result["embedding"] = embedding
+            if frame_outputs is not None:
+                result["frame_outputs"] = frame_outputs
+            return result
         
         except Exception as e:
             return {
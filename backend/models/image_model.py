@@ -8,7 +8,8 @@ import torch.nn as nn
 from torchvision import transforms
 from PIL import Image
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from .weights import load_model, model_version, pretrained_backbone
 
 
 class ImageDeepfakeModel(nn.Module):
@@ -16,23 +17,47 @@ class ImageDeepfakeModel(nn.Module):
     Xception-based deepfake classifier for images
     Analyzes spatial texture artifacts and face manipulation
     """
-    def __init__(self):
+    def __init__(self, pretrained: bool = True):
         super().__init__()
         # Using Xception architecture as specified
         try:
             from torchvision.models import xception
-            self.model = xception(pretrained=True)
+            self.model = xception(pretrained=pretrained)
             self.model.fc = nn.Linear(2048, 2)  # Binary: Real / Fake
         except ImportError:
             # Fallback to EfficientNet if Xception not available in torchvision
-            from torchvision.models import efficientnet_b0
-            self.model = efficientnet_b0(pretrained=True)
+            self.model = pretrained_backbone("efficientnet_b0", pretrained)
             num_features = self.model.classifier[1].in_features
             self.model.classifier[1] = nn.Linear(num_features, 2)
 
+    @property
+    def head(self) -> nn.Linear:
+        """Final classification layer (a property, so state_dict keys stay unchanged)"""
+        if isinstance(getattr(self.model, "fc", None), nn.Linear):
+            return self.model.fc
+        return self.model.classifier[1]
+
     def forward(self, x):
         return self.model(x)
 
+    def forward_with_embedding(self, x):
+        """
+        Run the model and also capture the penultimate-layer features
+        
+        Returns:
+            (logits, embedding) where embedding is the input to the final
+            classification layer
+        """
+        captured = {}
+        handle = self.head.register_forward_hook(
+            lambda module, inputs, output: captured.setdefault("embedding", inputs[0])
+        )
+        try:
+            logits = self.model(x)
+        finally:
+            handle.remove()
+        return logits, captured["embedding"]
+
 
 class ImageDeepfakeDetector:
     """
@@ -51,22 +76,23 @@ class ImageDeepfakeDetector:
         self.device = torch.device(device if device else ("cuda" if torch.cuda.is_available() else "cpu"))
         self.confidence_threshold = confidence_threshold
         
-        # Load model
-        self.model = ImageDeepfakeModel().to(self.device)
+        # Load model (memory-mapped snapshot when available)
+        self.model = load_model(ImageDeepfakeModel, "image", model_path, self.device)
+        self.model_version = model_version("image", model_path)
         
-        if model_path:
-            try:
-                self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-                print(f"✔ Loaded trained image model from {model_path}")
-            except Exception as e:
-                print(f"⚠ Could not load custom image model: {e}")
-                print("  Using pretrained base model")
+        # Model input resolution (square)
+        self.input_size = 224
         
-        self.model.eval()
+        # Optional cheap first cascade stage (models.screening_model)
+        self.screening_model = None
+        self.escalation_band = None
+        
+        # Attach full-model outputs under "frame_outputs" for the feature store
+        self.keep_frame_outputs = False
         
         # Preprocessing pipeline
         self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
+            transforms.Resize((self.input_size, self.input_size)),
             transforms.ToTensor(),
             transforms.Normalize(
                 mean=[0.485, 0.456, 0.406],
@@ -86,7 +112,7 @@ class ImageDeepfakeDetector:
         """
         # Convert to PIL Image if needed
         if isinstance(image_input, str):
-            image = Image.open(image_input).convert('RGB')
+            image = self.load_image(image_input)
         elif isinstance(image_input, np.ndarray):
             image = Image.fromarray(image_input)
         else:
@@ -95,26 +121,117 @@ class ImageDeepfakeDetector:
         # Apply transforms
         return self.transform(image).unsqueeze(0).to(self.device)
     
-    def detect(self, image_input) -> Dict[str, Any]:
+    def load_image(self, image_path: str) -> Image.Image:
+        """
+        Decode an image file at reduced resolution
+        
+        JPEGs are decoded in draft mode, which lets libjpeg scale by 1/2, 1/4
+        or 1/8 during the IDCT so full-resolution buffers are never built.
+        Other formats are box-reduced by an integer factor before the final
+        resize. Both steps keep the result at or above the model input size.
+        
+        Args:
+            image_path: Path to image file
+            
+        Returns:
+            RGB PIL Image no smaller than needed for the model input
+        """
+        image = Image.open(image_path)
+        target = (self.input_size, self.input_size)
+        
+        # JPEG only: picks the largest DCT scale that still covers target
+        image.draft('RGB', target)
+        
+        # Integer box reduction for formats without draft support
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGB')
+        factor = min(image.width // target[0], image.height // target[1])
+        if factor >= 2:
+            image = image.reduce(factor)
+        
+        return image.convert('RGB')
+    
+    def screen(self, image_tensor: torch.Tensor) -> Optional[float]:
+        """
+        Fake probability from the screening model (mean over a batch)
+        
+        Returns:
+            Probability in [0, 1], or None when no screening model is set
+        """
+        if self.screening_model is None:
+            return None
+        with torch.no_grad():
+            probs = torch.softmax(self.screening_model(image_tensor), dim=1)
+        return probs[:, 1].mean().item()
+    
+    def score_batch(self, images: List, return_embedding: bool = False,
+                    batch_size: int = 16) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Full-model probabilities for several images in batched forward passes
+        
+        Args:
+            images: PIL Images, numpy arrays or file paths
+            return_embedding: Also return penultimate-layer features
+            batch_size: Images per forward pass
+            
+        Returns:
+            ((N, 2) array of [real, fake] probabilities, (N, D) features or None)
+        """
+        probs, embeddings = [], []
+        with torch.no_grad():
+            for start in range(0, len(images), batch_size):
+                batch = torch.cat([self.preprocess_image(image) for image in images[start:start + batch_size]])
+                if return_embedding:
+                    logits, features = self.model.forward_with_embedding(batch)
+                    embeddings.append(features.float().cpu().numpy())
+                else:
+                    logits = self.model(batch)
+                probs.append(torch.softmax(logits, dim=1).float().cpu().numpy())
+        return np.concatenate(probs), np.concatenate(embeddings) if embeddings else None
+    
+    def detect(self, image_input, return_embedding: bool = False, screen: bool = True) -> Dict[str, Any]:
         """
         Detect if an image is a deepfake
         
         Args:
             image_input: PIL Image, numpy array, or file path
+            return_embedding: Also return the penultimate-layer features
+                (only produced when the full model runs)
+            screen: Try the screening model first when one is configured
             
         Returns:
-            Dictionary with detection results
+            Dictionary with detection results ("embedding" holds a float32
+            numpy array when return_embedding is set)
         """
         try:
             # Preprocess
             image_tensor = self.preprocess_image(image_input)
             
+            # Cascade: a decisive screening score skips the full model
+            screen_fake = self.screen(image_tensor) if screen else None
+            screened = screen_fake is not None and self.escalation_band.decides(screen_fake)
+            
             # Run inference
-            with torch.no_grad():
-                logits = self.model(image_tensor)
-                probs = torch.softmax(logits, dim=1)
-                real_prob = probs[0][0].item()
-                fake_prob = probs[0][1].item()
+            embedding = None
+            frame_outputs = None
+            if screened:
+                real_prob, fake_prob = 1 - screen_fake, screen_fake
+            else:
+                with torch.no_grad():
+                    if return_embedding or self.keep_frame_outputs:
+                        logits, features = self.model.forward_with_embedding(image_tensor)
+                        embedding = features[0].float().cpu().numpy()
+                    else:
+                        logits = self.model(image_tensor)
+                    probs = torch.softmax(logits, dim=1)
+                    real_prob = probs[0][0].item()
+                    fake_prob = probs[0][1].item()
+                if self.keep_frame_outputs:
+                    frame_outputs = {"image": {
+                        "version": self.model_version,
+                        "probabilities": probs.float().cpu().numpy(),
+                        "features": embedding[None],
+                    }}
             
             # Classify based on threshold
             is_fake = fake_prob > self.confidence_threshold
@@ -130,7 +247,7 @@ class ImageDeepfakeDetector:
                 classification = "Unverifiable"
                 confidence = max(real_prob, fake_prob)
             
-            return {
+            result = {
                 "classification": classification,
                 "confidence_score": round(confidence * 100, 2),
                 "fake_probability": round(fake_prob * 100, 2),
@@ -138,13 +255,23 @@ class ImageDeepfakeDetector:
                 "is_deepfake": is_fake,
                 "model_type": "Image",
                 "details": {
-                    "model": "Xception",
+                    "model": "MobileNetV3-Small (screening)" if screened else "Xception",
                     "architecture": "CNN",
                     "analysis_type": "Spatial (texture artifacts)",
                     "threshold": self.confidence_threshold,
                     "device": str(self.device)
                 }
             }
+            if screen_fake is not None:
+                result["details"]["cascade"] = {
+                    "stage": "screening" if screened else "full",
+                    "screening_fake_probability": round(screen_fake * 100, 2)
+                }
+            if embedding is not None and return_embedding:
+                result["embedding"] = embedding
+            if frame_outputs is not None:
+                result["frame_outputs"] = frame_outputs
+            return result
         
         except Exception as e:
             return {
@@ -0,0 +1,72 @@
+"""
+Screening Model
+Small MobileNetV3 classifier used as the cheap first stage of the detector cascade
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import torch.nn as nn
+
+from .weights import load_model, pretrained_backbone
+
+
+class ScreeningModel(nn.Module):
+    """
+    MobileNetV3-Small real/fake classifier
+
+    Roughly a tenth of EfficientNet-B0's compute, so clear-cut inputs can
+    be decided without running the full model. Needs fine-tuned weights;
+    an ImageNet-only head carries no deepfake signal.
+    """
+    def __init__(self, pretrained: bool = True, in_channels: int = 3):
+        super().__init__()
+        self.model = pretrained_backbone("mobilenet_v3_small", pretrained)
+
+        # 1-channel input for spectrograms
+        if in_channels != 3:
+            first = self.model.features[0][0]
+            self.model.features[0][0] = nn.Conv2d(
+                in_channels, first.out_channels, kernel_size=first.kernel_size,
+                stride=first.stride, padding=first.padding, bias=False
+            )
+
+        num_features = self.model.classifier[3].in_features
+        self.model.classifier[3] = nn.Linear(num_features, 2)  # Binary: Real / Fake
+
+    def forward(self, x):
+        return self.model(x)
+
+
+@dataclass
+class EscalationBand:
+    """
+    Fake-probability band in which the screening verdict is not trusted
+
+    Screening scores at or above `high` are final as Fake, scores at or
+    below `low` are final as Real, and everything in between goes on to
+    the full model.
+    """
+    low: float
+    high: float
+
+    @classmethod
+    def around(cls, confidence_threshold: float, margin: float = 0.1,
+               low: Optional[float] = None, high: Optional[float] = None) -> "EscalationBand":
+        """
+        Band covering the full model's Unverifiable range plus a margin
+
+        Explicit bounds are clamped so screening never finalizes a score
+        the full model would call Unverifiable.
+        """
+        high = confidence_threshold + margin if high is None else high
+        low = 1 - confidence_threshold - margin if low is None else low
+        return cls(low=min(low, 1 - confidence_threshold), high=max(high, confidence_threshold))
+
+    def decides(self, fake_prob: float) -> bool:
+        return fake_prob >= self.high or fake_prob <= self.low
+
+
+def load_screening_model(label: str, model_path: str, device, in_channels: int = 3) -> nn.Module:
+    """Load fine-tuned screening weights (memory-mapped snapshot when available)"""
+    return load_model(ScreeningModel, f"screen-{label}", model_path, device, in_channels=in_channels)
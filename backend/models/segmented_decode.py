@@ -0,0 +1,170 @@
+"""
+Segmented Decode
+Decodes long videos in parallel: the timeline is split into ranges that
+separate processes seek to, decode and sample
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .frame_selection import downscale_frame, thumbnail_signature
+
+Candidate = Tuple[int, np.ndarray, Optional[np.ndarray]]
+
+
+class NotSeekable(Exception):
+    """The container cannot be positioned on an exact frame"""
+
+
+def _init_decoder(cpus: Optional[List[int]]):
+    # Spread over the worker's cores, not the inference lane that spawned us
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    # Parallelism comes from the processes; keep each decoder single-threaded
+    cv2.setNumThreads(1)
+
+
+def decode_segment(video_path: str, start: int, end: int, stride: int,
+                   input_size: int, thumbnail_size: Optional[int]) -> List[Candidate]:
+    """
+    Decode frames [start, end) and keep every stride-th one
+
+    Runs in a decoder process. Seeking lands on the keyframe before
+    `start` and decodes forward, so the first frame returned is exact.
+
+    Returns:
+        (frame index, RGB frame at model size, thumbnail signature or None)
+        tuples in frame order
+
+    Raises:
+        NotSeekable if the capture cannot be positioned on `start`
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+        if start and (not cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                      or int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start):
+            raise NotSeekable(f"Cannot seek to frame {start}")
+
+        candidates = []
+        for frame_idx in range(start, end):
+            if not cap.grab():
+                break
+            if frame_idx % stride:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            frame = downscale_frame(frame, input_size)
+            signature = thumbnail_signature(frame, thumbnail_size) if thumbnail_size else None
+            candidates.append((frame_idx, frame, signature))
+        return candidates
+    finally:
+        cap.release()
+
+
+class SegmentedDecoder:
+    """
+    Pool of decoder processes for videos of at least `min_frames` frames
+
+    The sampled part of the timeline is cut into one range per process,
+    with boundaries on multiples of the sampling stride, so the frames
+    returned are exactly those a sequential pass would sample. Results
+    are concatenated in timestamp order.
+
+    Processes are started with spawn (the parent has torch/OpenMP state
+    that is not fork-safe) on first use. Spawn re-runs the parent's
+    __main__ script in each of them, so the app module must not be
+    __main__ (main.py hands over to uvicorn or server.py when run). They are pinned to the CPUs of
+    the worker's main thread, i.e. the worker's whole slice rather than
+    the inference lane that happened to start them.
+    """
+
+    def __init__(self, processes: int = 4, min_frames: int = 1500):
+        self.processes = processes
+        self.min_frames = min_frames
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+
+        self.segmented = 0
+        self.fallbacks = 0
+
+    def applies(self, total_frames: int) -> bool:
+        return self.processes > 1 and total_frames >= self.min_frames
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                # For the process id, Linux reports the main thread's mask
+                cpus = sorted(os.sched_getaffinity(os.getpid())) if hasattr(os, "sched_getaffinity") else None
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_decoder,
+                    initargs=(cpus,)
+                )
+            return self.pool
+
+    def decode(self, video_path: str, total_frames: int, stride: int, limit: int,
+               input_size: int, thumbnail_size: Optional[int] = None) -> Optional[List[Candidate]]:
+        """
+        Sample every stride-th frame, up to `limit` frames, across processes
+
+        Returns:
+            Candidates in timestamp order, or None when the container
+            cannot be split (not seekable, or the pool failed); the caller
+            then decodes sequentially
+        """
+        end = min(total_frames, stride * limit)
+        steps = -(-end // stride)  # sampled frames in [0, end)
+        per_segment = -(-steps // self.processes)
+        bounds = [
+            (i * per_segment * stride, min(end, (i + 1) * per_segment * stride))
+            for i in range(self.processes) if i * per_segment * stride < end
+        ]
+
+        futures = []
+        try:
+            pool = self._pool()
+            futures = [
+                pool.submit(decode_segment, video_path, start, stop, stride, input_size, thumbnail_size)
+                for start, stop in bounds
+            ]
+            candidates: List[Candidate] = []
+            for future in futures:
+                candidates.extend(future.result())
+        except (NotSeekable, BrokenProcessPool) as e:
+            for future in futures:
+                future.cancel()
+            with self.lock:
+                self.fallbacks += 1
+                if isinstance(e, BrokenProcessPool):
+                    self.pool = None
+            print(f"⚠ Segmented decode unavailable for {os.path.basename(video_path)}: {e}")
+            return None
+
+        with self.lock:
+            self.segmented += 1
+        return candidates
+
+    def shutdown(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "processes": self.processes,
+            "min_frames": self.min_frames,
+            "segmented": self.segmented,
+            "fallbacks": self.fallbacks,
+        }
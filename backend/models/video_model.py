@@ -5,8 +5,12 @@ Frame-based Xception CNN with temporal aggregation
 
 import cv2
 import torch
+import subprocess
 import numpy as np
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from .frame_selection import FrameSelector, downscale_frame
+from .segmented_decode import SegmentedDecoder
+from .media_io import NoAudioTrack, demux_audio
 from .image_model import ImageDeepfakeModel, ImageDeepfakeDetector
 
 
@@ -24,7 +28,14 @@ class VideoDeepfakeDetector:
     Analyzes frames using CNN and aggregates results across time
     """
     
-    def __init__(self, model_path: str = None, confidence_threshold: float = 0.7, device: str = None):
+    # Soundtrack window per audio-model pass (the model's input length)
+    SOUNDTRACK_WINDOW_SECONDS = 5.0
+    # Shortest trailing soundtrack piece still scored on its own
+    SOUNDTRACK_MIN_SECONDS = 1.0
+    
+    def __init__(self, model_path: str = None, confidence_threshold: float = 0.7, device: str = None,
+                 frame_selection: str = "adaptive", scene_threshold: float = 0.06,
+                 decode_processes: int = 0, segment_min_frames: int = 1500, batch_size: int = 16):
         """
         Initialize video deepfake detector
         
@@ -32,6 +43,15 @@ class VideoDeepfakeDetector:
             model_path: Path to pretrained model weights (optional)
             confidence_threshold: Minimum confidence for classification (0.0-1.0)
             device: Device to run model on ('cuda' or 'cpu')
+            frame_selection: 'adaptive' (skip redundant frames, see
+                FrameSelector) or 'uniform' (fixed interval)
+            scene_threshold: Mean thumbnail difference that makes a frame
+                count as new content in adaptive mode
+            decode_processes: Decoder processes for long videos (0 or 1
+                decodes in the calling thread)
+            segment_min_frames: Frame count from which a video is decoded
+                in segments
+            batch_size: Frames per forward pass of the full model
         """
         # Use the image detector for frame-level analysis
         self.image_detector = ImageDeepfakeDetector(
@@ -41,6 +61,36 @@ class VideoDeepfakeDetector:
         )
         self.confidence_threshold = confidence_threshold
         self.device = self.image_detector.device
+        
+        if frame_selection not in ("adaptive", "uniform"):
+            raise ValueError(f"Unknown frame selection mode: {frame_selection}")
+        self.frame_selector = FrameSelector(scene_threshold) if frame_selection == "adaptive" else None
+        self.segmented_decoder = SegmentedDecoder(decode_processes, segment_min_frames) \
+            if decode_processes > 1 else None
+        self.batch_size = batch_size
+        
+        # Attach per-frame outputs under "frame_outputs" for the feature store
+        self.keep_frame_outputs = False
+        
+        # fn, *args -> Future running the soundtrack beside frame decoding
+        # (the audio CPU lane, set by MultiModalDeepfakeDetector); without
+        # it the soundtrack is scored after the frames on the calling thread
+        self.soundtrack_submit: Optional[Callable] = None
+    
+    def downscale_frame(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Shrink a decoded BGR frame to model resolution and convert to RGB
+        
+        Resizing happens before colour conversion so cvtColor and all later
+        copies only touch the small buffer.
+        
+        Args:
+            frame: BGR frame as returned by OpenCV
+            
+        Returns:
+            RGB frame at model input size
+        """
+        return downscale_frame(frame, self.image_detector.input_size)
     
     def extract_frames(self, video_path: str, max_frames: int = 30):
         """
@@ -65,29 +115,304 @@ class VideoDeepfakeDetector:
         frames_extracted = 0
         
         while cap.isOpened() and frames_extracted < max_frames:
-            ret, frame = cap.read()
-            if not ret:
+            # Advance the demuxer/decoder without copying out skipped frames
+            if not cap.grab():
                 break
             
             # Sample frames at intervals
             if frame_idx % interval == 0:
-                # Convert BGR to RGB
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                yield frame_rgb
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                
+                yield self.downscale_frame(frame)
                 frames_extracted += 1
             
             frame_idx += 1
         
         cap.release()
     
-    def detect(self, video_path: str, max_frames: int = 30) -> Dict[str, Any]:
+    def select_frames(self, video_path: str, max_frames: int = 30) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+        """
+        Choose the frames to analyze with the configured selection mode
+        
+        Returns:
+            (RGB frames at model input size, selection statistics)
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if self.segmented_decoder is not None and self.segmented_decoder.applies(total_frames):
+                selected = self.select_frames_segmented(video_path, total_frames, max_frames)
+                if selected is not None:
+                    return selected
+            
+            if self.frame_selector is None:
+                cap.release()
+                frames = list(self.extract_frames(video_path, max_frames))
+                return frames, {"mode": "uniform", "decode": "sequential", "selected": len(frames)}
+            frames, selection = self.frame_selector.select(cap, max_frames, self.downscale_frame)
+            selection["decode"] = "sequential"
+            return frames, selection
+        finally:
+            cap.release()
+    
+    def select_frames_segmented(self, video_path: str, total_frames: int,
+                                max_frames: int) -> Optional[Tuple[List[np.ndarray], Dict[str, Any]]]:
+        """
+        select_frames() with decoding spread over the decoder processes
+        
+        Samples the same frames as a sequential pass. Returns None when the
+        container cannot be split, so the caller decodes sequentially.
+        """
+        decoder = self.segmented_decoder
+        size = self.image_detector.input_size
+        
+        if self.frame_selector is None:
+            interval = max(1, total_frames // max_frames)
+            candidates = decoder.decode(video_path, total_frames, interval, max_frames, size)
+            if candidates is None:
+                return None
+            frames = [frame for _, frame, _ in candidates]
+            selection = {"mode": "uniform", "selected": len(frames)}
+        else:
+            stride, limit = self.frame_selector.plan(total_frames, max_frames)
+            candidates = decoder.decode(
+                video_path, total_frames, stride, limit, size, self.frame_selector.thumbnail_size
+            )
+            if candidates is None:
+                return None
+            frames, selection = self.frame_selector.choose(candidates, max_frames, min(limit, total_frames))
+        
+        selection.update(decode="segmented", segments=decoder.processes)
+        return frames, selection
+    
+    def detect(self, video_path: str, max_frames: int = 30, return_embedding: bool = False,
+               audio_detector=None) -> Dict[str, Any]:
         """
         Detect if a video is a deepfake
+        
+        With an audio_detector the soundtrack is demuxed (audio stream
+        only, by ffmpeg) and scored through soundtrack_submit while the
+        frames are decoded and scored, and the verdict covers both tracks.
+        The soundtrack is scored in windows spread over its whole length,
+        up to max_frames of them (see analyze_soundtrack()).
+        
+        Args:
+            video_path: Path to the video file
+            max_frames: Maximum number of frames to analyze
+            return_embedding: Also return the mean penultimate-layer
+                features across analyzed frames
+            audio_detector: Optional AudioDeepfakeDetector for the soundtrack
+            
+        Returns:
+            Dictionary with detection results
+        """
+        if audio_detector is None:
+            return self.detect_frames(video_path, max_frames, return_embedding)
+        
+        if self.soundtrack_submit is None:
+            result = self.detect_frames(video_path, max_frames, return_embedding)
+            if "error" in result:
+                return result
+            audio_result = self.analyze_soundtrack(video_path, audio_detector, max_frames)
+        else:
+            soundtrack = self.soundtrack_submit(self.analyze_soundtrack, video_path, audio_detector, max_frames)
+            result = self.detect_frames(video_path, max_frames, return_embedding)
+            audio_result = soundtrack.result()
+            if "error" in result:
+                return result
+        return self.fuse(result, audio_result)
+    
+    def soundtrack_pieces(self, video_path: str, max_windows: int) -> Tuple[List[Tuple[float, np.ndarray]], int, float]:
+        """
+        Cut the first audio track into audio-model windows
+        
+        Tracks of up to `max_windows` windows are decoded in one pass and
+        covered end to end. Longer ones get `max_windows` windows centred
+        in equal slices of the whole track (each seeked to, not decoded
+        from the start), as frames are spread over the whole video.
+        
+        Returns:
+            ([(start seconds, samples)], sample rate, container duration
+            in seconds or 0 if unknown)
+        
+        Raises:
+            NoAudioTrack, FileNotFoundError, subprocess.TimeoutExpired,
+            ValueError as demux_audio()
+        """
+        window = self.SOUNDTRACK_WINDOW_SECONDS
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        duration = total_frames / fps if fps > 0 else 0
+        
+        if duration <= window * max_windows:
+            samples, sample_rate = demux_audio(video_path, duration=window * max_windows)
+            size = int(window * sample_rate)
+            pieces = [(i / sample_rate, samples[i:i + size]) for i in range(0, len(samples), size)]
+            # A short trailing piece only counts if it is all there is
+            kept = [piece for piece in pieces if len(piece[1]) >= self.SOUNDTRACK_MIN_SECONDS * sample_rate]
+            return kept or pieces[:1], sample_rate, duration
+        
+        step = duration / max_windows
+        pieces, sample_rate = [], 0
+        for i in range(max_windows):
+            start = i * step + (step - window) / 2
+            try:
+                samples, sample_rate = demux_audio(video_path, duration=window, start=start)
+            except NoAudioTrack:
+                # The soundtrack may end before the picture does
+                continue
+            pieces.append((start, samples))
+        if not pieces:
+            raise NoAudioTrack("audio stream is empty")
+        return pieces, sample_rate, duration
+    
+    def analyze_soundtrack(self, video_path: str, audio_detector, max_windows: int = 30) -> Dict[str, Any]:
+        """
+        Run the audio detector over the container's first audio track
+        
+        Each SOUNDTRACK_WINDOW_SECONDS window (the audio model's input
+        length) from soundtrack_pieces() is scored, and the window scores
+        are mean-pooled like frame scores. details lists each window.
+        """
+        try:
+            pieces, sample_rate, track_seconds = self.soundtrack_pieces(video_path, max_windows)
+        except NoAudioTrack as e:
+            return {"classification": "Error", "error": f"No audio track: {e}", "model_type": "Audio"}
+        except (FileNotFoundError, subprocess.TimeoutExpired, ValueError) as e:
+            return {"classification": "Error", "error": f"Audio demux failed: {e}", "model_type": "Audio"}
+        
+        results = []
+        for _, samples in pieces:
+            result = audio_detector.detect_waveform(samples, sample_rate, duration=self.SOUNDTRACK_WINDOW_SECONDS)
+            if "error" in result:
+                return result
+            results.append(result)
+        
+        fake_prob = float(np.mean([r["fake_probability"] for r in results])) / 100.0
+        real_prob = float(np.mean([r["real_probability"] for r in results])) / 100.0
+        is_fake = fake_prob > self.confidence_threshold
+        is_real = real_prob > self.confidence_threshold
+        if is_fake:
+            classification, confidence = "Fake", fake_prob
+        elif is_real:
+            classification, confidence = "Real", real_prob
+        else:
+            classification, confidence = "Unverifiable", max(real_prob, fake_prob)
+        
+        covered = sum(len(samples) for _, samples in pieces) / sample_rate
+        details = dict(results[0]["details"])
+        details.update({
+            "duration_seconds": round(covered, 2),
+            "track_seconds": round(track_seconds, 2) if track_seconds else None,
+            "window_seconds": self.SOUNDTRACK_WINDOW_SECONDS,
+            "windows": [
+                {"start_seconds": round(start, 2), "fake_probability": r["fake_probability"]}
+                for (start, _), r in zip(pieces, results)
+            ],
+        })
+        cascades = [r["details"]["cascade"] for r in results if "cascade" in r["details"]]
+        if cascades:
+            details["cascade"] = {
+                "stage": "full" if any(c["stage"] == "full" for c in cascades) else "screening",
+                "screening_fake_probability": round(float(np.mean(
+                    [c["screening_fake_probability"] for c in cascades])), 2),
+            }
+        
+        combined = {
+            "classification": classification,
+            "confidence_score": round(confidence * 100, 2),
+            "fake_probability": round(fake_prob * 100, 2),
+            "real_probability": round(real_prob * 100, 2),
+            "is_deepfake": is_fake,
+            "model_type": "Audio",
+            "details": details,
+        }
+        # Per-window outputs for the feature store (screened windows have none)
+        outputs = [r["frame_outputs"]["audio"] for r in results if "frame_outputs" in r]
+        if outputs and len(outputs) == len(results):
+            combined["frame_outputs"] = {"audio": {
+                "version": outputs[0]["version"],
+                "probabilities": np.concatenate([o["probabilities"] for o in outputs]),
+                "features": np.concatenate([o["features"] for o in outputs]),
+            }}
+        return combined
+    
+    def fuse(self, video_result: Dict[str, Any], audio_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Combine frame and soundtrack verdicts
+        
+        The more suspicious track decides: an authentic picture with a
+        cloned voice is still a deepfake. Without a usable soundtrack the
+        frame verdict stands.
+        """
+        details = video_result["details"]
+        if "frame_outputs" in audio_result:
+            video_result.setdefault("frame_outputs", {}).update(audio_result["frame_outputs"])
+        if "error" in audio_result:
+            details["audio_track"] = {"analyzed": False, "reason": audio_result["error"]}
+            return video_result
+        
+        audio_details = audio_result.get("details", {})
+        details["audio_track"] = {
+            "analyzed": True,
+            "classification": audio_result["classification"],
+            "fake_probability": audio_result["fake_probability"],
+            "real_probability": audio_result["real_probability"],
+            "model": audio_details.get("model"),
+            "sample_rate": audio_details.get("sample_rate"),
+            "duration_seconds": audio_details.get("duration_seconds"),
+            "track_seconds": audio_details.get("track_seconds"),
+            "windows": audio_details.get("windows"),
+        }
+        if "cascade" in audio_details:
+            details["audio_track"]["cascade"] = audio_details["cascade"]
+        
+        fake_prob = max(video_result["fake_probability"], audio_result["fake_probability"]) / 100.0
+        real_prob = min(video_result["real_probability"], audio_result["real_probability"]) / 100.0
+        is_fake = fake_prob > self.confidence_threshold
+        is_real = real_prob > self.confidence_threshold
+        
+        if is_fake:
+            classification = "Fake"
+            confidence = fake_prob
+        elif is_real:
+            classification = "Real"
+            confidence = real_prob
+        else:
+            classification = "Unverifiable"
+            confidence = max(real_prob, fake_prob)
+        
+        details["fusion"] = {
+            "rule": "max_fake_probability",
+            "video_fake_probability": video_result["fake_probability"],
+            "audio_fake_probability": audio_result["fake_probability"],
+        }
+        details["analysis_type"] = "Spatial + Temporal + Audio"
+        video_result.update({
+            "classification": classification,
+            "confidence_score": round(confidence * 100, 2),
+            "fake_probability": round(fake_prob * 100, 2),
+            "real_probability": round(real_prob * 100, 2),
+            "is_deepfake": is_fake,
+        })
+        return video_result
+    
+    def detect_frames(self, video_path: str, max_frames: int = 30, return_embedding: bool = False) -> Dict[str, Any]:
+        """
+        Frame-only detection
         Uses frame-level CNN analysis with temporal aggregation
         
         Args:
             video_path: Path to the video file
             max_frames: Maximum number of frames to analyze
+            return_embedding: Also return the mean penultimate-layer
+                features across analyzed frames
             
         Returns:
             Dictionary with detection results (aggregated across frames)
@@ -102,15 +427,36 @@ class VideoDeepfakeDetector:
             
             # Analyze frames
             frame_probs = []  # Store (real_prob, fake_prob) tuples
+            frame_embeddings = []
+            frames, selection = self.select_frames(video_path, max_frames)
             
-            for frame in self.extract_frames(video_path, max_frames):
-                result = self.image_detector.detect(frame)
-                
-                if "error" not in result:
-                    frame_probs.append((
-                        result["real_probability"] / 100.0,
-                        result["fake_probability"] / 100.0
-                    ))
+            # Cascade: screen all frames in one batch; a decisive mean
+            # score skips the full model
+            screen_fake = None
+            if self.image_detector.screening_model is not None and frames:
+                batch = torch.cat([self.image_detector.preprocess_image(f) for f in frames])
+                screen_fake = self.image_detector.screen(batch)
+            screened = screen_fake is not None and self.image_detector.escalation_band.decides(screen_fake)
+            if screened:
+                frame_probs = [(1 - screen_fake, screen_fake)] * len(frames)
+                frames = []
+            
+            frame_outputs = None
+            if frames:
+                probs, embeddings = self.image_detector.score_batch(
+                    frames, return_embedding=return_embedding or self.keep_frame_outputs,
+                    batch_size=self.batch_size
+                )
+                frame_probs = [(float(real), float(fake)) for real, fake in probs]
+                if return_embedding:
+                    frame_embeddings = list(embeddings)
+                if self.keep_frame_outputs:
+                    frame_outputs = {"video": {
+                        "version": self.image_detector.model_version,
+                        "probabilities": probs,
+                        "features": embeddings,
+                        "frame_indices": selection.get("frame_indices"),
+                    }}
             
             # Check if any frames were analyzed
             if len(frame_probs) == 0:
@@ -144,7 +490,7 @@ class VideoDeepfakeDetector:
                 classification = "Unverifiable"
                 confidence = max(avg_real_prob, avg_fake_prob)
             
-            return {
+            result = {
                 "classification": classification,
                 "confidence_score": round(confidence * 100, 2),
                 "fake_probability": round(avg_fake_prob * 100, 2),
@@ -152,10 +498,11 @@ class VideoDeepfakeDetector:
                 "is_deepfake": is_fake,
                 "model_type": "Video",
                 "details": {
-                    "model": "Xception",
+                    "model": "MobileNetV3-Small (screening)" if screened else "Xception",
                     "architecture": "CNN + Temporal Aggregation",
                     "analysis_type": "Spatial + Temporal",
                     "frames_analyzed": len(frame_probs),
+                    "frame_selection": selection,
                     "total_frames": total_frames,
                     "duration_seconds": round(duration, 2),
                     "fps": round(fps, 2),
@@ -163,6 +510,16 @@ class VideoDeepfakeDetector:
                     "device": str(self.device)
                 }
             }
+            if screen_fake is not None:
+                result["details"]["cascade"] = {
+                    "stage": "screening" if screened else "full",
+                    "screening_fake_probability": round(screen_fake * 100, 2)
+                }
+            if frame_embeddings:
+                result["embedding"] = np.mean(frame_embeddings, axis=0).astype(np.float32)
+            if frame_outputs is not None:
+                result["frame_outputs"] = frame_outputs
+            return result
         
         except Exception as e:
             return {
@@ -170,3 +527,8 @@ class VideoDeepfakeDetector:
                 "error": str(e),
                 "model_type": "Video"
             }
+    
+    def close(self):
+        """Stop the decoder processes"""
+        if self.segmented_decoder is not None:
+            self.segmented_decoder.shutdown()
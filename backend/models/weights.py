@@ -0,0 +1,144 @@
+"""
+Model weight loading
+Local weight cache and memory-mapped, pre-materialized model snapshots
+"""
+
+import hashlib
+import os
+import warnings
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+MODEL_CACHE_DIR = Path(os.getenv("MODEL_CACHE_DIR", "./model_cache"))
+# Fast-start servers build models on the request path, where a weight
+# download would stall the first request, so they only use cached weights
+FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+# Never touch the network for weights (default: on with FAST_START); missing
+# ImageNet weights -> random init, or an error under FAST_START
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", str(FAST_START)).lower() == "true"
+# Save fully constructed models and mmap-load them on later starts
+MODEL_MATERIALIZE = os.getenv("MODEL_MATERIALIZE", "true").lower() == "true"
+
+
+def pretrained_backbone(name: str, pretrained: bool = True) -> nn.Module:
+    """
+    Build a torchvision backbone with ImageNet weights from the local cache
+
+    Weights are looked up under MODEL_CACHE_DIR/hub and only downloaded
+    when missing and MODEL_OFFLINE is not set.
+
+    Args:
+        name: torchvision model builder name (e.g. 'efficientnet_b0')
+        pretrained: Load ImageNet weights at all
+
+    Returns:
+        Constructed backbone
+
+    Raises:
+        FileNotFoundError under FAST_START when the weights are offline
+        and not cached, rather than serving verdicts from a random init
+    """
+    import torchvision.models as tv_models
+
+    builder = getattr(tv_models, name)
+    if not pretrained:
+        return builder(weights=None)
+
+    torch.hub.set_dir(str(MODEL_CACHE_DIR / "hub"))
+    weights = tv_models.get_model_weights(name).DEFAULT
+    cached = MODEL_CACHE_DIR / "hub" / "checkpoints" / os.path.basename(weights.url)
+
+    if MODEL_OFFLINE and not cached.exists():
+        if FAST_START:
+            raise FileNotFoundError(
+                f"{name} weights are not in {cached.parent} and FAST_START only uses cached weights; "
+                "start once without FAST_START to populate MODEL_CACHE_DIR (or set MODEL_OFFLINE=false)"
+            )
+        warnings.warn(f"{name} weights not in {cached.parent} and MODEL_OFFLINE is set; using random init")
+        backbone = builder(weights=None)
+        # Keeps load_model() from snapshotting an untrained backbone
+        backbone.pretrained_weights_missing = True
+        return backbone
+
+    return builder(weights=weights)
+
+
+def model_version(label: str, model_path: str = None) -> str:
+    """
+    Short identifier of the weights a detector runs with
+
+    Keyed by the custom weights file, its size and mtime ("base" without
+    one), so stored model outputs can be matched to the weights that
+    produced them.
+    """
+    if not model_path or not os.path.exists(model_path):
+        return f"{label}-base"
+    stat = os.stat(model_path)
+    key = f"{os.path.abspath(model_path)}|{stat.st_size}|{stat.st_mtime}"
+    return f"{label}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+
+
+def _snapshot_path(label: str, model_path: str = None) -> Path:
+    """Snapshot file name keyed by the custom weights file and its mtime"""
+    key = f"{label}|{torch.__version__}"
+    if model_path and os.path.exists(model_path):
+        key += f"|{os.path.abspath(model_path)}|{os.path.getmtime(model_path)}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    return MODEL_CACHE_DIR / "materialized" / f"{label}-{digest}.pt"
+
+
+def load_model(model_cls, label: str, model_path: str = None, device=None, **model_kwargs) -> nn.Module:
+    """
+    Construct a detector model, preferring a memory-mapped snapshot
+
+    On a snapshot hit the module is built on the meta device (no weight
+    init, no download) and its parameters are assigned straight from the
+    mmap'd file, so load time is close to zero and pages are shared
+    between processes. On a miss the model is built normally, custom
+    weights from model_path are applied, and a snapshot is written.
+
+    Args:
+        model_cls: nn.Module subclass accepting a `pretrained` keyword
+        label: Short name for messages and the snapshot file
+        model_path: Optional fine-tuned state_dict
+        device: Target device
+        **model_kwargs: Extra constructor arguments
+
+    Returns:
+        Model in eval mode on `device`
+    """
+    snapshot = _snapshot_path(label, model_path)
+
+    if MODEL_MATERIALIZE and snapshot.exists():
+        try:
+            with torch.device("meta"):
+                model = model_cls(pretrained=False, **model_kwargs)
+            state = torch.load(snapshot, map_location="cpu", mmap=True, weights_only=True)
+            model.load_state_dict(state, assign=True)
+            return model.to(device).eval()
+        except Exception as e:
+            print(f"⚠ Could not load {label} snapshot ({e}); rebuilding")
+
+    model = model_cls(**model_kwargs)
+
+    if model_path:
+        try:
+            model.load_state_dict(torch.load(model_path, map_location="cpu"))
+            print(f"✔ Loaded trained {label} model from {model_path}")
+        except Exception as e:
+            print(f"⚠ Could not load custom {label} model: {e}")
+            print("  Using pretrained base model")
+
+    weights_missing = any(getattr(m, "pretrained_weights_missing", False) for m in model.modules())
+    if MODEL_MATERIALIZE and not weights_missing:
+        try:
+            snapshot.parent.mkdir(parents=True, exist_ok=True)
+            tmp = snapshot.with_suffix(".tmp")
+            torch.save(model.state_dict(), tmp)
+            os.replace(tmp, snapshot)
+        except Exception as e:
+            print(f"⚠ Could not write {label} snapshot: {e}")
+
+    return model.to(device).eval()
@@ -0,0 +1,152 @@
+"""
+Pre-fork multi-worker server
+Loads model weights once in the parent and forks workers that share them
+copy-on-write
+
+Usage:
+    WEB_CONCURRENCY=4 python server.py
+
+Environment:
+    WEB_CONCURRENCY            Number of worker processes (default 1)
+    TORCH_THREADS_PER_WORKER   Intra-op threads per worker
+                               (default: CPU count // workers)
+    BACKEND_HOST / BACKEND_PORT
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+# Parent must not start an OpenMP pool before forking: libgomp is not
+# fork-safe, so keep the loader single-threaded until workers are created
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ["FAST_START"] = "false"
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Create the listening socket shared by all workers"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def share_model_memory(ai_detector):
+    """
+    Move every model tensor into shared memory before forking
+
+    Parameters loaded from mmap'd snapshots are already file-backed and
+    shared; anything else is moved to shared memory so later refcount or
+    allocator activity in a worker cannot trigger a private copy.
+    """
+    for model in ai_detector.iter_models():
+        model.share_memory()
+
+
+def run_worker(sock: socket.socket, threads: int, worker_id: int):
+    """Worker process body: tune threading and serve on the shared socket"""
+    import torch
+    import uvicorn
+    import main
+    from database.database import engine
+
+    # Give each worker its own slice of cores; the CPU scheduler then
+    # splits that slice between inference lanes
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if os.getenv("CPU_PIN_THREADS", "true").lower() == "true" and len(cpus) >= threads * (worker_id + 1):
+        os.sched_setaffinity(0, cpus[worker_id * threads:(worker_id + 1) * threads])
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+    # Pooled DB connections must not be shared with the parent
+    engine.dispose(close=False)
+
+    os.environ["WORKER_ID"] = str(worker_id)
+    config = uvicorn.Config(main.app, log_level="info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main():
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    host = os.getenv("BACKEND_HOST", "0.0.0.0")
+    port = int(os.getenv("BACKEND_PORT", "8000"))
+    threads = int(os.getenv(
+        "TORCH_THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // max(workers, 1)))
+    ))
+
+    import torch
+    torch.set_num_threads(1)
+
+    # Importing the app builds every detector once, here in the parent
+    import main as app_module
+    app_module.ai_detector.preload()
+    share_model_memory(app_module.ai_detector)
+
+    # Objects allocated so far are long-lived; keep the GC from touching
+    # (and thereby un-sharing) their pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(host, port)
+    print(f"🧩 Pre-fork server on {host}:{port}: {workers} workers x {threads} threads")
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(sock, threads, worker_id)
+            finally:
+                os._exit(0)
+        children[pid] = worker_id
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for worker_id in range(workers):
+        spawn(worker_id)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        worker_id = children.pop(pid, None)
+        if worker_id is not None and not stopping:
+            print(f"⚠ Worker {worker_id} (pid {pid}) exited with status {status}; restarting")
+            time.sleep(1)
+            spawn(worker_id)
+
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Admission Control
+Per-modality cost budgets and bounded wait queues for analysis requests
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint"""
+
+    def __init__(self, modality: str, reason: str, retry_after: int):
+        super().__init__(f"{modality} analysis is saturated ({reason}); retry in {retry_after}s")
+        self.modality = modality
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class Ticket:
+    """An admitted request holding `cost` units of its gate's capacity"""
+    modality: str
+    cost: float
+    admitted_at: float = field(default_factory=time.monotonic)
+
+
+class ModalityGate:
+    """
+    Cost-weighted semaphore with a bounded FIFO wait queue
+
+    A request is admitted while the admitted cost stays within `capacity`.
+    Otherwise it waits in FIFO order, so one large video cannot be starved
+    by a stream of small ones. Requests are rejected right away when
+    `max_queue` requests are already waiting, or after `queue_timeout`
+    seconds in the queue. A request costing more than the whole capacity
+    is clamped and runs alone.
+    """
+
+    def __init__(self, name: str, capacity: float, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.lock = threading.Lock()
+        self.in_use = 0.0
+        self.active = 0
+        self.waiters: deque = deque()  # [cost, future, granted]
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_seconds = 0.0
+        self.max_queue_depth = 0
+        # EWMA of service time per cost unit, used for Retry-After
+        self.seconds_per_unit = 1.0
+
+    def queued_cost(self) -> float:
+        return sum(waiter[0] for waiter in self.waiters)
+
+    def retry_after(self, cost: float = 0.0) -> int:
+        """Seconds until the queued work ahead of a new request has drained"""
+        pending = self.in_use + self.queued_cost() + cost
+        return int(min(300, max(1, math.ceil(pending * self.seconds_per_unit))))
+
+    def _fits(self, cost: float) -> bool:
+        return self.in_use + cost <= self.capacity or self.active == 0
+
+    def _grant(self, cost: float):
+        self.in_use += cost
+        self.active += 1
+        self.admitted += 1
+
+    async def acquire(self, cost: float) -> Ticket:
+        cost = min(cost, self.capacity)
+        queued_at = time.monotonic()
+
+        with self.lock:
+            if not self.waiters and self._fits(cost):
+                self._grant(cost)
+                return Ticket(self.name, cost)
+
+            if len(self.waiters) >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(self.name, "queue full", self.retry_after(cost))
+
+            waiter = [cost, asyncio.get_running_loop().create_future(), False]
+            self.waiters.append(waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self.waiters))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self.lock:
+                # The future is resolved after the grant, so check the flag
+                if waiter[2]:
+                    # Granted just as we gave up; hand the capacity back
+                    self._release(cost)
+                else:
+                    self.waiters.remove(waiter)
+                    self._wake()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self.rejected_timeout += 1
+                raise AdmissionRejected(self.name, "queue timeout", self.retry_after(cost))
+
+        with self.lock:
+            self.wait_seconds += time.monotonic() - queued_at
+        return Ticket(self.name, cost)
+
+    def release(self, ticket: Ticket):
+        elapsed = time.monotonic() - ticket.admitted_at
+        with self.lock:
+            if ticket.cost > 0:
+                self.seconds_per_unit = 0.8 * self.seconds_per_unit + 0.2 * (elapsed / ticket.cost)
+            self._release(ticket.cost)
+
+    def _release(self, cost: float):
+        self.in_use = max(0.0, self.in_use - cost)
+        self.active -= 1
+        self._wake()
+
+    def _wake(self):
+        """Admit waiters from the head of the queue while they fit"""
+        while self.waiters and self._fits(self.waiters[0][0]):
+            waiter = self.waiters.popleft()
+            cost, future = waiter[0], waiter[1]
+            if future.done():
+                continue
+            self._grant(cost)
+            waiter[2] = True
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "capacity": self.capacity,
+                "in_use": round(self.in_use, 2),
+                "active": self.active,
+                "queued": len(self.waiters),
+                "queued_cost": round(self.queued_cost(), 2),
+                "max_queue": self.max_queue,
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "mean_wait_ms": round(1000 * self.wait_seconds / max(self.admitted, 1), 2),
+                "seconds_per_unit": round(self.seconds_per_unit, 3),
+            }
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AdmissionController:
+    """
+    Admission gates for image, video and audio analysis
+
+    Costs are in rough units of one image analysis. Videos are priced by
+    how many frames get decoded and analyzed, scaled by resolution. Audio
+    is priced by file size.
+    """
+
+    # Frames the video detector samples per file
+    VIDEO_ANALYZED_FRAMES = 30
+    # Decoded 720p frames that cost about as much as one analyzed frame
+    VIDEO_DECODE_RATIO = 50
+
+    def __init__(self, capacities: Dict[str, float], max_queue: Dict[str, int],
+                 queue_timeout: float = 30.0, enabled: bool = True):
+        self.enabled = enabled
+        self.gates = {
+            modality: ModalityGate(modality, capacities[modality], max_queue[modality], queue_timeout)
+            for modality in capacities
+        }
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Environment:
+            ADMISSION_CONTROL_ENABLED    Apply limits (default true)
+            ADMISSION_<MODALITY>_CAPACITY  Concurrent cost units
+                                           (image 8, video 16, audio 4)
+            ADMISSION_<MODALITY>_QUEUE     Waiting requests (image 64, video 8, audio 16)
+            ADMISSION_QUEUE_TIMEOUT      Seconds a request may wait (default 30)
+        """
+        defaults = {"image": (8, 64), "video": (16, 8), "audio": (4, 16)}
+        capacities, queues = {}, {}
+        for modality, (capacity, queue) in defaults.items():
+            prefix = f"ADMISSION_{modality.upper()}"
+            capacities[modality] = float(os.getenv(f"{prefix}_CAPACITY", str(capacity)))
+            queues[modality] = int(os.getenv(f"{prefix}_QUEUE", str(queue)))
+        return cls(
+            capacities,
+            queues,
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30")),
+            enabled=os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true",
+        )
+
+    def estimate_cost(self, file_path: str, modality: str) -> float:
+        """
+        Estimate the work of analyzing a staged file
+
+        Args:
+            file_path: Path to the staged upload
+            modality: 'image', 'video' or 'audio'
+
+        Returns:
+            Cost in image-analysis units
+        """
+        size_mb = os.path.getsize(file_path) / (1024 * 1024)
+
+        if modality == "image":
+            # Large images are draft-decoded, so size only matters a little
+            return 1.0 + min(size_mb, 50) / 25
+
+        if modality == "audio":
+            return 1.0 + min(size_mb, 100) / 20
+
+        if modality == "video":
+            try:
+                import cv2
+                cap = cv2.VideoCapture(file_path)
+                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                pixels = cap.get(cv2.CAP_PROP_FRAME_WIDTH) * cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+                cap.release()
+            except Exception:
+                total_frames, pixels = 0, 0
+            if total_frames <= 0 or pixels <= 0:
+                # Unknown container metadata; fall back to size
+                return 1.0 + size_mb / 5
+
+            scale = pixels / (1280 * 720)
+            analyzed = min(total_frames, self.VIDEO_ANALYZED_FRAMES)
+            decoded = total_frames * scale / self.VIDEO_DECODE_RATIO
+            return 1.0 + analyzed * max(scale, 0.25) / 4 + decoded
+
+        return 1.0
+
+    async def acquire(self, modality: str, cost: float) -> Optional[Ticket]:
+        """Wait for admission; raises AdmissionRejected when saturated"""
+        gate = self.gates.get(modality)
+        if not self.enabled or gate is None:
+            return None
+        return await gate.acquire(cost)
+
+    def release(self, ticket: Optional[Ticket]):
+        if ticket is not None:
+            self.gates[ticket.modality].release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "gates": {modality: gate.stats() for modality, gate in self.gates.items()},
+        }
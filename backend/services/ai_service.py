@@ -3,11 +3,11 @@ Multi-Modal Deepfake Detection Service
 Supports image, video, and audio deepfake detection
 """
 
+import functools
 import os
-from typing import Dict, Any
-from models.image_model import ImageDeepfakeDetector
-from models.video_model import VideoDeepfakeDetector
-from models.audio_model import AudioDeepfakeDetector
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
 
 
 class MultiModalDeepfakeDetector:
@@ -17,13 +17,37 @@ class MultiModalDeepfakeDetector:
     - Image: Xception CNN for spatial texture artifacts
     - Video: Xception CNN + temporal aggregation
     - Audio: Mel-spectrogram + ResNet18 CNN
+    
+    With lazy=True each modality's detector (and torch/torchvision/OpenCV/
+    librosa) is only imported and built on first use. With a CPUScheduler,
+    detect_async() runs each modality on its own cores and thread budget,
+    and a video's soundtrack is scored on the audio lane.
+    
+    Modalities given screening weights run as a two-stage cascade: a
+    MobileNetV3-Small model scores every input, and only scores inside the
+    escalation band (the full model's Unverifiable range plus a margin)
+    go on to the full model.
     """
     
+    MODALITIES = ("image", "video", "audio")
+    
     def __init__(self, 
                  image_model_path: str = None,
                  video_model_path: str = None,
                  audio_model_path: str = None,
-                 confidence_threshold: float = 0.7):
+                 confidence_threshold: float = 0.7,
+                 lazy: bool = False,
+                 scheduler=None,
+                 screening_model_paths: Dict[str, str] = None,
+                 escalation_band: Tuple[Optional[float], Optional[float]] = (None, None),
+                 escalation_margin: float = 0.1,
+                 frame_selection: str = "adaptive",
+                 scene_threshold: float = 0.06,
+                 joint_audio: bool = True,
+                 decode_processes: int = 0,
+                 segment_min_frames: int = 1500,
+                 frame_batch_size: int = 16,
+                 keep_frame_outputs: bool = False):
         """
         Initialize multi-modal deepfake detector
         
@@ -32,94 +56,263 @@ class MultiModalDeepfakeDetector:
             video_model_path: Path to video model weights (optional)
             audio_model_path: Path to audio model weights (optional)
             confidence_threshold: Minimum confidence for classification (0.0-1.0)
+            lazy: Defer loading each modality until it is first used
+            scheduler: Optional CPUScheduler used by detect_async()
+            screening_model_paths: Fine-tuned screening weights per modality;
+                modalities without one always run the full model
+            escalation_band: Explicit (low, high) fake-probability bounds of
+                the escalation band; None derives a bound from the threshold
+            escalation_margin: Widening of the derived band on each side
+            frame_selection: Video frame selection, 'adaptive' or 'uniform'
+            scene_threshold: Novelty needed for an adaptive frame pick
+            joint_audio: Also score a video's soundtrack and fuse the verdicts
+            decode_processes: Processes decoding segments of long videos
+            segment_min_frames: Frame count from which videos are segmented
+            frame_batch_size: Video frames per forward pass
+            keep_frame_outputs: Return per-frame probabilities and features
+                under "frame_outputs" (for the feature store)
         """
+        self.model_paths = {
+            "image": image_model_path,
+            "video": video_model_path,
+            "audio": audio_model_path,
+        }
+        self.confidence_threshold = confidence_threshold
+        self.detectors: Dict[str, Any] = {}
+        self.load_times: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.scheduler = scheduler
+        self.screening_model_paths = {
+            modality: path for modality, path in (screening_model_paths or {}).items() if path
+        }
+        self.escalation_band = escalation_band
+        self.escalation_margin = escalation_margin
+        self.cascade_counts: Dict[str, Dict[str, int]] = {}
+        self.joint_audio = joint_audio
+        self.keep_frame_outputs = keep_frame_outputs
+        self.video_options = {
+            "frame_selection": frame_selection,
+            "scene_threshold": scene_threshold,
+            "decode_processes": decode_processes,
+            "segment_min_frames": segment_min_frames,
+            "batch_size": frame_batch_size,
+        }
+        
+        if not lazy:
+            self.preload()
+    
+    def preload(self):
+        """Load every modality now"""
         print("🚀 Initializing Multi-Modal Deepfake Detector...")
+        for modality in self.MODALITIES:
+            self.get_detector(modality)
+        print("✅ Multi-Modal Detector Ready!")
+    
+    def get_detector(self, modality: str):
+        """Return the detector for a modality, loading it on first use"""
+        detector = self.detectors.get(modality)
+        if detector is not None:
+            return detector
         
-        # Initialize image detector
-        print("  📸 Loading Image Model...")
-        self.image_detector = ImageDeepfakeDetector(
-            model_path=image_model_path,
-            confidence_threshold=confidence_threshold
-        )
+        with self.lock:
+            if modality in self.detectors:
+                return self.detectors[modality]
+            
+            start = time.perf_counter()
+            if modality == "image":
+                print("  📸 Loading Image Model...")
+                from models.image_model import ImageDeepfakeDetector
+                detector = ImageDeepfakeDetector(
+                    model_path=self.model_paths["image"],
+                    confidence_threshold=self.confidence_threshold
+                )
+            elif modality == "video":
+                print("  🎥 Loading Video Model...")
+                from models.video_model import VideoDeepfakeDetector
+                detector = VideoDeepfakeDetector(
+                    model_path=self.model_paths["video"],
+                    confidence_threshold=self.confidence_threshold,
+                    **self.video_options
+                )
+            elif modality == "audio":
+                print("  🔊 Loading Audio Model...")
+                from models.audio_model import AudioDeepfakeDetector
+                detector = AudioDeepfakeDetector(
+                    model_path=self.model_paths["audio"],
+                    confidence_threshold=self.confidence_threshold
+                )
+            else:
+                raise ValueError(f"Unknown modality: {modality}")
+            
+            if modality == "video" and self.scheduler is not None and self.scheduler.enabled \
+                    and "audio" in self.scheduler.weights:
+                # Soundtracks take the audio lane's cores and thread budget
+                detector.soundtrack_submit = functools.partial(self.scheduler.submit, "audio")
+            if modality in self.screening_model_paths:
+                self._attach_screening(modality, detector)
+            detector.keep_frame_outputs = self.keep_frame_outputs
+            
+            self.load_times[modality] = round(time.perf_counter() - start, 3)
+            self.detectors[modality] = detector
+            return detector
+    
+    def _attach_screening(self, modality: str, detector):
+        """Load the screening model for a modality and enable its cascade"""
+        from models.screening_model import EscalationBand, load_screening_model
         
-        # Initialize video detector
-        print("  🎥 Loading Video Model...")
-        self.video_detector = VideoDeepfakeDetector(
-            model_path=video_model_path,
-            confidence_threshold=confidence_threshold
+        print(f"  ⚡ Loading {modality} screening model...")
+        # Video frames are screened by the video detector's own image detector
+        target = detector.image_detector if modality == "video" else detector
+        low, high = self.escalation_band
+        target.escalation_band = EscalationBand.around(
+            self.confidence_threshold, self.escalation_margin, low=low, high=high
         )
-        
-        # Initialize audio detector
-        print("  🔊 Loading Audio Model...")
-        self.audio_detector = AudioDeepfakeDetector(
-            model_path=audio_model_path,
-            confidence_threshold=confidence_threshold
+        target.screening_model = load_screening_model(
+            modality, self.screening_model_paths[modality], target.device,
+            in_channels=1 if modality == "audio" else 3
         )
-        
-        self.confidence_threshold = confidence_threshold
-        print("✅ Multi-Modal Detector Ready!")
     
-    def detect_image(self, image_path: str) -> Dict[str, Any]:
+    def _count_stage(self, modality: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        details = result.get("details") or {}
+        self._count_cascade(modality, details.get("cascade"))
+        if modality == "video":
+            # A fused soundtrack went through the audio cascade
+            self._count_cascade("audio", (details.get("audio_track") or {}).get("cascade"))
+        return result
+    
+    def _count_cascade(self, modality: str, cascade: Optional[Dict[str, Any]]):
+        if cascade:
+            with self.lock:
+                counts = self.cascade_counts.setdefault(modality, {"screening": 0, "full": 0})
+                counts[cascade["stage"]] += 1
+    
+    def cascade_stats(self) -> Dict[str, Any]:
+        """Per-modality counts of screening-final vs escalated inputs"""
+        stats = {}
+        with self.lock:
+            for modality, counts in self.cascade_counts.items():
+                total = counts["screening"] + counts["full"]
+                stats[modality] = dict(counts, escalation_rate=round(counts["full"] / total, 4) if total else None)
+        for modality in self.screening_model_paths:
+            detector = self.detectors.get(modality)
+            target = getattr(detector, "image_detector", detector)
+            band = getattr(target, "escalation_band", None)
+            if band is not None:
+                stats.setdefault(modality, {"screening": 0, "full": 0, "escalation_rate": None})
+                stats[modality]["band"] = [band.low, band.high]
+        return stats
+    
+    def decode_stats(self) -> Optional[Dict[str, Any]]:
+        """Segmented video decoding counters, once the video model is loaded"""
+        decoder = getattr(self.detectors.get("video"), "segmented_decoder", None)
+        return decoder.stats() if decoder is not None else None
+    
+    def shutdown(self):
+        """Release helper processes and threads owned by the detectors"""
+        for detector in self.detectors.values():
+            if hasattr(detector, "close"):
+                detector.close()
+    
+    @property
+    def image_detector(self):
+        return self.get_detector("image")
+    
+    @property
+    def video_detector(self):
+        return self.get_detector("video")
+    
+    @property
+    def audio_detector(self):
+        return self.get_detector("audio")
+    
+    @property
+    def device(self):
+        """Device of the loaded models ('not loaded' before first use)"""
+        for detector in self.detectors.values():
+            return detector.device
+        return "not loaded"
+    
+    def loaded_modalities(self):
+        return sorted(self.detectors)
+    
+    def iter_models(self):
+        """Yield every loaded torch model, screening models included (shared ones only once)"""
+        seen = set()
+        for detector in self.detectors.values():
+            target = detector.image_detector if hasattr(detector, "image_detector") else detector
+            for model in (target.model, target.screening_model):
+                if model is not None and id(model) not in seen:
+                    seen.add(id(model))
+                    yield model
+    
+    def detect_image(self, image_path: str, return_embedding: bool = False) -> Dict[str, Any]:
         """
         Detect deepfakes in images
         
         Args:
             image_path: Path to image file
+            return_embedding: Include penultimate-layer features
             
         Returns:
             Detection results with image-specific metadata
         """
-        return self.image_detector.detect(image_path)
+        return self._count_stage("image", self.image_detector.detect(image_path, return_embedding=return_embedding))
     
-    def detect_video(self, video_path: str, max_frames: int = 30) -> Dict[str, Any]:
+    def detect_video(self, video_path: str, max_frames: int = 30, return_embedding: bool = False) -> Dict[str, Any]:
         """
         Detect deepfakes in videos
         
         Args:
             video_path: Path to video file
             max_frames: Maximum frames to analyze
+            return_embedding: Include mean frame features
             
         Returns:
-            Detection results with video-specific metadata
+            Detection results with video-specific metadata (fused with the
+            soundtrack verdict when joint_audio is set)
         """
-        return self.video_detector.detect(video_path, max_frames)
+        audio_detector = self.audio_detector if self.joint_audio else None
+        return self._count_stage(
+            "video", self.video_detector.detect(
+                video_path, max_frames, return_embedding=return_embedding, audio_detector=audio_detector
+            )
+        )
     
-    def detect_audio(self, audio_path: str) -> Dict[str, Any]:
+    def detect_audio(self, audio_path: str, return_embedding: bool = False) -> Dict[str, Any]:
         """
         Detect deepfakes in audio
         
         Args:
             audio_path: Path to audio file
+            return_embedding: Include penultimate-layer features
             
         Returns:
             Detection results with audio-specific metadata
         """
-        return self.audio_detector.detect(audio_path)
+        return self._count_stage("audio", self.audio_detector.detect(audio_path, return_embedding=return_embedding))
     
-    def detect(self, file_path: str, file_type: str) -> Dict[str, Any]:
+    def detect(self, file_path: str, file_type: str, return_embedding: bool = False) -> Dict[str, Any]:
         """
         Auto-route detection based on file type
         
         Args:
             file_path: Path to the media file
             file_type: Type of file ('image', 'video', or 'audio')
+            return_embedding: Include backbone features under "embedding"
             
         Returns:
             Detection results
         """
-        file_type_lower = file_type.lower()
+        modality = self.modality_of(file_type)
         
-        # Image types
-        if file_type_lower in ['image', 'jpg', 'jpeg', 'png', 'bmp', 'gif']:
-            return self.detect_image(file_path)
+        if modality == "image":
+            return self.detect_image(file_path, return_embedding=return_embedding)
         
-        # Video types
-        elif file_type_lower in ['video', 'mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv']:
-            return self.detect_video(file_path)
+        elif modality == "video":
+            return self.detect_video(file_path, return_embedding=return_embedding)
         
-        # Audio types
-        elif file_type_lower in ['audio', 'mp3', 'wav', 'm4a', 'flac', 'ogg', 'aac']:
-            return self.detect_audio(file_path)
+        elif modality == "audio":
+            return self.detect_audio(file_path, return_embedding=return_embedding)
         
         else:
             return {
@@ -127,6 +320,31 @@ class MultiModalDeepfakeDetector:
                 "error": f"Unsupported file type: {file_type}",
                 "model_type": "Unknown"
             }
+    
+    async def detect_async(self, file_path: str, file_type: str, return_embedding: bool = False) -> Dict[str, Any]:
+        """
+        Run detect() on the modality's CPU lane without blocking the event loop
+        
+        Falls back to a direct call when no scheduler is configured.
+        """
+        modality = self.modality_of(file_type)
+        if self.scheduler is None or modality is None:
+            return self.detect(file_path, file_type, return_embedding=return_embedding)
+        return await self.scheduler.run(
+            modality, self.detect, file_path, modality, return_embedding=return_embedding
+        )
+    
+    @staticmethod
+    def modality_of(file_type: str):
+        """Map a modality name or file extension to 'image', 'video' or 'audio'"""
+        file_type_lower = file_type.lower()
+        if file_type_lower in ['image', 'jpg', 'jpeg', 'png', 'bmp', 'gif']:
+            return "image"
+        if file_type_lower in ['video', 'mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv']:
+            return "video"
+        if file_type_lower in ['audio', 'mp3', 'wav', 'm4a', 'flac', 'ogg', 'aac']:
+            return "audio"
+        return None
 
 
 # Backward compatibility - alias to old name
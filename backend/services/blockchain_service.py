@@ -5,21 +5,64 @@ Handles interaction with the MediaRegistry smart contract
 
 import json
 import os
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, Tuple
 from dotenv import load_dotenv
-from web3 import Web3
+
+from services.rpc_pool import RPCPool, RPCEndpointError
 
 load_dotenv()
 
+
+def _pooled_provider(pool: RPCPool):
+    """Async web3 provider that sends every request through an RPCPool"""
+    from web3.providers.async_base import AsyncJSONBaseProvider
+    
+    class PooledAsyncProvider(AsyncJSONBaseProvider):
+        async def make_request(self, method, params):
+            return await pool.request(method, params)
+        
+        async def is_connected(self, show_traceback: bool = False) -> bool:
+            try:
+                response = await pool.request("web3_clientVersion", [])
+            except RPCEndpointError:
+                if show_traceback:
+                    raise
+                return False
+            return "result" in response
+    
+    return PooledAsyncProvider()
+
+
 class BlockchainService:
-    """Service for blockchain operations using Web3.py"""
+    """
+    Service for blockchain operations using Web3.py
+    
+    web3 is imported and the provider/contract are built on first use, so
+    constructing the service costs nothing at application import time.
+    
+    Registry reads on the request path (verify_media_async) go through an
+    async RPCPool over all configured endpoints. Transactions and the
+    background stats refresh use a synchronous provider for the pool's
+    currently fastest endpoint; pinned() hands out one endpoint's provider
+    and contract so every call of a transaction (nonce, gas price, send,
+    receipt) goes to the same node.
+    
+    When a RegistryMirror is attached (`mirror`), registry reads are
+    answered from its local table and only go to RPC while it is behind.
+    """
     
     def __init__(self):
-        """Initialize Web3 connection and contract"""
+        """Read configuration; the Web3 connection is created lazily"""
         self.rpc_url = os.getenv('POLYGON_RPC_URL', 'https://rpc-mumbai.maticvigil.com/')
-        self.web3 = Web3(Web3.HTTPProvider(self.rpc_url))
         self.contract_address = os.getenv('CONTRACT_ADDRESS')
         self.private_key = os.getenv('PRIVATE_KEY')
+        self.rpc_pool = RPCPool.from_env(self.rpc_url)
+        self._endpoints: Dict[str, Tuple[Any, Any]] = {}
+        self._async_web3 = None
+        self._async_contract = None
+        self.mirror = None
+        self._init_lock = threading.Lock()
         
         # Load contract ABI
         abi_path = os.path.join(os.path.dirname(__file__), '../../contracts/MediaRegistry_abi.json')
@@ -29,20 +72,110 @@ class BlockchainService:
                 self.contract_abi = json.load(f)
         else:
             self.contract_abi = None
+    
+    def _connect(self):
+        with self._init_lock:
+            if self._async_web3 is not None:
+                return
+            from web3 import AsyncWeb3
+            
+            async_web3 = AsyncWeb3(_pooled_provider(self.rpc_pool))
+            
+            # Initialize contract instance if address is available
+            if self.contract_address and self.contract_abi:
+                self._async_contract = async_web3.eth.contract(
+                    address=self.contract_address,
+                    abi=self.contract_abi
+                )
+            self._async_web3 = async_web3
+    
+    def pinned(self) -> Tuple[Any, Any]:
+        """
+        Synchronous Web3 and contract for the pool's fastest endpoint
         
-        # Initialize contract instance if address is available
-        if self.contract_address and self.contract_abi:
-            self.contract = self.web3.eth.contract(
-                address=self.contract_address,
-                abi=self.contract_abi
-            )
-        else:
-            self.contract = None
+        Each endpoint gets its own provider, built once and never
+        re-pointed, so callers that keep the pair talk to one node for as
+        long as they hold it while the ranking moves on for later callers.
+        
+        Returns:
+            (web3, contract); contract is None without an address/ABI
+        """
+        url = self.rpc_pool.best_url()
+        endpoint = self._endpoints.get(url)
+        if endpoint is not None:
+            return endpoint
+        
+        with self._init_lock:
+            endpoint = self._endpoints.get(url)
+            if endpoint is None:
+                from web3 import Web3
+                
+                web3 = Web3(Web3.HTTPProvider(url))
+                contract = None
+                if self.contract_address and self.contract_abi:
+                    contract = web3.eth.contract(
+                        address=self.contract_address,
+                        abi=self.contract_abi
+                    )
+                endpoint = self._endpoints[url] = (web3, contract)
+        return endpoint
+    
+    @property
+    def web3(self):
+        # Follows the pool's latency ranking and circuit breakers per access
+        return self.pinned()[0]
+    
+    @property
+    def async_web3(self):
+        if self._async_web3 is None:
+            self._connect()
+        return self._async_web3
+    
+    @property
+    def contract(self):
+        # Without an address/ABI there is no contract; skip importing web3
+        if not (self.contract_address and self.contract_abi):
+            return None
+        return self.pinned()[1]
+    
+    @property
+    def async_contract(self):
+        if not (self.contract_address and self.contract_abi):
+            return None
+        if self._async_web3 is None:
+            self._connect()
+        return self._async_contract
     
     def is_connected(self) -> bool:
         """Check if connected to blockchain"""
         return self.web3.is_connected()
     
+    async def is_connected_async(self) -> bool:
+        """Check if any configured RPC endpoint answers"""
+        return await self.async_web3.is_connected()
+    
+    async def close(self):
+        """Close pooled RPC connections"""
+        await self.rpc_pool.close()
+    
+    @staticmethod
+    def _verification_result(exists: bool, media_info=None) -> Dict[str, Any]:
+        if exists:
+            return {
+                "verified": True,
+                "exists": True,
+                "media_hash": media_info[0],
+                "uploader": media_info[1],
+                "timestamp": media_info[2],
+                "metadata": media_info[3],
+                "message": "Media is registered on blockchain"
+            }
+        return {
+            "verified": False,
+            "exists": False,
+            "message": "Media not found in blockchain registry"
+        }
+    
     def verify_media(self, media_hash: str) -> Dict[str, Any]:
         """
         Check if media hash exists in blockchain registry
@@ -53,6 +186,11 @@ class BlockchainService:
         Returns:
             Dictionary with verification results
         """
+        if self.mirror is not None:
+            local = self.mirror.lookup(media_hash)
+            if local is not None:
+                return local
+        
         if not self.contract:
             return {
                 "verified": False,
@@ -61,28 +199,49 @@ class BlockchainService:
             }
         
         try:
+            contract = self.pinned()[1]
+            
             # Call the verifyMedia function (view function, no transaction)
-            exists = self.contract.functions.verifyMedia(media_hash).call()
+            exists = contract.functions.verifyMedia(media_hash).call()
             
-            if exists:
-                # Get detailed media info
-                media_info = self.contract.functions.getMediaInfo(media_hash).call()
-                
-                return {
-                    "verified": True,
-                    "exists": True,
-                    "media_hash": media_info[0],
-                    "uploader": media_info[1],
-                    "timestamp": media_info[2],
-                    "metadata": media_info[3],
-                    "message": "Media is registered on blockchain"
-                }
-            else:
-                return {
-                    "verified": False,
-                    "exists": False,
-                    "message": "Media not found in blockchain registry"
-                }
+            # Get detailed media info
+            media_info = contract.functions.getMediaInfo(media_hash).call() if exists else None
+            return self._verification_result(exists, media_info)
+        
+        except Exception as e:
+            return {
+                "verified": False,
+                "exists": False,
+                "error": f"Blockchain verification failed: {str(e)}"
+            }
+    
+    async def verify_media_async(self, media_hash: str) -> Dict[str, Any]:
+        """
+        verify_media() over the async RPC pool (hedged, with failover)
+        
+        Args:
+            media_hash: SHA-256 hash of the media
+            
+        Returns:
+            Dictionary with verification results
+        """
+        if self.mirror is not None:
+            local = self.mirror.lookup(media_hash)
+            if local is not None:
+                return local
+        
+        contract = self.async_contract
+        if not contract:
+            return {
+                "verified": False,
+                "exists": False,
+                "error": "Contract not initialized. Please deploy the smart contract first."
+            }
+        
+        try:
+            exists = await contract.functions.verifyMedia(media_hash).call()
+            media_info = await contract.functions.getMediaInfo(media_hash).call() if exists else None
+            return self._verification_result(exists, media_info)
         
         except Exception as e:
             return {
@@ -115,11 +274,15 @@ class BlockchainService:
             }
         
         try:
+            # One endpoint for the whole transaction: a nonce or gas price
+            # from a lagging node would not match where the tx is sent
+            web3, contract = self.pinned()
+            
             # Set up account
-            account = self.web3.eth.account.from_key(self.private_key)
+            account = web3.eth.account.from_key(self.private_key)
             
             # Check if already registered
-            exists = self.contract.functions.verifyMedia(media_hash).call()
+            exists = contract.functions.verifyMedia(media_hash).call()
             if exists:
                 return {
                     "success": False,
@@ -127,24 +290,31 @@ class BlockchainService:
                 }
             
             # Build transaction
-            nonce = self.web3.eth.get_transaction_count(account.address)
+            nonce = web3.eth.get_transaction_count(account.address)
             
-            transaction = self.contract.functions.registerMedia(
+            transaction = contract.functions.registerMedia(
                 media_hash,
                 metadata
             ).build_transaction({
                 'from': account.address,
                 'nonce': nonce,
                 'gas': 200000,
-                'gasPrice': self.web3.eth.gas_price,
+                'gasPrice': web3.eth.gas_price,
             })
             
             # Sign and send transaction
-            signed_txn = self.web3.eth.account.sign_transaction(transaction, self.private_key)
-            tx_hash = self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            signed_txn = web3.eth.account.sign_transaction(transaction, self.private_key)
+            tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
             
             # Wait for transaction receipt
-            tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+            tx_receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+            
+            if self.mirror is not None:
+                block = web3.eth.get_block(tx_receipt.blockNumber)
+                self.mirror.record(
+                    media_hash, account.address, block["timestamp"], metadata,
+                    tx_receipt.blockNumber, tx_hash.hex()
+                )
             
             return {
                 "success": True,
@@ -166,6 +336,15 @@ class BlockchainService:
             return {"error": "Contract not initialized"}
         
         try:
+            count = self.mirror.count() if self.mirror is not None else None
+            if count is not None:
+                return {
+                    "total_registered": count,
+                    "network": "Polygon Mumbai Testnet",
+                    "connected": self.is_connected(),
+                    "source": "mirror"
+                }
+            
             count = self.contract.functions.getRegisteredCount().call()
             return {
                 "total_registered": count,
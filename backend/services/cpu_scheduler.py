@@ -0,0 +1,252 @@
+"""
+CPU Scheduler
+Partitions CPU cores into per-modality inference lanes with pinned thread counts
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_LANE_WEIGHTS = {"image": 1, "video": 2, "audio": 1}
+
+
+def parse_lane_weights(spec: str) -> Dict[str, int]:
+    """Parse "image:1,video:2,audio:1" into {lane: weight}"""
+    weights = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition(":")
+        weights[name.strip()] = max(1, int(weight or 1))
+    return weights
+
+
+def partition_cpus(cpus: List[int], weights: Dict[str, int]) -> Dict[str, List[int]]:
+    """
+    Split cores between lanes proportionally to their weights
+
+    Every lane gets at least one core. With fewer cores than lanes the
+    lanes share cores round-robin.
+    """
+    names = list(weights)
+    if len(cpus) <= len(names):
+        return {name: [cpus[i % len(cpus)]] for i, name in enumerate(names)}
+
+    total = sum(weights.values())
+    shares = {name: max(1, len(cpus) * weights[name] // total) for name in names}
+    # Hand leftover cores to the heaviest lanes first
+    spare = len(cpus) - sum(shares.values())
+    for name in sorted(names, key=lambda n: -weights[n]):
+        if spare <= 0:
+            break
+        shares[name] += 1
+        spare -= 1
+    while sum(shares.values()) > len(cpus):
+        largest = max(names, key=lambda n: shares[n])
+        shares[largest] -= 1
+
+    layout, start = {}, 0
+    for name in names:
+        layout[name] = cpus[start:start + shares[name]]
+        start += shares[name]
+    return layout
+
+
+class InferenceLane:
+    """
+    A fixed set of cores serving one kind of inference
+
+    Each of the lane's `concurrency` executor threads pins itself to the
+    lane's cores; the affinity mask is per thread and inherited by the
+    threads it starts. The torch intra-op thread count is not per lane:
+    torch.set_num_threads() configures one process-wide pool, so the
+    CPUScheduler sets it once (see CPUScheduler.start()). `threads` is
+    the lane's share, cores // concurrency.
+    """
+
+    def __init__(self, name: str, cpus: List[int], concurrency: int = 1, pin: bool = True):
+        self.name = name
+        self.cpus = cpus
+        self.concurrency = concurrency
+        self.threads = max(1, len(cpus) // concurrency)
+        self.pin = pin
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency,
+            thread_name_prefix=f"lane-{name}",
+            initializer=self._init_thread
+        )
+
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _init_thread(self):
+        if self.pin and hasattr(os, "sched_setaffinity"):
+            try:
+                # pid 0 is the calling thread; OpenMP workers it spawns inherit the mask
+                os.sched_setaffinity(0, self.cpus)
+            except OSError as e:
+                print(f"⚠ Could not pin lane {self.name} to CPUs {self.cpus}: {e}")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        queued_at = time.monotonic()
+        with self.lock:
+            self.submitted += 1
+
+        def run():
+            started = time.monotonic()
+            with self.lock:
+                self.running += 1
+                waited = started - queued_at
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.busy_seconds += time.monotonic() - started
+                    self.completed += 1
+                    self.failed += not ok
+
+        return self.executor.submit(run)
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "cpus": self.cpus,
+            "concurrency": self.concurrency,
+            "threads_per_call": self.threads,
+            "pinned": self.pin,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-9)
+            completed = max(self.completed, 1)
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "running": self.running,
+                "queued": self.submitted - self.completed - self.running,
+                # Share of the lane's executor slots that were busy since start
+                "utilization": round(self.busy_seconds / (elapsed * self.concurrency), 4),
+                "busy_seconds": round(self.busy_seconds, 3),
+                "mean_wait_ms": round(1000 * self.wait_seconds / completed, 2),
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 2),
+                "mean_run_ms": round(1000 * self.busy_seconds / completed, 2),
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class CPUScheduler:
+    """
+    Routes blocking inference calls onto per-modality lanes
+
+    Lanes are laid out on first use rather than at construction, so a
+    scheduler created in a pre-fork parent partitions the cores of the
+    worker that actually runs it.
+
+    All lanes share torch's process-wide intra-op pool. start() sizes it
+    once to the largest lane share, so no lane's call uses more threads
+    than that lane has cores; smaller lanes rely on their affinity mask
+    to stay on their own cores.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None, concurrency: int = 1,
+                 pin: bool = True, enabled: bool = True):
+        self.weights = weights or dict(DEFAULT_LANE_WEIGHTS)
+        self.concurrency = concurrency
+        self.pin = pin
+        self.enabled = enabled
+        self.lanes: Dict[str, InferenceLane] = {}
+        self.torch_threads: Optional[int] = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CPUScheduler":
+        """
+        Environment:
+            CPU_SCHEDULER_ENABLED   Route inference through lanes (default true)
+            CPU_LANES               Lane weights, e.g. "image:1,video:2,audio:1"
+            CPU_LANE_CONCURRENCY    Concurrent calls per lane (default 1)
+            CPU_PIN_THREADS         Pin lane threads to their cores (default true)
+        """
+        spec = os.getenv("CPU_LANES")
+        return cls(
+            weights=parse_lane_weights(spec) if spec else None,
+            concurrency=max(1, int(os.getenv("CPU_LANE_CONCURRENCY", "1"))),
+            pin=os.getenv("CPU_PIN_THREADS", "true").lower() == "true",
+            enabled=os.getenv("CPU_SCHEDULER_ENABLED", "true").lower() == "true",
+        )
+
+    @staticmethod
+    def available_cpus() -> List[int]:
+        if hasattr(os, "sched_getaffinity"):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    def start(self):
+        """Lay out the lanes over the cores this process may use"""
+        with self.lock:
+            if self.lanes or not self.enabled:
+                return
+            layout = partition_cpus(self.available_cpus(), self.weights)
+            for name, cpus in layout.items():
+                self.lanes[name] = InferenceLane(name, cpus, self.concurrency, self.pin)
+
+            # One pool for every lane, so it is set here and only here
+            self.torch_threads = max(lane.threads for lane in self.lanes.values())
+            try:
+                import torch
+                torch.set_num_threads(self.torch_threads)
+            except ImportError:
+                pass
+
+    def lane(self, name: str) -> InferenceLane:
+        self.start()
+        lane = self.lanes.get(name)
+        if lane is None:
+            raise ValueError(f"Unknown inference lane: {name}")
+        return lane
+
+    def submit(self, lane: str, fn: Callable, *args, **kwargs) -> Future:
+        """Run fn on a lane; returns a concurrent.futures.Future"""
+        return self.lane(lane).submit(fn, *args, **kwargs)
+
+    async def run(self, lane: str, fn: Callable, *args, **kwargs):
+        """Await fn on a lane without blocking the event loop"""
+        if not self.enabled:
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: fn(*args, **kwargs))
+        return await asyncio.wrap_future(self.submit(lane, fn, *args, **kwargs))
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "cpus": self.available_cpus(),
+            "torch_threads": self.torch_threads,
+            "lanes": {name: lane.config() for name, lane in self.lanes.items()},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self):
+        with self.lock:
+            for lane in self.lanes.values():
+                lane.shutdown()
+            self.lanes.clear()
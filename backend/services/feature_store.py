@@ -0,0 +1,228 @@
+"""
+Feature Store
+Per-frame model outputs kept on disk so verdicts can be recomputed with
+new thresholds, aggregations or classifier heads without the media
+"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+AGGREGATIONS: Dict[str, Callable[[np.ndarray], float]] = {
+    "mean": lambda p: float(np.mean(p)),
+    "median": lambda p: float(np.median(p)),
+    "max": lambda p: float(np.max(p)),
+    # Mean of the most suspicious quarter of frames
+    "top_quartile_mean": lambda p: float(np.mean(np.sort(p)[-max(1, len(p) // 4):])),
+    # Mean without the highest and lowest 10% of frames
+    "trimmed_mean": lambda p: float(np.mean(np.sort(p)[len(p) // 10:len(p) - len(p) // 10] if len(p) >= 10 else p)),
+}
+
+
+def is_media_hash(value: str) -> bool:
+    """Whether value is a lowercase hex SHA-256 digest"""
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+class FeatureStore:
+    """
+    Compact per-media store of full-model outputs
+
+    One .npz per (media hash, track, model version) under
+    <root>/<hash[:2]>/<hash>/<track>-<version>.npz with the per-frame
+    [real, fake] probabilities (float32), penultimate-layer features
+    (float16) and, for videos, the decoded frame indices. Tracks are
+    "image", "video" and "audio" (a video's soundtrack is stored as its
+    "audio" track). A few KB per frame, so millions of items stay small.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.reads = 0
+        self.misses = 0
+
+    def _dir(self, media_hash: str) -> Path:
+        # Hashes come from request parameters; only SHA-256 hex names a directory
+        if not is_media_hash(media_hash):
+            raise ValueError(f"Invalid media hash: {media_hash!r}")
+        return self.root / media_hash[:2] / media_hash
+
+    def put(self, media_hash: str, frame_outputs: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Store a detector's "frame_outputs"
+
+        Returns:
+            Number of tracks written
+        """
+        directory = self._dir(media_hash)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        written = 0
+        for track, outputs in frame_outputs.items():
+            arrays = {
+                "probabilities": np.asarray(outputs["probabilities"], dtype=np.float32),
+                "features": np.asarray(outputs["features"], dtype=np.float16),
+            }
+            if outputs.get("frame_indices") is not None:
+                arrays["frame_indices"] = np.asarray(outputs["frame_indices"], dtype=np.int64)
+
+            # Write then rename so readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, **arrays)
+                os.replace(tmp, directory / f"{track}-{outputs['version']}.npz")
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+            written += 1
+
+        with self.lock:
+            self.writes += written
+        return written
+
+    def get(self, media_hash: str, versions: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Stored tracks of a media item
+
+        Args:
+            media_hash: SHA-256 of the media
+            versions: Optional track -> model version to load; otherwise
+                the most recently written version of each track
+
+        Returns:
+            track -> {"version", "probabilities", "features"[, "frame_indices"]}
+            (empty when nothing is stored)
+        """
+        directory = self._dir(media_hash)
+        newest: Dict[str, Tuple[float, Path, str]] = {}
+        try:
+            entries = list(directory.glob("*.npz"))
+        except FileNotFoundError:
+            entries = []
+        for path in entries:
+            track, _, version = path.stem.partition("-")
+            if versions and versions.get(track) not in (None, version):
+                continue
+            mtime = path.stat().st_mtime
+            if track not in newest or mtime > newest[track][0]:
+                newest[track] = (mtime, path, version)
+
+        tracks = {}
+        for track, (_, path, version) in newest.items():
+            with np.load(path) as data:
+                tracks[track] = dict({name: data[name] for name in data.files}, version=version)
+
+        with self.lock:
+            if tracks:
+                self.reads += 1
+            else:
+                self.misses += 1
+        return tracks
+
+    def iter_hashes(self) -> Iterator[str]:
+        """Every media hash with stored outputs (for bulk re-scoring)"""
+        for shard in sorted(self.root.iterdir()):
+            if shard.is_dir():
+                for directory in sorted(shard.iterdir()):
+                    yield directory.name
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"writes": self.writes, "reads": self.reads, "misses": self.misses}
+
+
+def load_head(path: Union[str, Path]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Classifier head for re-scoring stored features
+
+    Args:
+        path: .npz with "weight" (2, D) and "bias" (2,), i.e. the final
+            nn.Linear of the model exported with numpy
+
+    Returns:
+        (weight, bias)
+    """
+    with np.load(path) as data:
+        return data["weight"].astype(np.float32), data["bias"].astype(np.float32)
+
+
+def classify(fake_prob: float, real_prob: float, threshold: float) -> Tuple[str, float]:
+    """Classification and confidence as the detectors compute them"""
+    if fake_prob > threshold:
+        return "Fake", fake_prob
+    if real_prob > threshold:
+        return "Real", real_prob
+    return "Unverifiable", max(real_prob, fake_prob)
+
+
+def rescore(tracks: Dict[str, Dict[str, Any]], threshold: float, aggregation: str = "mean",
+            heads: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None) -> Dict[str, Any]:
+    """
+    Recompute a verdict from stored outputs
+
+    Args:
+        tracks: FeatureStore.get() result
+        threshold: Confidence threshold (as CONFIDENCE_THRESHOLD)
+        aggregation: Name in AGGREGATIONS, applied to per-frame fake
+            probabilities
+        heads: Optional track -> (weight, bias) replacing the stored
+            probabilities with softmax(features @ weight.T + bias)
+
+    Raises:
+        ValueError if a head does not fit the stored features
+
+    Returns:
+        Result shaped like a detector's, fusing a video's frames and
+        soundtrack with the higher fake probability (as the detector does)
+    """
+    aggregate = AGGREGATIONS[aggregation]
+    per_track = {}
+    for track, outputs in tracks.items():
+        probabilities = outputs["probabilities"]
+        head = (heads or {}).get(track)
+        if head is not None:
+            weight, bias = head
+            features = outputs["features"]
+            if weight.ndim != 2 or weight.shape[0] != 2 or weight.shape[1] != features.shape[1] \
+                    or bias.shape != (2,):
+                raise ValueError(
+                    f"Head for {track} has weight {weight.shape} and bias {bias.shape}; "
+                    f"stored features have {features.shape[1]} dimensions"
+                )
+            logits = features.astype(np.float32) @ weight.T + bias
+            logits -= logits.max(axis=1, keepdims=True)
+            exp = np.exp(logits)
+            probabilities = exp / exp.sum(axis=1, keepdims=True)
+        per_track[track] = {
+            "frames": int(len(probabilities)),
+            "fake_probability": aggregate(probabilities[:, 1]),
+            "version": outputs["version"],
+            "head": head is not None,
+        }
+
+    fake_prob = max(track["fake_probability"] for track in per_track.values())
+    real_prob = 1.0 - fake_prob
+    classification, confidence = classify(fake_prob, real_prob, threshold)
+
+    for track in per_track.values():
+        track["fake_probability"] = round(track["fake_probability"] * 100, 2)
+    return {
+        "classification": classification,
+        "confidence_score": round(confidence * 100, 2),
+        "fake_probability": round(fake_prob * 100, 2),
+        "real_probability": round(real_prob * 100, 2),
+        "is_deepfake": fake_prob > threshold,
+        "details": {
+            "aggregation": aggregation,
+            "threshold": threshold,
+            "tracks": per_track,
+        }
+    }
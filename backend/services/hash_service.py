@@ -4,58 +4,133 @@ Generates SHA-256 hashes for media files
 """
 
 import hashlib
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import Dict, Iterable, Optional, Union
+
+# hashlib releases the GIL while digesting large buffers, so big chunks
+# let other threads (and the parallel mode) make progress meanwhile
+BLOCK_SIZE = 1024 * 1024
+MMAP_CHUNK_SIZE = 8 * 1024 * 1024
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+_local = threading.local()
+
+
+def _buffer() -> memoryview:
+    """Per-thread reusable read buffer"""
+    view = getattr(_local, "view", None)
+    if view is None:
+        view = _local.view = memoryview(bytearray(BLOCK_SIZE))
+    return view
+
 
 class HashService:
     """Service for generating cryptographic hashes of media files"""
-    
+
     @staticmethod
     def generate_file_hash(file_path: Union[str, Path]) -> str:
         """
         Generate SHA-256 hash of a file
-        
+
+        Files above MMAP_THRESHOLD are memory-mapped and digested in large
+        slices; smaller files are read with readinto() into a reusable
+        per-thread buffer, avoiding a new bytes object per block.
+
         Args:
             file_path: Path to the file
-            
+
         Returns:
             Hexadecimal string representation of the hash
         """
         sha256_hash = hashlib.sha256()
-        
+
         with open(file_path, "rb") as f:
-            # Read file in chunks to handle large files
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        
+            size = os.fstat(f.fileno()).st_size
+
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for start in range(0, size, MMAP_CHUNK_SIZE):
+                            sha256_hash.update(view[start:start + MMAP_CHUNK_SIZE])
+                    finally:
+                        view.release()
+            else:
+                view = _buffer()
+                while True:
+                    read = f.readinto(view)
+                    if not read:
+                        break
+                    sha256_hash.update(view[:read])
+
         return sha256_hash.hexdigest()
-    
+
+    @staticmethod
+    def generate_files_hashes(file_paths: Iterable[Union[str, Path]],
+                              max_workers: Optional[int] = None) -> Dict[str, str]:
+        """
+        Hash many files in parallel across threads
+
+        Args:
+            file_paths: Paths to hash
+            max_workers: Thread count (defaults to the CPU count)
+
+        Returns:
+            Mapping of path (as given, stringified) to hex hash
+        """
+        paths = [str(path) for path in file_paths]
+        workers = max_workers or min(len(paths), os.cpu_count() or 1) or 1
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash") as pool:
+            return dict(zip(paths, pool.map(HashService.generate_file_hash, paths)))
+
     @staticmethod
     def generate_bytes_hash(file_bytes: bytes) -> str:
         """
         Generate SHA-256 hash from bytes
-        
+
         Args:
             file_bytes: File content as bytes
-            
+
         Returns:
             Hexadecimal string representation of the hash
         """
         sha256_hash = hashlib.sha256()
         sha256_hash.update(file_bytes)
         return sha256_hash.hexdigest()
-    
+
     @staticmethod
     def verify_file_integrity(file_path: Union[str, Path], expected_hash: str) -> bool:
         """
         Verify file integrity by comparing hashes
-        
+
         Args:
             file_path: Path to the file
             expected_hash: Expected hash value
-            
+
         Returns:
             True if hashes match, False otherwise
         """
         actual_hash = HashService.generate_file_hash(file_path)
         return actual_hash == expected_hash
+
+    @staticmethod
+    def verify_files_integrity(expected_hashes: Dict[Union[str, Path], str],
+                               max_workers: Optional[int] = None) -> Dict[str, bool]:
+        """
+        Verify many files in parallel
+
+        Args:
+            expected_hashes: Mapping of path to expected hash
+            max_workers: Thread count (defaults to the CPU count)
+
+        Returns:
+            Mapping of path (stringified) to whether it matched
+        """
+        expected = {str(path): value for path, value in expected_hashes.items()}
+        actual = HashService.generate_files_hashes(expected.keys(), max_workers)
+        return {path: actual[path] == expected[path] for path in expected}
@@ -0,0 +1,367 @@
+"""
+Perceptual Hash Service
+Content fingerprints that survive re-encoding, resizing and recompression,
+plus a BK-tree index for Hamming-distance near-duplicate search
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis of size n x n"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    basis = np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    basis[0] *= 1 / np.sqrt(2)
+    return basis * np.sqrt(2 / n)
+
+
+class PerceptualHashService:
+    """
+    Service for generating perceptual fingerprints of media files
+
+    Flat input (blank or near-uniform images and frames, silence or
+    noise-like audio) is not fingerprinted: its hash bits only encode
+    noise, so unrelated flat media would land within matching distance
+    of each other and share a verdict.
+    """
+
+    # pHash works on a 32x32 luminance image and keeps the 8x8 low frequencies
+    HASH_SIZE = 8
+    SAMPLE_SIZE = 32
+    _DCT = _dct_matrix(SAMPLE_SIZE)
+    # Luminance standard deviation (0-255) below which a picture is flat
+    MIN_LUMA_STD = 6.0
+
+    # Audio fingerprints: one bit per pitch class and time segment
+    CHROMA_BINS = 12
+    AUDIO_SEGMENTS = 8
+    AUDIO_HASH_BITS = CHROMA_BINS * AUDIO_SEGMENTS
+    # Chroma spread below which a segment carries no pitch information
+    MIN_CHROMA_STD = 0.05
+
+    @staticmethod
+    def hash_gray(gray: np.ndarray) -> Optional[int]:
+        """
+        Compute a 64-bit pHash from a 32x32 grayscale array
+
+        Args:
+            gray: 2-D float array of size SAMPLE_SIZE x SAMPLE_SIZE
+
+        Returns:
+            Hash as an integer, or None if the picture is too flat to
+            fingerprint
+        """
+        if float(np.std(gray)) < PerceptualHashService.MIN_LUMA_STD:
+            return None
+
+        dct = PerceptualHashService._DCT
+        coeffs = dct @ gray @ dct.T
+        low = coeffs[:PerceptualHashService.HASH_SIZE, :PerceptualHashService.HASH_SIZE].flatten()
+
+        # Compare against the median of the AC terms (DC term skews it)
+        bits = low > np.median(low[1:])
+        return PerceptualHashService.bits_to_int(bits)
+
+    @staticmethod
+    def bits_to_int(bits: np.ndarray) -> int:
+        """Pack a boolean array into an integer, most significant bit first"""
+        value = 0
+        for bit in bits:
+            value = (value << 1) | int(bit)
+        return value
+
+    @staticmethod
+    def image_hash(image_input) -> Optional[int]:
+        """
+        Generate pHash of an image
+
+        Args:
+            image_input: File path or PIL Image
+
+        Returns:
+            64-bit hash as an integer (None for a flat image)
+        """
+        size = PerceptualHashService.SAMPLE_SIZE
+        if isinstance(image_input, str):
+            image = Image.open(image_input)
+            image.draft('L', (size, size))
+        else:
+            image = image_input
+
+        gray = image.convert('L').resize((size, size), Image.BILINEAR)
+        return PerceptualHashService.hash_gray(np.asarray(gray, dtype=np.float32))
+
+    @staticmethod
+    def frame_hash(frame: np.ndarray) -> Optional[int]:
+        """
+        Generate pHash of a decoded BGR video frame
+
+        Args:
+            frame: BGR frame as returned by OpenCV
+
+        Returns:
+            64-bit hash as an integer (None for a flat frame)
+        """
+        import cv2
+
+        size = PerceptualHashService.SAMPLE_SIZE
+        small = cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return PerceptualHashService.hash_gray(gray.astype(np.float32))
+
+    @staticmethod
+    def video_hashes(video_path: str, keyframes: int = 8) -> List[int]:
+        """
+        Generate pHashes for evenly spaced keyframes of a video
+
+        Args:
+            video_path: Path to video file
+            keyframes: Number of frames to fingerprint
+
+        Returns:
+            List of 64-bit hashes of the non-flat keyframes in timeline
+            order; empty when fewer than half of them are non-flat
+        """
+        import cv2
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Skip the first/last stretch where fades and intros differ between copies
+        positions = set(
+            int(total_frames * (i + 1) / (keyframes + 1)) for i in range(keyframes)
+        )
+
+        hashes = []
+        sampled = 0
+        frame_idx = 0
+        while sampled < len(positions) and cap.grab():
+            if frame_idx in positions:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                sampled += 1
+                value_hash = PerceptualHashService.frame_hash(frame)
+                if value_hash is not None:
+                    hashes.append(value_hash)
+            frame_idx += 1
+
+        cap.release()
+        # Mostly black or blank videos would match each other on the few frames left
+        if len(hashes) * 2 < len(positions):
+            return []
+        return hashes
+
+    @staticmethod
+    def audio_hash(audio_path: str, segments: int = AUDIO_SEGMENTS, duration: float = 30.0) -> Optional[int]:
+        """
+        Generate a chroma fingerprint of an audio file
+
+        Chroma energy is averaged over equal time segments and each pitch
+        class is compared against the segment mean, giving 12 bits per
+        segment that are stable under bitrate and sample-rate changes.
+
+        Args:
+            audio_path: Path to audio file
+            segments: Number of time segments
+            duration: Seconds of audio to fingerprint
+
+        Returns:
+            (CHROMA_BINS * segments)-bit hash as an integer, or None when
+            fewer than half of the segments have any pitch structure
+            (silence, hum, noise)
+        """
+        import librosa
+
+        y, sr = librosa.load(audio_path, sr=11025, mono=True, duration=duration)
+        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+
+        pooled = np.stack([
+            part.mean(axis=1) if part.size else np.zeros(PerceptualHashService.CHROMA_BINS)
+            for part in np.array_split(chroma, segments, axis=1)
+        ], axis=1)
+        informative = pooled.std(axis=0) >= PerceptualHashService.MIN_CHROMA_STD
+        if int(informative.sum()) * 2 < segments:
+            return None
+        bits = (pooled > pooled.mean(axis=0, keepdims=True)).T.flatten()
+        return PerceptualHashService.bits_to_int(bits)
+
+    @staticmethod
+    def generate(file_path: str, media_type: str) -> Optional[List[int]]:
+        """
+        Generate the perceptual fingerprint for any supported media type
+
+        Args:
+            file_path: Path to the media file
+            media_type: 'image', 'video' or 'audio'
+
+        Returns:
+            List of hashes (one for image/audio, one per keyframe for video),
+            or None if the media could not be fingerprinted or is too flat
+            to tell apart from other flat media
+        """
+        try:
+            if media_type == "image":
+                value_hash = PerceptualHashService.image_hash(file_path)
+                return [value_hash] if value_hash is not None else None
+            if media_type == "video":
+                return PerceptualHashService.video_hashes(file_path) or None
+            if media_type == "audio":
+                value_hash = PerceptualHashService.audio_hash(file_path)
+                return [value_hash] if value_hash is not None else None
+        except Exception as e:
+            print(f"⚠ Perceptual hash failed: {e}")
+        return None
+
+    @staticmethod
+    def encode(hashes: List[int]) -> str:
+        """Serialize hashes for storage (comma-separated hex)"""
+        return ",".join(format(h, "x") for h in hashes)
+
+    @staticmethod
+    def decode(value: str) -> List[int]:
+        """Parse hashes stored by encode()"""
+        return [int(part, 16) for part in value.split(",") if part]
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes with Hamming distance
+
+    Each node's children are keyed by their distance to the node, so a
+    radius query only descends into children whose key lies within
+    [d - radius, d + radius] of the query distance.
+    """
+
+    def __init__(self):
+        self.root = None  # [hash, values, children]
+        self.size = 0
+
+    @staticmethod
+    def distance(a: int, b: int) -> int:
+        return bin(a ^ b).count("1")
+
+    def add(self, value_hash: int, value) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [value_hash, [value], {}]
+            return
+
+        node = self.root
+        while True:
+            dist = self.distance(value_hash, node[0])
+            if dist == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(dist)
+            if child is None:
+                node[2][dist] = [value_hash, [value], {}]
+                return
+            node = child
+
+    def search(self, query_hash: int, radius: int) -> List[Tuple[int, object]]:
+        """
+        Find all values whose hash is within radius of query_hash
+
+        Returns:
+            List of (distance, value) tuples sorted by distance
+        """
+        if self.root is None:
+            return []
+
+        results = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            dist = self.distance(query_hash, node[0])
+            if dist <= radius:
+                results.extend((dist, value) for value in node[1])
+            for key, child in node[2].items():
+                if dist - radius <= key <= dist + radius:
+                    stack.append(child)
+
+        results.sort(key=lambda item: item[0])
+        return results
+
+
+class NearDuplicateIndex:
+    """
+    Per-modality near-duplicate index keyed by media hash
+
+    Images and audio match on their single fingerprint. Videos match when
+    at least `video_match_ratio` of their keyframes land within radius of
+    keyframes belonging to the same indexed video.
+    """
+
+    def __init__(self, max_distance_ratio: float = 0.15, video_match_ratio: float = 0.5):
+        self.max_distance_ratio = max_distance_ratio
+        self.video_match_ratio = video_match_ratio
+        self.trees: Dict[str, BKTree] = {}
+        self.lock = threading.Lock()
+
+    def radius(self, media_type: str) -> int:
+        bits = PerceptualHashService.AUDIO_HASH_BITS if media_type == "audio" \
+            else PerceptualHashService.HASH_SIZE ** 2
+        return int(bits * self.max_distance_ratio)
+
+    def add(self, media_type: str, hashes: List[int], media_hash: str) -> None:
+        """Index the fingerprint of a verified media item"""
+        with self.lock:
+            tree = self.trees.setdefault(media_type, BKTree())
+            for value_hash in hashes:
+                tree.add(value_hash, media_hash)
+
+    def find(self, media_type: str, hashes: List[int]) -> Optional[Dict[str, object]]:
+        """
+        Find the closest indexed near-duplicate
+
+        Args:
+            media_type: 'image', 'video' or 'audio'
+            hashes: Fingerprint of the query media
+
+        Returns:
+            Dictionary with the matched media_hash and mean distance, or None
+        """
+        if not hashes:
+            return None
+
+        radius = self.radius(media_type)
+        # media_hash -> best distance per query hash
+        matches: Dict[str, List[int]] = {}
+        with self.lock:
+            tree = self.trees.get(media_type)
+            if tree is None:
+                return None
+            for value_hash in hashes:
+                best: Dict[str, int] = {}
+                for dist, media_hash in tree.search(value_hash, radius):
+                    best.setdefault(media_hash, dist)
+                for media_hash, dist in best.items():
+                    matches.setdefault(media_hash, []).append(dist)
+
+        required = max(1, int(np.ceil(len(hashes) * self.video_match_ratio))) if media_type == "video" else 1
+        candidates = [
+            (len(dists), -sum(dists) / len(dists), media_hash)
+            for media_hash, dists in matches.items()
+            if len(dists) >= required
+        ]
+        if not candidates:
+            return None
+
+        matched_frames, neg_distance, media_hash = max(candidates)
+        return {
+            "media_hash": media_hash,
+            "distance": round(-neg_distance, 2),
+            "matched_hashes": matched_frames,
+            "query_hashes": len(hashes),
+        }
+
+    def __len__(self) -> int:
+        return sum(tree.size for tree in self.trees.values())
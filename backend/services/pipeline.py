@@ -0,0 +1,153 @@
+"""
+Pipeline Engine
+Runs a request through an ordered list of named, timed stages
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PipelineContext:
+    """
+    Mutable state handed from stage to stage
+
+    Stages read and set plain attributes (e.g. ctx.media_hash). A stage
+    ends the run early by calling finish() with a response. Cleanup that
+    must happen whatever the outcome is registered with defer() and runs
+    in reverse order when the run ends.
+    """
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+        self.response = None
+        self.timings: Dict[str, float] = {}
+        self._deferred: List[tuple] = []
+
+    def get(self, name: str, default=None):
+        return self.__dict__.get(name, default)
+
+    def finish(self, response):
+        """Short-circuit: later stages are skipped and this is the result"""
+        self.response = response
+
+    def defer(self, fn: Callable, *args):
+        self._deferred.append((fn, args))
+
+    def close(self):
+        """Run deferred cleanup, newest first"""
+        while self._deferred:
+            fn, args = self._deferred.pop()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"⚠ Pipeline cleanup {getattr(fn, '__name__', fn)} failed: {e}")
+
+    def fork(self) -> "PipelineContext":
+        """Child context seeing the same inputs, with its own response and cleanup"""
+        values = {k: v for k, v in self.__dict__.items() if k not in ("response", "timings", "_deferred")}
+        return PipelineContext(**values)
+
+    def merge(self, child: "PipelineContext"):
+        """Adopt a finished child's attributes, response and timings"""
+        for key, value in child.__dict__.items():
+            if key not in ("timings", "_deferred"):
+                self.__dict__[key] = value
+        self.timings.update(child.timings)
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline
+
+    Attributes:
+        name: Label for timings and metrics
+        fn: Callable taking the context
+        mode: "async" (fn is a coroutine function), "sync" (called on the
+            event loop; keep it short) or "thread" (run in the default
+            thread pool)
+        when: Optional predicate; the stage is skipped when it is false
+    """
+    name: str
+    fn: Callable[[PipelineContext], Any]
+    mode: str = "async"
+    when: Optional[Callable[[PipelineContext], bool]] = None
+
+    async def __call__(self, ctx: PipelineContext):
+        if self.mode == "async":
+            return await self.fn(ctx)
+        if self.mode == "thread":
+            return await asyncio.to_thread(self.fn, ctx)
+        return self.fn(ctx)
+
+
+class Pipeline:
+    """
+    Ordered stages with per-stage timing and outcome counters
+
+    Routes compose their own stage lists from shared Stage objects, so a
+    stage (and any optimization inside it) is written once and can be
+    reordered, dropped or swapped per route.
+    """
+
+    def __init__(self, name: str, stages: List[Stage]):
+        self.name = name
+        self.stages = list(stages)
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, float]] = {
+            stage.name: {"calls": 0, "skipped": 0, "short_circuits": 0, "errors": 0, "seconds": 0.0}
+            for stage in self.stages
+        }
+
+    async def run(self, ctx: PipelineContext):
+        """Run the stages until one finishes the context; cleanup is left to the caller"""
+        for stage in self.stages:
+            if ctx.response is not None:
+                break
+            metrics = self.metrics[stage.name]
+            if stage.when is not None and not stage.when(ctx):
+                with self.lock:
+                    metrics["skipped"] += 1
+                continue
+
+            start = time.perf_counter()
+            try:
+                await stage(ctx)
+            except BaseException:
+                with self.lock:
+                    metrics["errors"] += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                ctx.timings[stage.name] = elapsed
+                with self.lock:
+                    metrics["calls"] += 1
+                    metrics["seconds"] += elapsed
+
+            if ctx.response is not None:
+                with self.lock:
+                    metrics["short_circuits"] += 1
+        return ctx.response
+
+    async def execute(self, ctx: PipelineContext):
+        """run() followed by the context's deferred cleanup"""
+        try:
+            return await self.run(ctx)
+        finally:
+            ctx.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                name: {
+                    "calls": int(m["calls"]),
+                    "skipped": int(m["skipped"]),
+                    "short_circuits": int(m["short_circuits"]),
+                    "errors": int(m["errors"]),
+                    "mean_ms": round(1000 * m["seconds"] / m["calls"], 2) if m["calls"] else None,
+                }
+                for name, m in self.metrics.items()
+            }
@@ -0,0 +1,366 @@
+"""
+Registry Mirror
+Background indexer that copies MediaRegistered events into a local table
+so registry lookups are answered without a contract call
+"""
+
+import fcntl
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from database.database import RegistryEntry, RegistrySyncState
+
+EVENT_NAME = "MediaRegistered"
+
+# eth_getLogs rejections that mean "ask for fewer blocks", as worded by
+# geth, Infura, Alchemy, QuickNode and others
+RANGE_ERROR_MARKERS = (
+    "range", "more than", "too many", "too large", "limit exceeded",
+    "response size", "query timeout", "10000",
+)
+# EIP-1474 "limit exceeded"
+RANGE_ERROR_CODES = (-32005,)
+
+
+def is_range_error(error: Exception) -> bool:
+    """Whether a get_logs failure is the provider capping the block range"""
+    details = error.args[0] if error.args else None
+    if isinstance(details, dict):
+        if details.get("code") in RANGE_ERROR_CODES:
+            return True
+        message = str(details.get("message", ""))
+    else:
+        message = str(error)
+    message = message.lower()
+    return any(marker in message for marker in RANGE_ERROR_MARKERS)
+
+
+class RegistryMirror:
+    """
+    Local, indexed copy of the registry contract's MediaRegistered events
+
+    The indexer backfills from `start_block` in chunks of `chunk_size`
+    blocks (halved when a provider rejects the range as too large, and
+    doubled back towards `chunk_size` after each accepted call; other
+    errors end the pass and are retried as they are), then tails the chain
+    every `poll_interval` seconds. Each pass re-reads the last
+    `reorg_depth` blocks: rows in a re-read range are replaced by the
+    logs the chain reports now, in one transaction, so events dropped or
+    moved by a reorg are corrected without a window of missing rows.
+
+    lookup() answers from the table. A miss only counts as "not
+    registered" while the mirror is current: a pass reached the chain
+    head within `max_staleness` seconds and the synced block is within
+    `reorg_depth` of it. Otherwise (during the backfill, or after a pass
+    that failed midway) callers fall back to RPC.
+
+    Several worker processes may share the database; only the one holding
+    `lock_path` runs the indexer, the others just read its progress.
+    """
+
+    def __init__(self, blockchain_service, session_factory: Callable[[], Session],
+                 start_block: int = 0, reorg_depth: int = 64, chunk_size: int = 2000,
+                 poll_interval: float = 5.0, max_staleness: float = 30.0,
+                 lock_path: Optional[str] = None):
+        self.blockchain = blockchain_service
+        self.session_factory = session_factory
+        self.start_block = start_block
+        self.reorg_depth = reorg_depth
+        self.max_chunk_size = chunk_size
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.lock_path = Path(lock_path) if lock_path else None
+
+        self.fields = self._event_fields()
+        self.enabled = self.fields is not None
+
+        self.lock_file = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.block_timestamps: Dict[int, int] = {}
+
+        self.state_cache = None
+        self.state_read_at = 0.0
+        self.local_hits = 0
+        self.local_misses = 0
+        self.fallbacks = 0
+        self.last_error: Optional[str] = None
+
+    def _event_fields(self) -> Optional[Dict[str, Optional[str]]]:
+        """Map the event's ABI inputs to hash / uploader / timestamp / metadata"""
+        abi = self.blockchain.contract_abi or []
+        event = next((e for e in abi if e.get("type") == "event" and e.get("name") == EVENT_NAME), None)
+        if event is None:
+            return None
+
+        inputs = event.get("inputs", [])
+        hash_input = next((i for i in inputs if "hash" in i["name"].lower()), inputs[0] if inputs else None)
+        if hash_input is None or (hash_input.get("indexed") and hash_input["type"] in ("string", "bytes")):
+            # Indexed dynamic values are only logged as their keccak hash
+            print(f"⚠ {EVENT_NAME} does not log the media hash itself; registry mirror disabled")
+            return None
+
+        def first(predicate):
+            return next((i["name"] for i in inputs if i is not hash_input and predicate(i)), None)
+
+        return {
+            "hash": hash_input["name"],
+            "uploader": first(lambda i: i["type"] == "address"),
+            "timestamp": first(lambda i: "time" in i["name"].lower() and i["type"].startswith("uint")),
+            "metadata": first(lambda i: i["type"] == "string"),
+        }
+
+    # Reads
+
+    def state(self) -> Optional[RegistrySyncState]:
+        """Sync progress, re-read at most once a second (it may be written by another worker)"""
+        now = time.monotonic()
+        if now - self.state_read_at >= 1.0:
+            db = self.session_factory()
+            try:
+                state = db.get(RegistrySyncState, EVENT_NAME)
+                if state is not None:
+                    db.expunge(state)
+                self.state_cache = state
+            finally:
+                db.close()
+            self.state_read_at = now
+        return self.state_cache
+
+    def is_current(self) -> bool:
+        if not self.enabled:
+            return False
+        state = self.state()
+        if state is None or state.updated_at is None:
+            return False
+        if state.synced_block < state.head_block - self.reorg_depth:
+            return False
+        return (datetime.utcnow() - state.updated_at).total_seconds() <= self.max_staleness
+
+    def lookup(self, media_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer verifyMedia/getMediaInfo from the mirror
+
+        Returns:
+            Verification result like BlockchainService.verify_media, or None
+            when the mirror cannot answer and the caller should use RPC
+        """
+        if not self.enabled:
+            return None
+
+        db = self.session_factory()
+        try:
+            entry = db.query(RegistryEntry).filter(RegistryEntry.media_hash == media_hash).first()
+        finally:
+            db.close()
+
+        if entry is not None:
+            self.local_hits += 1
+            return {
+                "verified": True,
+                "exists": True,
+                "media_hash": entry.media_hash,
+                "uploader": entry.uploader,
+                "timestamp": entry.timestamp,
+                "metadata": entry.metadata_json,
+                "block_number": entry.block_number,
+                "source": "mirror",
+                "message": "Media is registered on blockchain"
+            }
+
+        if self.is_current():
+            self.local_misses += 1
+            return {
+                "verified": False,
+                "exists": False,
+                "source": "mirror",
+                "message": "Media not found in blockchain registry"
+            }
+
+        self.fallbacks += 1
+        return None
+
+    def count(self) -> Optional[int]:
+        """getRegisteredCount from the mirror, or None when it is behind"""
+        if not self.is_current():
+            return None
+        db = self.session_factory()
+        try:
+            return db.query(RegistryEntry).count()
+        finally:
+            db.close()
+
+    # Writes
+
+    def record(self, media_hash: str, uploader: str, timestamp: int, metadata: str,
+               block_number: int, transaction_hash: Optional[str] = None, log_index: int = 0):
+        """Add a registration we sent ourselves; the next pass confirms or rolls it back"""
+        if not self.enabled:
+            return
+        db = self.session_factory()
+        try:
+            db.query(RegistryEntry).filter(RegistryEntry.media_hash == media_hash).delete()
+            db.add(RegistryEntry(
+                media_hash=media_hash, uploader=uploader, timestamp=timestamp,
+                metadata_json=metadata, block_number=block_number, log_index=log_index,
+                transaction_hash=transaction_hash
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _block_timestamp(self, block_number: int) -> int:
+        timestamp = self.block_timestamps.get(block_number)
+        if timestamp is None:
+            if len(self.block_timestamps) > 1024:
+                self.block_timestamps.clear()
+            timestamp = self.block_timestamps[block_number] = \
+                self.blockchain.web3.eth.get_block(block_number)["timestamp"]
+        return timestamp
+
+    def _apply_range(self, db: Session, from_block: int, to_block: int, head: int, logs):
+        rows = []
+        for log in logs:
+            args = log["args"]
+            transaction_hash = log.get("transactionHash")
+            rows.append(RegistryEntry(
+                media_hash=args[self.fields["hash"]],
+                uploader=args[self.fields["uploader"]] if self.fields["uploader"] else "",
+                timestamp=args[self.fields["timestamp"]] if self.fields["timestamp"]
+                else self._block_timestamp(log["blockNumber"]),
+                metadata_json=args[self.fields["metadata"]] if self.fields["metadata"] else None,
+                block_number=log["blockNumber"],
+                log_index=log["logIndex"],
+                transaction_hash=transaction_hash.hex() if transaction_hash is not None else None,
+            ))
+
+        # Replace the range (and anything a reorg moved into it) atomically
+        db.query(RegistryEntry).filter(
+            RegistryEntry.block_number.between(from_block, to_block)
+        ).delete(synchronize_session=False)
+        hashes = [row.media_hash for row in rows]
+        for start in range(0, len(hashes), 500):
+            db.query(RegistryEntry).filter(
+                RegistryEntry.media_hash.in_(hashes[start:start + 500])
+            ).delete(synchronize_session=False)
+        db.add_all(rows)
+
+        state = db.get(RegistrySyncState, EVENT_NAME)
+        if state is None:
+            state = RegistrySyncState(name=EVENT_NAME, synced_block=to_block, head_block=head)
+            db.add(state)
+        state.synced_block = to_block
+        state.head_block = head
+        # Freshness only moves when a pass reaches the head, not per backfill chunk
+        if to_block >= head:
+            state.updated_at = datetime.utcnow()
+        db.commit()
+
+    def sync_once(self) -> int:
+        """
+        Run one backfill/tail pass up to the current head
+
+        Returns:
+            Number of events written
+        """
+        if not self.enabled or self.blockchain.contract is None:
+            return 0
+        # Head and logs from the same node, so no range past its tip is read
+        web3, contract = self.blockchain.pinned()
+        event = getattr(contract.events, EVENT_NAME)
+        head = web3.eth.block_number
+
+        db = self.session_factory()
+        try:
+            state = db.get(RegistrySyncState, EVENT_NAME)
+            synced = state.synced_block if state else self.start_block - 1
+            # Re-read the reorg window below the last synced block
+            from_block = max(self.start_block, synced - self.reorg_depth + 1)
+
+            written = 0
+            while from_block <= head and not self.stop_event.is_set():
+                to_block = min(head, from_block + self.chunk_size - 1)
+                try:
+                    logs = event.get_logs(fromBlock=from_block, toBlock=to_block)
+                except Exception as e:
+                    if self.chunk_size == 1 or not is_range_error(e):
+                        raise
+                    # Providers cap eth_getLogs ranges; retry smaller
+                    self.chunk_size = max(1, self.chunk_size // 2)
+                    continue
+                # Recover from a dense stretch of blocks once it is behind us
+                self.chunk_size = min(self.max_chunk_size, self.chunk_size * 2)
+                self._apply_range(db, from_block, to_block, head, logs)
+                written += len(logs)
+                from_block = to_block + 1
+
+            if state is None and from_block > head:
+                # Nothing to scan yet (head below start_block); still mark as current
+                self._apply_range(db, head + 1, head, head, [])
+            return written
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+            self.state_read_at = 0.0
+
+    # Background indexer
+
+    def _take_lock(self) -> bool:
+        if self.lock_path is None or self.lock_file is not None:
+            return True
+        handle = open(self.lock_path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return False
+        self.lock_file = handle
+        return True
+
+    def start(self):
+        """Start the background indexer thread"""
+        if not self.enabled or self.thread:
+            return
+
+        def run():
+            while not self.stop_event.is_set():
+                try:
+                    if self._take_lock():
+                        self.sync_once()
+                        self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"⚠ Registry mirror sync failed: {e}")
+                self.stop_event.wait(self.poll_interval)
+
+        self.thread = threading.Thread(target=run, name="registry-mirror", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state() if self.enabled else None
+        return {
+            "enabled": self.enabled,
+            "indexer": self.lock_file is not None or (self.thread is not None and self.lock_path is None),
+            "current": self.is_current(),
+            "synced_block": state.synced_block if state else None,
+            "head_block": state.head_block if state else None,
+            "chunk_size": self.chunk_size,
+            "local_hits": self.local_hits,
+            "local_misses": self.local_misses,
+            "rpc_fallbacks": self.fallbacks,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,289 @@
+"""
+RPC Pool
+Async JSON-RPC client over several endpoints with pooled keep-alive
+connections, latency-based selection, hedged requests and circuit breaking
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class RPCEndpointError(Exception):
+    """Transport-level failure of one endpoint (timeout, HTTP error, bad JSON)"""
+
+
+class RPCEndpoint:
+    """
+    One JSON-RPC endpoint with its latency history and circuit breaker
+
+    The breaker opens after `failure_threshold` consecutive failures and
+    stays open for `cooldown` seconds. Then a single trial request is let
+    through (half-open): success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, url: str, failure_threshold: int = 5, cooldown: float = 30.0,
+                 window: int = 200):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies: deque = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+        self.requests = 0
+        self.failures = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def available(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN and not self.trial_in_flight
+
+    def score(self) -> float:
+        """Expected latency; untried endpoints rank first so they get measured"""
+        return self.ewma if self.ewma is not None else 0.0
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+        self.state = CLOSED
+
+    def record_abandoned(self, elapsed: float):
+        """A hedge answered first; count the time waited as a latency lower bound"""
+        self.ewma = elapsed if self.ewma is None else 0.8 * self.ewma + 0.2 * max(elapsed, self.ewma)
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def pct(q):
+            return round(1000 * ordered[int(q * (len(ordered) - 1))], 2) if ordered else None
+
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "ewma_ms": round(1000 * self.ewma, 2) if self.ewma is not None else None,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+        }
+
+
+class RPCPool:
+    """
+    JSON-RPC requests spread over several endpoints
+
+    Each request goes to the available endpoint with the lowest latency
+    EWMA. If no answer has arrived after that endpoint's p95 latency
+    (bounded by hedge_min_delay / hedge_max_delay), the same request is
+    also sent to the next endpoint and the first answer wins. Transport
+    failures fail over to the remaining endpoints in order. JSON-RPC
+    error responses (e.g. a revert) are answers, not endpoint failures.
+
+    Connections come from one aiohttp session per event loop with
+    keep-alive pooling.
+    """
+
+    def __init__(self, urls: List[str], timeout: float = 10.0, hedge: bool = True,
+                 hedge_delay: float = 0.5, hedge_min_delay: float = 0.05,
+                 hedge_max_delay: float = 2.0, failure_threshold: int = 5,
+                 cooldown: float = 30.0, pool_size: int = 32):
+        if not urls:
+            raise ValueError("RPCPool needs at least one endpoint")
+        self.endpoints = [RPCEndpoint(url, failure_threshold, cooldown) for url in urls]
+        self.timeout = timeout
+        self.hedge = hedge and len(urls) > 1
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.pool_size = pool_size
+
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.sessions: Dict[int, Any] = {}
+
+    @classmethod
+    def from_env(cls, default_url: str) -> "RPCPool":
+        """
+        Environment:
+            POLYGON_RPC_URLS        Comma-separated endpoints (else POLYGON_RPC_URL)
+            RPC_TIMEOUT             Per-attempt timeout in seconds (default 10)
+            RPC_HEDGE_ENABLED       Hedge slow requests (default true)
+            RPC_HEDGE_DELAY_MS      Hedge delay before p95 is known (default 500)
+            RPC_BREAKER_THRESHOLD   Consecutive failures that open a breaker (default 5)
+            RPC_BREAKER_COOLDOWN    Seconds a breaker stays open (default 30)
+            RPC_POOL_SIZE           Keep-alive connections per endpoint (default 32)
+        """
+        urls = [u.strip() for u in os.getenv("POLYGON_RPC_URLS", "").split(",") if u.strip()]
+        return cls(
+            urls or [default_url],
+            timeout=float(os.getenv("RPC_TIMEOUT", "10")),
+            hedge=os.getenv("RPC_HEDGE_ENABLED", "true").lower() == "true",
+            hedge_delay=float(os.getenv("RPC_HEDGE_DELAY_MS", "500")) / 1000,
+            failure_threshold=int(os.getenv("RPC_BREAKER_THRESHOLD", "5")),
+            cooldown=float(os.getenv("RPC_BREAKER_COOLDOWN", "30")),
+            pool_size=int(os.getenv("RPC_POOL_SIZE", "32")),
+        )
+
+    def ranked(self) -> List[RPCEndpoint]:
+        """Available endpoints, fastest first; all endpoints if every breaker is open"""
+        now = time.monotonic()
+        with self.lock:
+            available = [e for e in self.endpoints if e.available(now)]
+        return sorted(available or self.endpoints, key=RPCEndpoint.score)
+
+    def best_url(self) -> str:
+        return self.ranked()[0].url
+
+    def _session(self):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        session = self.sessions.get(id(loop))
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self.sessions[id(loop)] = session
+        return session
+
+    async def _send(self, endpoint: RPCEndpoint, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            endpoint.requests += 1
+            if endpoint.state == HALF_OPEN:
+                endpoint.trial_in_flight = True
+
+        start = time.monotonic()
+        try:
+            async with self._session().post(endpoint.url, json=payload) as response:
+                if response.status != 200:
+                    raise RPCEndpointError(f"{endpoint.url} returned HTTP {response.status}")
+                body = await response.json(content_type=None)
+            if not isinstance(body, dict) or ("result" not in body and "error" not in body):
+                raise RPCEndpointError(f"{endpoint.url} returned a malformed response")
+        except asyncio.CancelledError:
+            # Lost a hedge race: slow, but not failed
+            with self.lock:
+                endpoint.record_abandoned(time.monotonic() - start)
+            raise
+        except Exception as e:
+            with self.lock:
+                endpoint.record_failure()
+            if isinstance(e, RPCEndpointError):
+                raise
+            raise RPCEndpointError(f"{endpoint.url}: {e!r}") from e
+
+        with self.lock:
+            endpoint.record_success(time.monotonic() - start)
+        return body
+
+    def _hedge_delay(self, endpoint: RPCEndpoint) -> float:
+        p95 = endpoint.p95()
+        delay = self.hedge_delay if p95 is None else p95
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, delay))
+
+    async def request(self, method: str, params: Any) -> Dict[str, Any]:
+        """
+        Send one JSON-RPC request
+
+        Returns:
+            The full JSON-RPC response object (with "result" or "error")
+
+        Raises:
+            RPCEndpointError if every endpoint failed
+        """
+        payload = {"jsonrpc": "2.0", "method": method, "params": params, "id": next(self.ids)}
+        candidates = self.ranked()
+        pending: Dict[asyncio.Task, RPCEndpoint] = {}
+        errors = []
+
+        def launch(hedged: bool = False):
+            endpoint = candidates.pop(0)
+            if hedged:
+                with self.lock:
+                    endpoint.hedges_sent += 1
+            task = asyncio.ensure_future(self._send(endpoint, payload))
+            task.hedged = hedged
+            pending[task] = endpoint
+
+        launch()
+        try:
+            while pending:
+                hedge_after = None
+                if self.hedge and candidates and len(pending) == 1:
+                    hedge_after = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary is slower than its p95: hedge to the next endpoint
+                    launch(hedged=True)
+                    continue
+
+                for task in done:
+                    endpoint = pending.pop(task)
+                    try:
+                        body = task.result()
+                    except RPCEndpointError as e:
+                        errors.append(str(e))
+                        continue
+                    if task.hedged:
+                        with self.lock:
+                            endpoint.hedges_won += 1
+                    return body
+
+                # Failed attempts fail over to the next endpoint
+                if not pending and candidates:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise RPCEndpointError("All RPC endpoints failed: " + "; ".join(errors))
+
+    async def close(self):
+        sessions, self.sessions = list(self.sessions.values()), {}
+        for session in sessions:
+            await session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "hedging": self.hedge,
+                "endpoints": {endpoint.url: endpoint.stats() for endpoint in self.endpoints},
+            }
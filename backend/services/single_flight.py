@@ -0,0 +1,59 @@
+"""
+Single-Flight Coalescing
+Lets concurrent requests for the same key wait on one in-flight computation
+"""
+
+import asyncio
+from typing import Any, Dict
+
+
+class SingleFlight:
+    """
+    Per-key leader election for work that must only run once at a time
+
+    The first caller to join() a key becomes its leader and must call
+    leave() when done. Callers that join while a leader is active wait
+    until it leaves and then re-check for the leader's result (for example
+    a record it saved). Leaders are tracked per asyncio task, so leave()
+    is safe to call unconditionally in a finally block.
+
+    Coalescing is per process. Identical uploads handled by different
+    workers still race on the media_hash unique constraint, which the
+    write-behind flush tolerates.
+    """
+
+    def __init__(self):
+        self.flights: Dict[str, tuple] = {}  # key -> (leader task, done event)
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def join(self, key: str) -> bool:
+        """
+        Become the leader for key, or wait for the current leader
+
+        Returns:
+            False if the caller is now the leader, True after waiting on one
+        """
+        flight = self.flights.get(key)
+        if flight is None:
+            self.flights[key] = (asyncio.current_task(), asyncio.Event())
+            self.leaders += 1
+            return False
+
+        self.coalesced += 1
+        await flight[1].wait()
+        return True
+
+    def leave(self, key: str):
+        """Finish the flight for key if the calling task leads it"""
+        flight = self.flights.get(key)
+        if flight is not None and flight[0] is asyncio.current_task():
+            del self.flights[key]
+            flight[1].set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self.flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
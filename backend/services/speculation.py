@@ -0,0 +1,97 @@
+"""
+Speculative Execution
+Starts work that a concurrent lookup may turn out to make unnecessary
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class Speculation:
+    """
+    Overlaps a lookup with the work needed when the lookup misses
+
+    run() starts `work` at the same time as `lookup`. When the lookup
+    result shows the work is not needed, the work task is cancelled:
+    anything still queued (admission, a CPU lane) never starts, while a
+    model call already running finishes in its lane and its result is
+    dropped. When it is needed, the caller saves the lookup latency that
+    would otherwise have come before the work.
+
+    Metrics:
+        used / discarded   how often the speculative work was kept or thrown away
+        saved_seconds      overlap gained on used runs, min(lookup, work)
+        wasted_seconds     upper bound on work time thrown away (the lookup
+                           latency of discarded runs)
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.used = 0
+        self.discarded = 0
+        self.failed_discarded = 0
+        self.saved_seconds = 0.0
+        self.wasted_seconds = 0.0
+
+    async def run(self, lookup: Awaitable, work: Callable[[], Awaitable],
+                  needed: Callable[[Any], bool]) -> Tuple[Any, Optional[Any]]:
+        """
+        Run lookup and, speculatively, work
+
+        Args:
+            lookup: Awaitable whose result decides whether work is needed
+            work: Zero-argument coroutine function producing the work result
+            needed: Predicate over the lookup result
+
+        Returns:
+            (lookup result, work result or None when not needed)
+        """
+        if not self.enabled:
+            lookup_result = await lookup
+            return lookup_result, (await work() if needed(lookup_result) else None)
+
+        start = time.monotonic()
+        task = asyncio.ensure_future(work())
+        try:
+            lookup_result = await lookup
+        except BaseException:
+            task.cancel()
+            raise
+        lookup_seconds = time.monotonic() - start
+
+        if not needed(lookup_result):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                # The work failed too, but its result was never needed
+                with self.lock:
+                    self.failed_discarded += 1
+            with self.lock:
+                self.discarded += 1
+                self.wasted_seconds += lookup_seconds
+            return lookup_result, None
+
+        result = await task
+        work_seconds = time.monotonic() - start
+        with self.lock:
+            self.used += 1
+            self.saved_seconds += min(lookup_seconds, work_seconds)
+        return lookup_result, result
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "used": self.used,
+                "discarded": self.discarded,
+                "failed_discarded": self.failed_discarded,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "wasted_seconds": round(self.wasted_seconds, 3),
+                "mean_saved_ms": round(1000 * self.saved_seconds / max(self.used, 1), 2),
+            }
@@ -0,0 +1,35 @@
+"""
+Startup Timer
+Per-phase timing breakdown of application startup
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StartupTimer:
+    """Records how long each named startup phase takes"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - start, 3)
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "phases_seconds": dict(self.phases),
+            "total_seconds": round(sum(self.phases.values()), 3),
+        }
+
+    def print_report(self):
+        for name, seconds in self.phases.items():
+            print(f"  ⏱️ {name}: {seconds:.3f}s")
+        print(f"  ⏱️ total: {sum(self.phases.values()):.3f}s")
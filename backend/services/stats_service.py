@@ -0,0 +1,276 @@
+"""
+Statistics Service
+Verification counters shared by all worker processes, for /api/stats
+"""
+
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal, StatsCounter, VerificationRecord
+
+# Fields of a verification record that the counters depend on
+COUNTED_FIELDS = ("file_type", "ai_classification", "blockchain_verified", "created_at")
+
+
+class StatsAggregator:
+    """
+    Aggregates over verification records, kept in the stats_counters table
+
+    Every worker process reads and writes the same rows, so /api/stats
+    does not depend on which worker answers, and the counts survive
+    restarts. Counters change in the transaction that changes the
+    records: the write-behind buffer counts the rows it actually inserts
+    and the updates it applies to them, and endpoints that update stored
+    rows count the difference. The table is seeded once from grouped
+    queries over the verification table and the archive; reads never
+    touch the verification table.
+
+    Keys: total, blockchain_verified, ai_detected, modality:<type>,
+    class:<classification>, modality_class:<type>:<classification>,
+    hour:<YYYY-mm-ddTHH:00>:<label> and day:<YYYY-mm-dd>:<label>, where
+    label is "total" or the classification ("Blockchain" when there is
+    none). Rollups older than their window are pruned.
+    """
+
+    SEEDED_KEY = "seeded"
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 hourly_window_hours: int = 168, daily_window_days: int = 90,
+                 prune_interval: float = 3600.0):
+        self.session_factory = session_factory
+        self.hourly_window = timedelta(hours=hourly_window_hours)
+        self.daily_window = timedelta(days=daily_window_days)
+        self.prune_interval = prune_interval
+        self.lock = threading.Lock()
+        self.pruned_at = 0.0
+
+    @staticmethod
+    def _fields(record) -> Dict[str, Any]:
+        if isinstance(record, Mapping):
+            return {name: record.get(name) for name in COUNTED_FIELDS}
+        return {name: getattr(record, name) for name in COUNTED_FIELDS}
+
+    @staticmethod
+    def keys(values: Mapping[str, Any]) -> List[str]:
+        """Counters a record with these values contributes one to"""
+        file_type = values["file_type"]
+        classification = values.get("ai_classification")
+        keys = ["total", f"modality:{file_type}"]
+        if values.get("blockchain_verified"):
+            keys.append("blockchain_verified")
+        if classification is not None:
+            keys += ["ai_detected", f"class:{classification}", f"modality_class:{file_type}:{classification}"]
+
+        created_at = values.get("created_at") or datetime.utcnow()
+        label = classification or "Blockchain"
+        for prefix in (f"hour:{created_at.strftime('%Y-%m-%dT%H:00')}", f"day:{created_at.strftime('%Y-%m-%d')}"):
+            keys += [f"{prefix}:total", f"{prefix}:{label}"]
+        return keys
+
+    def _apply(self, db: Session, deltas: Counter):
+        """Add deltas to the counters inside the caller's transaction"""
+        rows = [{"key": key, "count": count} for key, count in sorted(deltas.items()) if count]
+        if not rows:
+            return
+        dialect = db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            statement = (sqlite if dialect == "sqlite" else postgresql).insert(StatsCounter)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[StatsCounter.key],
+                set_={"count": StatsCounter.count + statement.excluded.count}
+            ), rows)
+        else:
+            for row in rows:
+                result = db.execute(
+                    update(StatsCounter).where(StatsCounter.key == row["key"])
+                    .values(count=StatsCounter.count + row["count"])
+                )
+                if result.rowcount == 0:
+                    db.add(StatsCounter(**row))
+        self._prune(db)
+
+    def _prune(self, db: Session, force: bool = False):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.pruned_at < self.prune_interval:
+                return
+            self.pruned_at = now
+        utcnow = datetime.utcnow()
+        for prefix, cutoff in (
+            ("hour:", (utcnow - self.hourly_window).strftime("%Y-%m-%dT%H:00")),
+            ("day:", (utcnow - self.daily_window).strftime("%Y-%m-%d")),
+        ):
+            db.query(StatsCounter).filter(
+                StatsCounter.key >= prefix, StatsCounter.key < prefix + cutoff
+            ).delete(synchronize_session=False)
+
+    def record_inserts(self, db: Session, rows: List[Dict[str, Any]]):
+        """Count newly inserted rows (column values), in the inserting transaction"""
+        deltas = Counter()
+        for values in rows:
+            deltas.update(self.keys(self._fields(values)))
+        self._apply(db, deltas)
+
+    def record_change(self, db: Session, before, changes: Dict[str, Any]):
+        """
+        Count an update of a stored row, in the updating transaction
+
+        Args:
+            db: Session running the update
+            before: The row (record or column values) before the update
+            changes: Column values being set
+        """
+        before = self._fields(before)
+        after = dict(before, **{k: v for k, v in changes.items() if k in COUNTED_FIELDS})
+        deltas = Counter(self.keys(after))
+        deltas.subtract(self.keys(before))
+        self._apply(db, deltas)
+
+    def seed(self, db: Session, archive=None) -> bool:
+        """
+        Fill the counters from the database and archive, once
+
+        The first process to start claims the seeding; later starts and
+        other workers keep the persisted counts.
+
+        Returns:
+            True if this call seeded the table
+        """
+        try:
+            db.add(StatsCounter(key=self.SEEDED_KEY, count=1))
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            return False
+
+        deltas = Counter()
+        rows = db.query(
+            VerificationRecord.file_type,
+            VerificationRecord.ai_classification,
+            VerificationRecord.blockchain_verified,
+            func.count()
+        ).group_by(
+            VerificationRecord.file_type,
+            VerificationRecord.ai_classification,
+            VerificationRecord.blockchain_verified
+        ).all()
+        grouped = [((file_type, classification, bool(verified)), count)
+                   for file_type, classification, verified, count in rows]
+        if archive is not None:
+            grouped += list(archive.counts().items())
+        for (file_type, classification, verified), count in grouped:
+            # Totals only; rollups come from the recent rows below
+            for key in self.keys({"file_type": file_type, "ai_classification": classification,
+                                  "blockchain_verified": verified}):
+                if not key.startswith(("hour:", "day:")):
+                    deltas[key] += count
+
+        # Time buckets only need rows inside the rollup windows
+        since = datetime.utcnow() - max(self.hourly_window, self.daily_window)
+        recent = db.query(
+            VerificationRecord.file_type,
+            VerificationRecord.created_at,
+            VerificationRecord.ai_classification
+        ).filter(VerificationRecord.created_at >= since).yield_per(5000)
+        for file_type, created_at, classification in recent:
+            for key in self.keys({"file_type": file_type, "ai_classification": classification,
+                                  "created_at": created_at}):
+                if key.startswith(("hour:", "day:")):
+                    deltas[key] += 1
+
+        self._apply(db, deltas)
+        self._prune(db, force=True)
+        db.commit()
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            counters = dict(db.query(StatsCounter.key, StatsCounter.count))
+        finally:
+            db.close()
+
+        utcnow = datetime.utcnow()
+        hourly_cutoff = (utcnow - self.hourly_window).strftime("%Y-%m-%dT%H:00")
+        daily_cutoff = (utcnow - self.daily_window).strftime("%Y-%m-%d")
+        by_modality, by_classification = {}, {}
+        by_modality_classification: Dict[str, Dict[str, int]] = {}
+        hourly: Dict[str, Dict[str, int]] = {}
+        daily: Dict[str, Dict[str, int]] = {}
+        for key, count in counters.items():
+            if not count:
+                continue
+            kind, _, rest = key.partition(":")
+            if kind == "modality":
+                by_modality[rest] = count
+            elif kind == "class":
+                by_classification[rest] = count
+            elif kind == "modality_class":
+                modality, _, classification = rest.partition(":")
+                by_modality_classification.setdefault(modality, {})[classification] = count
+            elif kind in ("hour", "day"):
+                # The bucket label follows the last colon (hours contain one)
+                bucket, _, label = rest.rpartition(":")
+                if bucket >= (hourly_cutoff if kind == "hour" else daily_cutoff):
+                    (hourly if kind == "hour" else daily).setdefault(bucket, {})[label] = count
+
+        return {
+            "total_verifications": counters.get("total", 0),
+            "blockchain_verified": counters.get("blockchain_verified", 0),
+            "ai_detected": counters.get("ai_detected", 0),
+            "by_modality": by_modality,
+            "by_classification": by_classification,
+            "by_modality_classification": by_modality_classification,
+            "hourly": {key: hourly[key] for key in sorted(hourly)},
+            "daily": {key: daily[key] for key in sorted(daily)},
+        }
+
+
+class CachedValue:
+    """
+    Value produced by a slow call, refreshed by a background thread
+
+    Readers always get the last successful result immediately.
+    """
+
+    def __init__(self, loader: Callable[[], Any], refresh_interval: float = 60.0):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.value: Any = None
+        self.updated_at: Optional[datetime] = None
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def refresh(self):
+        try:
+            self.value = self.loader()
+            self.updated_at = datetime.utcnow()
+        except Exception as e:
+            print(f"⚠ Background refresh failed: {e}")
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name="cached-value", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.refresh()
+            self.stop_event.wait(self.refresh_interval)
+
+    def get(self) -> Dict[str, Any]:
+        value = dict(self.value) if isinstance(self.value, dict) else {"value": self.value}
+        value["cached_at"] = self.updated_at.isoformat() if self.updated_at else None
+        return value
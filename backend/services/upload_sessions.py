@@ -0,0 +1,281 @@
+"""
+Upload Sessions
+Resumable, chunked uploads that are hashed incrementally as chunks arrive
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple, Union
+
+from services.upload_store import StoredUpload, UploadStore
+
+# Request body chunks are gathered into blocks this size per disk write
+WRITE_BLOCK = 1024 * 1024
+
+
+class UploadSessionError(Exception):
+    """Raised for requests that do not fit a session's state"""
+
+    def __init__(self, message: str, status_code: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadSessions:
+    """
+    Resumable uploads in the style of the tus protocol
+
+    A session is created with the final size, then filled by appending
+    chunks at the current offset. A client whose connection drops asks
+    for the offset and continues from there. Chunks must arrive in
+    order, which lets the SHA-256 advance with every chunk instead of
+    re-reading the file at finalize. finalize() moves the assembled file
+    into the UploadStore without copying.
+
+    Layout under `root`: <session id>/data plus <session id>/meta.json.
+    SHA-256 state cannot be serialized, so it lives in the memory of the
+    worker process that received the chunks. A chunk landing on a worker
+    whose state is behind (restart, or consecutive chunks spread over
+    pre-fork workers) is only written; finalize() then hashes just the
+    bytes its worker has not seen. Appends and finalize hold an flock on
+    the data file, so two processes cannot interleave writes to one
+    session. File I/O and hashing run in threads, off the event loop.
+    """
+
+    def __init__(self, root: Union[str, Path], upload_store: UploadStore,
+                 max_size: int = 4 * 1024 ** 3, ttl_seconds: float = 24 * 3600):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.upload_store = upload_store
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self.lock = threading.Lock()
+        self.hashers: Dict[str, tuple] = {}  # session id -> (offset, sha256 state)
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def _dir(self, upload_id: str) -> Path:
+        # Ids are uuid4 hex; anything else cannot name a session
+        if len(upload_id) != 32 or not all(c in "0123456789abcdef" for c in upload_id):
+            raise UploadSessionError("Unknown upload session", 404)
+        return self.root / upload_id
+
+    def _meta(self, upload_id: str) -> Dict:
+        try:
+            return json.loads((self._dir(upload_id) / "meta.json").read_text())
+        except FileNotFoundError:
+            raise UploadSessionError("Unknown or expired upload session", 404)
+
+    def create(self, filename: str, size: int) -> Dict:
+        """
+        Open a new session
+
+        Args:
+            filename: Original file name (its extension selects the decoder)
+            size: Total size in bytes
+
+        Returns:
+            Session status
+        """
+        if size <= 0 or size > self.max_size:
+            raise UploadSessionError(f"Upload size must be between 1 and {self.max_size} bytes", 413)
+
+        upload_id = uuid.uuid4().hex
+        directory = self._dir(upload_id)
+        directory.mkdir()
+        (directory / "data").touch()
+        meta = {"filename": filename, "size": size, "created_at": time.time()}
+        (directory / "meta.json").write_text(json.dumps(meta))
+        return self.status(upload_id)
+
+    def status(self, upload_id: str) -> Dict:
+        meta = self._meta(upload_id)
+        try:
+            offset = (self._dir(upload_id) / "data").stat().st_size
+        except FileNotFoundError:
+            raise UploadSessionError("Unknown or expired upload session", 404)
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "offset": offset,
+            "complete": offset == meta["size"],
+        }
+
+    def _hash_state(self, upload_id: str) -> Tuple[int, "hashlib._Hash"]:
+        """This worker's SHA-256 state for a session and the offset it covers"""
+        with self.lock:
+            cached = self.hashers.get(upload_id)
+        return cached if cached is not None else (0, hashlib.sha256())
+
+    @staticmethod
+    def _open_locked(data_path: Path, mode: str) -> Tuple[BinaryIO, int]:
+        """Open the data file under a non-blocking flock; returns (file, size)"""
+        handle = open(data_path, mode)
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            raise UploadSessionError("Another request for this upload is in progress", 409)
+        return handle, os.fstat(handle.fileno()).st_size
+
+    @staticmethod
+    def _close_locked(handle: BinaryIO):
+        try:
+            handle.flush()
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            handle.close()
+
+    @staticmethod
+    def _write(out: BinaryIO, hasher, data: bytes):
+        out.write(data)
+        if hasher is not None:
+            hasher.update(data)
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict:
+        """
+        Append a chunk at `offset`, which must equal the bytes received so far
+
+        Args:
+            upload_id: Session id
+            offset: Byte offset the client believes it is writing at
+            chunks: Async iterator over the request body
+
+        Returns:
+            Session status after the write
+
+        Raises:
+            UploadSessionError 409 (with the current offset) on an offset mismatch
+        """
+        meta = self._meta(upload_id)
+        data_path = self._dir(upload_id) / "data"
+
+        try:
+            out, current = await asyncio.to_thread(self._open_locked, data_path, "ab")
+        except FileNotFoundError:
+            raise UploadSessionError("Unknown or expired upload session", 404)
+        try:
+            if offset != current:
+                raise UploadSessionError(f"Expected offset {current}", 409, offset=current)
+
+            # Advance the hash only if this worker has seen every byte so far
+            hashed, hasher = self._hash_state(upload_id)
+            if hashed != current:
+                hasher = None
+            written = current
+            block = bytearray()
+            try:
+                async for chunk in chunks:
+                    if written + len(block) + len(chunk) > meta["size"]:
+                        raise UploadSessionError("Chunk extends past the declared upload size", 413)
+                    block += chunk
+                    if len(block) >= WRITE_BLOCK:
+                        await asyncio.to_thread(self._write, out, hasher, bytes(block))
+                        written += len(block)
+                        block.clear()
+            finally:
+                # Keep whatever arrived before a dropped connection
+                if block:
+                    await asyncio.to_thread(self._write, out, hasher, bytes(block))
+                    written += len(block)
+                if hasher is not None and written != current:
+                    with self.lock:
+                        self.hashers[upload_id] = (written, hasher)
+        finally:
+            await asyncio.to_thread(self._close_locked, out)
+
+        return self.status(upload_id)
+
+    def finalize(self, upload_id: str) -> StoredUpload:
+        """
+        Complete a session and move its file into the upload store
+
+        Blocking (reads the bytes this worker has not hashed); call it
+        from a thread.
+
+        Returns:
+            StoredUpload lease for the assembled file
+
+        Raises:
+            UploadSessionError 404 if the session was already finalized
+            or has expired, 409 if it is incomplete or busy
+        """
+        meta = self._meta(upload_id)
+        data_path = self._dir(upload_id) / "data"
+        try:
+            handle, size = self._open_locked(data_path, "rb")
+        except FileNotFoundError:
+            raise UploadSessionError("Upload already finalized or expired", 404)
+        try:
+            if size != meta["size"]:
+                raise UploadSessionError(f"Upload incomplete: {size} of {meta['size']} bytes", 409, offset=size)
+
+            # Catch up on chunks that were written by other workers
+            hashed, hasher = self._hash_state(upload_id)
+            hasher = hasher.copy()
+            handle.seek(hashed)
+            for block in iter(lambda: handle.read(WRITE_BLOCK), b""):
+                hasher.update(block)
+
+            try:
+                stored = self.upload_store.adopt(
+                    data_path, hasher.hexdigest(), Path(meta["filename"]).suffix.lower(), size
+                )
+            except FileNotFoundError:
+                # Finalized concurrently by another worker
+                raise UploadSessionError("Upload already finalized or expired", 404)
+        finally:
+            self._close_locked(handle)
+
+        self.abort(upload_id)
+        return stored
+
+    def abort(self, upload_id: str):
+        directory = self._dir(upload_id)
+        with self.lock:
+            self.hashers.pop(upload_id, None)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def sweep(self) -> int:
+        """Remove sessions with no writes for ttl_seconds"""
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for directory in self.root.iterdir():
+            try:
+                if (directory / "data").stat().st_mtime < cutoff:
+                    self.abort(directory.name)
+                    removed += 1
+            except (FileNotFoundError, UploadSessionError):
+                continue
+        return removed
+
+    def start_sweeper(self, interval: float = 3600.0):
+        if self.thread:
+            return
+
+        def run():
+            while not self.stop_event.wait(interval):
+                self.sweep()
+
+        self.thread = threading.Thread(target=run, name="upload-session-sweeper", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self) -> Dict:
+        return {
+            "open_sessions": sum(1 for _ in self.root.iterdir()),
+            "hash_states": len(self.hashers),
+        }
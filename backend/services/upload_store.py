@@ -0,0 +1,265 @@
+"""
+Upload Store
+Content-addressed staging area for uploaded media
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+
+from services.hash_service import HashService
+
+
+@dataclass
+class StoredUpload:
+    """
+    A leased object in the upload store
+    
+    `path` is a per-lease hard link to the object, so the content stays
+    readable even if another process removes the object meanwhile.
+    """
+    media_hash: str
+    path: Path
+    size: int
+    object_path: Path = None
+
+
+class UploadStore:
+    """
+    Content-addressed store for uploaded files
+
+    Uploads are streamed into a private temp file while being hashed, then
+    renamed atomically to objects/<hash[:2]>/<hash><ext>. Identical content
+    therefore shares one object, and concurrent uploads never see each
+    other's partial writes. Each request holds a reference while it uses
+    the file; once the last reference is released the object is kept for
+    `retention_seconds` (so retries and re-analysis can reuse it) and then
+    removed by sweep().
+    
+    Reference counts are per process. Every lease also gets its own hard
+    link under leases/, which is the path handed to callers, so workers
+    sharing the directory cannot delete a file out from under each other.
+    """
+
+    def __init__(self, root: Union[str, Path], retention_seconds: float = 0.0,
+                 block_size: int = 1024 * 1024):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.tmp_dir = self.root / "tmp"
+        self.leases_dir = self.root / "leases"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.leases_dir.mkdir(parents=True, exist_ok=True)
+        self.retention_seconds = retention_seconds
+        self.block_size = block_size
+
+        self.lock = threading.Lock()
+        self.refcounts: Dict[Path, int] = {}
+        self.released_at: Dict[Path, float] = {}
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+        # Partial uploads from a process that died are never completed
+        stale_before = time.time() - 3600
+        for directory in (self.tmp_dir, self.leases_dir):
+            for stale in directory.iterdir():
+                try:
+                    if stale.stat().st_mtime < stale_before:
+                        stale.unlink()
+                except FileNotFoundError:
+                    pass
+
+        # Objects retained by a previous process start their window now
+        # (their content is checked by verify_retained())
+        now = time.time()
+        self.inherited = list(self.objects_dir.glob("*/*"))
+        for path in self.inherited:
+            self.released_at[path] = now
+
+    def object_path(self, media_hash: str, suffix: str = "") -> Path:
+        return self.objects_dir / media_hash[:2] / f"{media_hash}{suffix.lower()}"
+
+    def ingest(self, source: BinaryIO, suffix: str = "") -> StoredUpload:
+        """
+        Stream a file-like object into the store and take a reference
+
+        Args:
+            source: Readable binary file object
+            suffix: File extension to keep on the stored object (decoders
+                such as ffmpeg use it as a format hint)
+
+        Returns:
+            StoredUpload lease; pass it to release() when done
+        """
+        sha256_hash = hashlib.sha256()
+        buffer = bytearray(self.block_size)
+        view = memoryview(buffer)
+        size = 0
+
+        tmp_path = self.tmp_dir / uuid.uuid4().hex
+        try:
+            with open(tmp_path, "wb") as out:
+                while True:
+                    read = source.readinto(view) if hasattr(source, "readinto") else None
+                    if read is None:
+                        chunk = source.read(self.block_size)
+                        read = len(chunk)
+                        view[:read] = chunk
+                    if not read:
+                        break
+                    sha256_hash.update(view[:read])
+                    out.write(view[:read])
+                    size += read
+
+            return self.adopt(tmp_path, sha256_hash.hexdigest(), suffix, size)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def adopt(self, file_path: Union[str, Path], media_hash: str, suffix: str = "",
+              size: Optional[int] = None) -> StoredUpload:
+        """
+        Move an already hashed file into the store and take a reference
+
+        The file is renamed, not copied, so it must be on the same
+        filesystem as the store. If the content is already stored the
+        file is deleted instead.
+
+        Args:
+            file_path: Complete file whose SHA-256 is media_hash
+            media_hash: Hex SHA-256 of the file
+            suffix: File extension to keep on the stored object
+            size: File size in bytes (read from disk when omitted)
+
+        Returns:
+            StoredUpload lease; pass it to release() when done
+        """
+        file_path = Path(file_path)
+        if size is None:
+            size = file_path.stat().st_size
+        path = self.object_path(media_hash, suffix)
+        path.parent.mkdir(exist_ok=True)
+
+        with self.lock:
+            try:
+                lease = self._acquire(path)
+                # Same content already staged; drop our copy
+                file_path.unlink()
+            except FileNotFoundError:
+                os.replace(file_path, path)
+                lease = self._acquire(path)
+
+        return StoredUpload(media_hash=media_hash, path=lease, size=size, object_path=path)
+
+    def _acquire(self, path: Path) -> Path:
+        """Link a private lease to the object; raises if the object is gone"""
+        lease = self.leases_dir / f"{uuid.uuid4().hex}{path.suffix}"
+        os.link(path, lease)
+        self.refcounts[path] = self.refcounts.get(path, 0) + 1
+        self.released_at.pop(path, None)
+        return lease
+
+    def acquire(self, media_hash: str) -> Optional[StoredUpload]:
+        """
+        Take a reference to an already stored object
+
+        Returns:
+            StoredUpload lease, or None if the object is no longer retained
+        """
+        with self.lock:
+            for path in (self.objects_dir / media_hash[:2]).glob(f"{media_hash}*"):
+                try:
+                    lease = self._acquire(path)
+                except FileNotFoundError:
+                    continue
+                return StoredUpload(media_hash=media_hash, path=lease,
+                                    size=lease.stat().st_size, object_path=path)
+        return None
+
+    def release(self, stored: StoredUpload):
+        """Drop a reference; the object is deleted once unreferenced and expired"""
+        with self.lock:
+            stored.path.unlink(missing_ok=True)
+            path = stored.object_path
+            count = self.refcounts.get(path, 0) - 1
+            if count > 0:
+                self.refcounts[path] = count
+                return
+
+            self.refcounts.pop(path, None)
+            if self.retention_seconds > 0:
+                self.released_at[path] = time.time()
+            else:
+                path.unlink(missing_ok=True)
+
+    def sweep(self) -> int:
+        """Delete unreferenced objects whose retention window has passed"""
+        cutoff = time.time() - self.retention_seconds
+        removed = 0
+        with self.lock:
+            for path, released in list(self.released_at.items()):
+                if released <= cutoff and path not in self.refcounts:
+                    path.unlink(missing_ok=True)
+                    del self.released_at[path]
+                    removed += 1
+        return removed
+
+    def verify_retained(self, max_workers: Optional[int] = None) -> int:
+        """
+        Re-hash objects inherited from a previous process
+
+        Objects are named by their SHA-256, and re-analysis trusts that
+        name, so any whose content no longer matches (a torn or damaged
+        file) is deleted. The files are hashed in parallel.
+
+        Returns:
+            Number of objects removed
+        """
+        inherited, self.inherited = self.inherited, []
+        expected = {path: path.name[:64] for path in inherited if path.exists()}
+        if not expected:
+            return 0
+
+        matches = HashService.verify_files_integrity(expected, max_workers)
+        removed = 0
+        with self.lock:
+            for path in expected:
+                if not matches[str(path)]:
+                    path.unlink(missing_ok=True)
+                    self.released_at.pop(path, None)
+                    removed += 1
+        return removed
+
+    def start_sweeper(self, interval: float = 60.0):
+        """Verify inherited objects, then run sweep() periodically on a background thread"""
+        if self.thread:
+            return
+
+        def run():
+            try:
+                removed = self.verify_retained()
+                if removed:
+                    print(f"⚠ Removed {removed} retained uploads whose content did not match their hash")
+            except OSError as e:
+                print(f"⚠ Could not verify retained uploads: {e}")
+            while not self.stop_event.wait(interval):
+                self.sweep()
+
+        self.thread = threading.Thread(target=run, name="upload-sweeper", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "referenced": len(self.refcounts),
+                "retained": len(self.released_at),
+                "retention_seconds": self.retention_seconds,
+            }
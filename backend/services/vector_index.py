@@ -0,0 +1,358 @@
+"""
+Vector Index Service
+On-disk, memory-mapped embedding index for similarity search over verified media
+"""
+
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Append-only IVF (inverted file) index over L2-normalized embeddings
+
+    Layout inside `directory`:
+        vectors.f32      raw float32 rows, memory-mapped for search
+        keys.txt         one media hash per row, same order as vectors
+        centroids.npy    IVF coarse centroids (once trained)
+        assignments.i32  centroid id per row at the last training run
+        lock             flock() target serializing writers across processes
+        train.lock       flock() target held by the process retraining
+
+    Until `train_threshold` vectors exist the index does exact brute-force
+    search. After that it clusters the vectors with k-means and searches
+    only the `nprobe` closest lists, retraining whenever the index has
+    doubled since the last training run. Rows added after training are
+    assigned to their list in memory. Retraining triggered by add() runs
+    on a background thread (one trainer per directory, through
+    train.lock) and only takes the locks to publish its result.
+
+    Several processes may share one directory: appends and training hold
+    an exclusive file lock, and every operation first picks up rows and
+    centroids written by other processes.
+    """
+
+    def __init__(self, directory: str, dim: int, train_threshold: int = 4096, nprobe: int = 8):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.train_threshold = train_threshold
+        self.nprobe = nprobe
+
+        self.vectors_path = self.directory / "vectors.f32"
+        self.keys_path = self.directory / "keys.txt"
+        self.centroids_path = self.directory / "centroids.npy"
+        self.assignments_path = self.directory / "assignments.i32"
+        self.lock_path = self.directory / "lock"
+        self.train_lock_path = self.directory / "train.lock"
+
+        self.lock = threading.RLock()
+        self.keys: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.keys_offset = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.centroids_mtime = None
+        self.lists: List[List[int]] = []
+        self.assigned = 0
+        self.trained_size = 0
+        self.training: Optional[threading.Thread] = None
+        self._mmap = None
+
+        with self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            self._repair()
+
+    @contextmanager
+    def _file_lock(self, mode):
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Pick up rows and centroids written since the last sync"""
+        if self.keys_path.exists():
+            with open(self.keys_path, "rb") as f:
+                f.seek(self.keys_offset)
+                data = f.read()
+            # Only whole lines; a writer may be mid-append
+            complete = data[:data.rfind(b"\n") + 1]
+            self.keys_offset += len(complete)
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if self.vectors_path.exists() else 0
+            for line in complete.decode().splitlines():
+                # Trim keys written after a partial vector append (crash mid-write)
+                if len(self.keys) >= rows:
+                    break
+                self.positions[line] = len(self.keys)
+                self.keys.append(line)
+
+        if self.centroids_path.exists():
+            mtime = os.path.getmtime(self.centroids_path)
+            if mtime != self.centroids_mtime:
+                self.centroids = np.load(self.centroids_path)
+                self.centroids_mtime = mtime
+                assignments = np.fromfile(self.assignments_path, dtype=np.int32) \
+                    if self.assignments_path.exists() else np.empty(0, dtype=np.int32)
+                assignments = assignments[:len(self.keys)]
+                self.trained_size = len(assignments)
+                self.lists = [[] for _ in range(len(self.centroids))]
+                for row, list_id in enumerate(assignments):
+                    self.lists[list_id].append(row)
+                self.assigned = len(assignments)
+
+        # Rows added after the last training run
+        if self.centroids is not None and self.assigned < len(self.keys):
+            new_rows = self._vectors()[self.assigned:]
+            for offset, list_id in enumerate(np.argmax(new_rows @ self.centroids.T, axis=1)):
+                self.lists[list_id].append(self.assigned + offset)
+            self.assigned = len(self.keys)
+
+    def _repair(self):
+        """
+        Cut a torn append (a writer died mid-write) back to whole rows
+
+        Vectors are written before their key, so a crash can leave a
+        partial vector, a vector without a key or a partial key line;
+        each would shift every later row against its key. Call with the
+        exclusive file lock held, after _sync().
+        """
+        row_bytes = 4 * self.dim
+        vector_bytes = os.path.getsize(self.vectors_path) if self.vectors_path.exists() else 0
+        key_bytes = os.path.getsize(self.keys_path) if self.keys_path.exists() else 0
+        if vector_bytes == len(self.keys) * row_bytes and key_bytes == self.keys_offset:
+            return
+
+        print(f"⚠ Repairing torn append in {self.directory}: keeping {len(self.keys)} rows")
+        if self.vectors_path.exists():
+            os.truncate(self.vectors_path, len(self.keys) * row_bytes)
+        if self.keys_path.exists():
+            os.truncate(self.keys_path, self.keys_offset)
+        self._mmap = None
+
+    def _vectors(self) -> np.ndarray:
+        """Memory-mapped view over all stored vectors"""
+        if self._mmap is None or len(self._mmap) != len(self.keys):
+            if not self.keys:
+                return np.empty((0, self.dim), dtype=np.float32)
+            self._mmap = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.keys), self.dim)
+            )
+        return self._mmap
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.positions
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def add(self, key: str, vector) -> bool:
+        """
+        Append an embedding to the index
+
+        Args:
+            key: Media hash identifying the item
+            vector: Embedding of length `dim`
+
+        Returns:
+            False if the key was already indexed
+        """
+        vector = self._normalize(vector)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected embedding of size {self.dim}, got {vector.shape[0]}")
+
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            if key in self.positions:
+                return False
+            self._repair()
+
+            # Vector first: readers only trust keys that have a full vector
+            with open(self.vectors_path, "ab") as f:
+                f.write(vector.tobytes())
+            with open(self.keys_path, "a") as f:
+                f.write(key + "\n")
+            self._sync()
+
+            if len(self.keys) >= max(self.train_threshold, 2 * self.trained_size) and self.training is None:
+                self.training = threading.Thread(target=self._train_in_background, name="vector-index-train",
+                                                 daemon=True)
+                self.training.start()
+            return True
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the stored (normalized) embedding for a key"""
+        with self.lock:
+            row = self.positions.get(key)
+            if row is None:
+                with self._file_lock(fcntl.LOCK_SH):
+                    self._sync()
+                row = self.positions.get(key)
+            if row is None:
+                return None
+            return np.array(self._vectors()[row])
+
+    def train(self, iterations: int = 10, sample_size: int = 50000):
+        """(Re)build IVF centroids with k-means over a sample of stored vectors"""
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            fitted = self._fit(self._vectors(), iterations, sample_size)
+            if fitted is not None:
+                self._publish(*fitted)
+
+    def _train_in_background(self):
+        """Retrain without holding the locks that add() and search() need"""
+        try:
+            with open(self.train_lock_path, "a") as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return  # another process is retraining
+                try:
+                    with self.lock:
+                        with self._file_lock(fcntl.LOCK_SH):
+                            self._sync()
+                        # Rows are append-only, so this prefix stays valid
+                        vectors = self._vectors()
+                        if len(vectors) < max(self.train_threshold, 2 * self.trained_size):
+                            return  # trained meanwhile by another process
+                    fitted = self._fit(vectors)
+                    if fitted is not None:
+                        with self.lock, self._file_lock(fcntl.LOCK_EX):
+                            self._publish(*fitted)
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+        except Exception as e:
+            print(f"⚠ Vector index training failed for {self.directory}: {e}")
+        finally:
+            with self.lock:
+                self.training = None
+
+    def _fit(self, vectors: np.ndarray, iterations: int = 10,
+             sample_size: int = 50000) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """k-means centroids over a sample of `vectors` and the list of every row"""
+        count = len(vectors)
+        if count == 0:
+            return None
+
+        nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample = vectors[np.sort(rng.choice(count, size=min(count, sample_size), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(nlist):
+                members = sample[labels == list_id]
+                if len(members):
+                    centroids[list_id] = self._normalize(members.mean(axis=0))
+
+        # Assign all rows in blocks to bound memory
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65536):
+            block = vectors[start:start + 65536]
+            assignments[start:start + 65536] = np.argmax(block @ centroids.T, axis=1)
+        return centroids, assignments
+
+    def _publish(self, centroids: np.ndarray, assignments: np.ndarray):
+        """Store a training result; call with the exclusive file lock held"""
+        # Assignments before centroids: readers reload on centroids mtime
+        assignments.tofile(self.assignments_path.with_suffix(".tmp"))
+        os.replace(self.assignments_path.with_suffix(".tmp"), self.assignments_path)
+        with open(self.centroids_path.with_suffix(".tmp"), "wb") as f:
+            np.save(f, centroids)
+        os.replace(self.centroids_path.with_suffix(".tmp"), self.centroids_path)
+        self._sync()
+
+    def search(self, vector, k: int = 10, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Find the k most similar stored embeddings
+
+        Args:
+            vector: Query embedding
+            k: Number of neighbours to return
+            exclude: Key to leave out of the results (e.g. the query item)
+
+        Returns:
+            List of (key, cosine similarity) sorted by similarity
+        """
+        query = self._normalize(vector)
+        with self.lock:
+            with self._file_lock(fcntl.LOCK_SH):
+                self._sync()
+            vectors = self._vectors()
+            if len(vectors) == 0:
+                return []
+
+            if self.centroids is None:
+                rows = np.arange(len(vectors))
+                scores = vectors @ query
+            else:
+                probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+                rows = np.array(sorted(r for p in probes for r in self.lists[p]), dtype=np.int64)
+                if len(rows) == 0:
+                    return []
+                scores = vectors[rows] @ query
+
+            wanted = min(len(rows), k + 1)
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for idx in top:
+                key = self.keys[rows[idx]]
+                if key != exclude:
+                    results.append((key, round(float(scores[idx]), 4)))
+            return results[:k]
+
+
+class VectorIndexRegistry:
+    """One VectorIndex per modality, created lazily on first embedding"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.indexes: Dict[str, VectorIndex] = {}
+        self.lock = threading.Lock()
+
+        # Reopen indexes persisted by earlier runs
+        if self.root.exists():
+            for child in self.root.iterdir():
+                dim_file = child / "dim"
+                if dim_file.exists():
+                    self.indexes[child.name] = VectorIndex(str(child), int(dim_file.read_text()))
+
+    def get(self, modality: str, dim: Optional[int] = None) -> Optional[VectorIndex]:
+        with self.lock:
+            index = self.indexes.get(modality)
+            if index is None:
+                directory = self.root / modality
+                dim_file = directory / "dim"
+                if dim_file.exists():
+                    # Created by another worker process
+                    dim = int(dim_file.read_text())
+                elif dim is None:
+                    return None
+                else:
+                    directory.mkdir(parents=True, exist_ok=True)
+                    dim_file.write_text(str(dim))
+                index = self.indexes[modality] = VectorIndex(str(directory), dim)
+            return index
+
+    def add(self, modality: str, key: str, vector) -> bool:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return self.get(modality, vector.shape[0]).add(key, vector)
+
+    def stats(self) -> Dict[str, int]:
+        return {modality: len(index) for modality, index in self.indexes.items()}
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the backend packages directly and must not touch ./verification.db
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from services.feature_store import FeatureStore, rescore
+
+MEDIA_HASH = "ab" * 32
+
+
+def store_with_image(tmp_path) -> FeatureStore:
+    store = FeatureStore(tmp_path / "features")
+    store.put(MEDIA_HASH, {"image": {
+        "version": "v1",
+        "probabilities": [[0.2, 0.8]],
+        "features": np.ones((1, 4)),
+    }})
+    return store
+
+
+@pytest.mark.parametrize("media_hash", ["../..", "ab/../../x", "AB" * 32, "ab" * 31])
+def test_rejects_hashes_that_are_not_sha256_hex(tmp_path, media_hash):
+    store = store_with_image(tmp_path)
+    with pytest.raises(ValueError):
+        store.get(media_hash)
+
+
+def test_rescore_with_head(tmp_path):
+    tracks = store_with_image(tmp_path).get(MEDIA_HASH)
+    head = (np.array([[0, 0, 0, 0], [1, 1, 1, 1]], dtype=np.float32), np.zeros(2, dtype=np.float32))
+    result = rescore(tracks, 0.5, heads={"image": head})
+    assert result["classification"] == "Fake"
+    assert result["details"]["tracks"]["image"]["head"]
+
+
+def test_rescore_rejects_head_of_wrong_width(tmp_path):
+    tracks = store_with_image(tmp_path).get(MEDIA_HASH)
+    head = (np.zeros((2, 3), dtype=np.float32), np.zeros(2, dtype=np.float32))
+    with pytest.raises(ValueError):
+        rescore(tracks, 0.5, heads={"image": head})
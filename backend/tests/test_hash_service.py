@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+import pytest
+
+from services import hash_service
+from services.hash_service import HashService
+from services.upload_store import UploadStore
+
+
+def write(path, size):
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.mark.parametrize("size", [0, 1, hash_service.BLOCK_SIZE, hash_service.BLOCK_SIZE + 7])
+def test_buffered_digest_matches_hashlib(tmp_path, size):
+    path = tmp_path / "media"
+    expected = write(path, size)
+    assert HashService.generate_file_hash(path) == expected
+
+
+@pytest.mark.parametrize("size", [4096, 4096 * 3 + 5])
+def test_mmap_digest_matches_hashlib(tmp_path, monkeypatch, size):
+    # Shrink the thresholds so the mmap path runs on small files
+    monkeypatch.setattr(hash_service, "MMAP_THRESHOLD", 4096)
+    monkeypatch.setattr(hash_service, "MMAP_CHUNK_SIZE", 1024)
+    path = tmp_path / "media"
+    expected = write(path, size)
+    assert HashService.generate_file_hash(path) == expected
+
+
+def test_parallel_hashes_and_verification(tmp_path):
+    expected = {}
+    for i in range(6):
+        path = tmp_path / f"file{i}"
+        expected[str(path)] = write(path, 1000 * i)
+
+    assert HashService.generate_files_hashes(expected, max_workers=3) == expected
+
+    expected[str(tmp_path / "file2")] = "0" * 64
+    result = HashService.verify_files_integrity(expected, max_workers=3)
+    assert [path for path, ok in result.items() if not ok] == [str(tmp_path / "file2")]
+
+
+def test_upload_store_drops_damaged_retained_objects(tmp_path):
+    store = UploadStore(tmp_path / "uploads", retention_seconds=60)
+    good = tmp_path / "good"
+    good_hash = write(good, 2048)
+    bad = tmp_path / "bad"
+    bad_hash = write(bad, 2048)
+    for path, media_hash in ((good, good_hash), (bad, bad_hash)):
+        store.release(store.adopt(path, media_hash, ".mp4"))
+    # Damage one object on disk, then restart
+    store.object_path(bad_hash, ".mp4").write_bytes(b"truncated")
+
+    restarted = UploadStore(tmp_path / "uploads", retention_seconds=60)
+    assert restarted.verify_retained(max_workers=2) == 1
+    assert restarted.acquire(bad_hash) is None
+    assert restarted.acquire(good_hash) is not None
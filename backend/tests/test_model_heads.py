@@ -0,0 +1,31 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+
+from models.audio_model import AudioDeepfakeModel
+from models.image_model import ImageDeepfakeModel
+
+
+def checkpoint_before_embeddings(model):
+    """state_dict as saved before forward_with_embedding existed: backbone keys only"""
+    return {key: value.clone() for key, value in model.state_dict().items() if key.startswith("model.")}
+
+
+@pytest.mark.parametrize("model_cls, shape", [
+    (ImageDeepfakeModel, (1, 3, 224, 224)),
+    (AudioDeepfakeModel, (1, 1, 128, 128)),
+])
+def test_old_checkpoints_load_strictly_and_head_is_hooked(model_cls, shape):
+    trained = model_cls(pretrained=False).eval()
+    state = checkpoint_before_embeddings(trained)
+    assert set(trained.state_dict()) == set(state)
+
+    model = model_cls(pretrained=False).eval()
+    model.load_state_dict(state)
+
+    x = torch.randn(shape)
+    with torch.no_grad():
+        logits, embedding = model.forward_with_embedding(x)
+        assert torch.equal(logits, trained(x))
+    assert embedding.shape == (1, model.head.in_features)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image
+
+from services.perceptual_hash_service import NearDuplicateIndex, PerceptualHashService
+
+
+def noise_image(seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (64, 64), dtype=np.uint8), mode="L")
+
+
+@pytest.mark.parametrize("level", [0, 128, 255])
+def test_flat_images_are_not_fingerprinted(tmp_path, level):
+    path = tmp_path / "flat.png"
+    Image.new("L", (64, 64), level).save(path)
+    assert PerceptualHashService.generate(str(path), "image") is None
+
+
+def test_near_uniform_image_is_not_fingerprinted():
+    rng = np.random.default_rng(0)
+    pixels = (100 + rng.integers(-2, 3, (64, 64))).astype(np.uint8)
+    assert PerceptualHashService.image_hash(Image.fromarray(pixels, mode="L")) is None
+
+
+def test_textured_images_match_only_themselves():
+    index = NearDuplicateIndex()
+    index.add("image", [PerceptualHashService.image_hash(noise_image(1))], "a" * 64)
+
+    resized = noise_image(1).resize((128, 128))
+    assert index.find("image", [PerceptualHashService.image_hash(resized)])["media_hash"] == "a" * 64
+    assert index.find("image", [PerceptualHashService.image_hash(noise_image(2))]) is None
+
+
+def test_audio_radius_follows_hash_layout():
+    index = NearDuplicateIndex(max_distance_ratio=0.25)
+    assert index.radius("audio") == PerceptualHashService.AUDIO_HASH_BITS // 4
+    assert index.radius("image") == 16
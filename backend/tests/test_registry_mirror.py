@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, RegistrySyncState, create_db_engine
+from services.registry_mirror import EVENT_NAME, RegistryMirror
+
+ABI = [{
+    "type": "event",
+    "name": EVENT_NAME,
+    "inputs": [
+        {"name": "mediaHash", "type": "string", "indexed": False},
+        {"name": "uploader", "type": "address", "indexed": True},
+        {"name": "timestamp", "type": "uint256", "indexed": False},
+        {"name": "metadata", "type": "string", "indexed": False},
+    ],
+}]
+
+
+class StubChain:
+    """Just enough of BlockchainService for the mirror: a head and get_logs"""
+
+    def __init__(self, head: int, registered: dict):
+        self.contract_abi = ABI
+        self.registered = registered  # block -> media hash
+        self.fail_from = None
+        self.web3 = SimpleNamespace(eth=SimpleNamespace(block_number=head))
+        self.contract = SimpleNamespace(events=SimpleNamespace(**{
+            EVENT_NAME: SimpleNamespace(get_logs=self.get_logs)
+        }))
+
+    def pinned(self):
+        return self.web3, self.contract
+
+    def get_logs(self, fromBlock, toBlock):
+        if self.fail_from is not None and toBlock >= self.fail_from:
+            raise RuntimeError("connection reset")
+        return [
+            {"args": {"mediaHash": media_hash, "uploader": "0xabc", "timestamp": 1, "metadata": ""},
+             "blockNumber": block, "logIndex": 0, "transactionHash": None}
+            for block, media_hash in self.registered.items() if fromBlock <= block <= toBlock
+        ]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def test_partial_backfill_is_not_current(session_factory):
+    chain = StubChain(head=1000, registered={10: "a" * 64, 900: "b" * 64})
+    mirror = RegistryMirror(chain, session_factory, chunk_size=100, reorg_depth=10)
+
+    chain.fail_from = 500
+    with pytest.raises(RuntimeError):
+        mirror.sync_once()
+
+    db = session_factory()
+    state = db.get(RegistrySyncState, EVENT_NAME)
+    assert state.synced_block < state.head_block
+    assert state.updated_at is None
+    db.close()
+
+    # The backfilled part answers; a miss beyond it must go to RPC
+    assert mirror.lookup("a" * 64)["exists"]
+    assert not mirror.is_current()
+    assert mirror.lookup("b" * 64) is None
+
+    chain.fail_from = None
+    mirror.sync_once()
+    assert mirror.is_current()
+    assert mirror.lookup("b" * 64)["exists"]
+    assert mirror.lookup("c" * 64)["exists"] is False
+
+
+def test_pass_failing_midway_after_catch_up_falls_behind(session_factory):
+    chain = StubChain(head=100, registered={})
+    mirror = RegistryMirror(chain, session_factory, chunk_size=50, reorg_depth=10)
+    mirror.sync_once()
+    assert mirror.is_current()
+
+    # Far behind a new head; the catch-up chunks keep failing
+    chain.web3.eth.block_number = 5000
+    chain.fail_from = 200
+    with pytest.raises(RuntimeError):
+        mirror.sync_once()
+    assert not mirror.is_current()
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.rpc_pool import OPEN, CLOSED, RPCEndpointError, RPCPool
+
+
+class StubNode:
+    """JSON-RPC stub answering eth_blockNumber after `delay`, or with HTTP `status`"""
+
+    def __init__(self, block: str, delay: float = 0.0, status: int = 200):
+        self.block = block
+        self.delay = delay
+        self.status = status
+        self.hits = 0
+
+    async def handle(self, request):
+        self.hits += 1
+        payload = await request.json()
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status)
+        if payload["method"] == "eth_call":
+            return web.json_response({"jsonrpc": "2.0", "id": payload["id"],
+                                      "error": {"code": 3, "message": "execution reverted"}})
+        return web.json_response({"jsonrpc": "2.0", "id": payload["id"], "result": self.block})
+
+
+async def start(*nodes):
+    servers = []
+    for node in nodes:
+        app = web.Application()
+        app.router.add_post("/", node.handle)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+    return servers, [str(server.make_url("/")) for server in servers]
+
+
+async def stop(pool, servers):
+    await pool.close()
+    for server in servers:
+        await server.close()
+
+
+def test_slow_primary_is_hedged_to_next_endpoint():
+    async def scenario():
+        slow, fast = StubNode("0x1", delay=1.0), StubNode("0x2")
+        servers, urls = await start(slow, fast)
+        # Untried endpoints rank in configured order, so the slow one is primary
+        pool = RPCPool(urls, hedge_delay=0.05, hedge_min_delay=0.01)
+        try:
+            started = time.monotonic()
+            response = await pool.request("eth_blockNumber", [])
+            elapsed = time.monotonic() - started
+            stats = pool.stats()["endpoints"]
+        finally:
+            await stop(pool, servers)
+
+        assert response["result"] == "0x2"
+        assert elapsed < 0.5
+        assert stats[urls[1]]["hedges_sent"] == 1
+        assert stats[urls[1]]["hedges_won"] == 1
+        # Losing the race is not a failure
+        assert stats[urls[0]]["failures"] == 0
+        assert stats[urls[0]]["state"] == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_failing_endpoint_trips_breaker_and_recovers_after_cooldown():
+    async def scenario():
+        broken, healthy = StubNode("0x1", status=502), StubNode("0x2")
+        servers, urls = await start(broken, healthy)
+        pool = RPCPool(urls, hedge=False, failure_threshold=2, cooldown=0.2)
+        try:
+            # Failures fail over, so callers still get answers
+            for _ in range(2):
+                assert (await pool.request("eth_blockNumber", []))["result"] == "0x2"
+            assert pool.endpoints[0].state == OPEN
+
+            # Open breaker: the broken endpoint is skipped entirely
+            await pool.request("eth_blockNumber", [])
+            assert broken.hits == 2
+
+            # After the cooldown one trial request goes through and closes it
+            broken.status = 200
+            await asyncio.sleep(0.25)
+            pool.endpoints[1].ewma = 1.0
+            assert (await pool.request("eth_blockNumber", []))["result"] == "0x1"
+            assert pool.endpoints[0].state == CLOSED
+        finally:
+            await stop(pool, servers)
+
+    asyncio.run(scenario())
+
+
+def test_failed_trial_reopens_breaker():
+    async def scenario():
+        broken, healthy = StubNode("0x1", status=500), StubNode("0x2")
+        servers, urls = await start(broken, healthy)
+        pool = RPCPool(urls, hedge=False, failure_threshold=1, cooldown=0.1)
+        try:
+            await pool.request("eth_blockNumber", [])
+            await asyncio.sleep(0.15)
+            pool.endpoints[1].ewma = 1.0
+            assert (await pool.request("eth_blockNumber", []))["result"] == "0x2"
+            assert pool.endpoints[0].state == OPEN
+            assert broken.hits == 2
+        finally:
+            await stop(pool, servers)
+
+    asyncio.run(scenario())
+
+
+def test_jsonrpc_error_is_an_answer_not_an_endpoint_failure():
+    async def scenario():
+        node = StubNode("0x1")
+        servers, urls = await start(node)
+        pool = RPCPool(urls, failure_threshold=1)
+        try:
+            response = await pool.request("eth_call", [{}, "latest"])
+        finally:
+            await stop(pool, servers)
+        assert response["error"]["message"] == "execution reverted"
+        assert pool.endpoints[0].state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_all_endpoints_failing_raises():
+    async def scenario():
+        nodes = [StubNode("0x1", status=503), StubNode("0x2", status=503)]
+        servers, urls = await start(*nodes)
+        pool = RPCPool(urls, hedge=False)
+        try:
+            with pytest.raises(RPCEndpointError):
+                await pool.request("eth_blockNumber", [])
+        finally:
+            await stop(pool, servers)
+        assert [node.hits for node in nodes] == [1, 1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+from sqlalchemy import inspect, text
+
+from database.database import Base, create_db_engine, upgrade_schema
+
+
+def test_upgrade_adds_perceptual_hash_to_existing_table(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    # verification_records as created before near-duplicate lookup
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE verification_records ("
+            "id INTEGER PRIMARY KEY, media_hash VARCHAR(64) NOT NULL UNIQUE, "
+            "file_name VARCHAR NOT NULL, file_type VARCHAR(16) NOT NULL, "
+            "blockchain_verified BOOLEAN, ai_classification VARCHAR, created_at DATETIME)"
+        ))
+        connection.execute(text(
+            "INSERT INTO verification_records (media_hash, file_name, file_type) "
+            "VALUES ('ab', 'old.jpg', 'image')"
+        ))
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("verification_records")}
+    assert "perceptual_hash" in columns
+    with engine.connect() as connection:
+        row = connection.execute(text(
+            "SELECT file_name, perceptual_hash FROM verification_records WHERE media_hash = 'ab'"
+        )).one()
+    assert tuple(row) == ("old.jpg", None)
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+    assert "perceptual_hash" in {
+        column["name"] for column in inspect(engine).get_columns("verification_records")
+    }
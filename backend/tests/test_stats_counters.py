@@ -0,0 +1,56 @@
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, VerificationRecord, create_db_engine
+from database.write_behind import WriteBehindBuffer
+from services.stats_service import StatsAggregator
+
+
+def make_session_factory(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def test_counters_are_shared_and_skip_duplicates(tmp_path):
+    session_factory = make_session_factory(tmp_path)
+    db = session_factory()
+    db.add(VerificationRecord(media_hash="0" * 64, file_name="a.jpg", file_type="image", ai_classification="Real"))
+    db.commit()
+
+    stats = StatsAggregator(session_factory)
+    assert stats.seed(db)
+    # Another worker starting later keeps the persisted counts
+    other_worker = StatsAggregator(session_factory)
+    assert not other_worker.seed(session_factory())
+
+    buffer = WriteBehindBuffer(session_factory, on_written=stats.record_inserts, on_updated=stats.record_change)
+    buffer.add(media_hash="1" * 64, file_name="b.mp4", file_type="video", ai_classification="Fake")
+    buffer.add(media_hash="0" * 64, file_name="a.jpg", file_type="image", ai_classification="Real")
+    assert buffer.flush() == 1
+
+    snapshot = other_worker.snapshot()
+    assert snapshot["total_verifications"] == 2
+    assert snapshot["by_modality"] == {"image": 1, "video": 1}
+    assert snapshot["by_classification"] == {"Real": 1, "Fake": 1}
+
+
+def test_record_change_moves_counts_between_classes(tmp_path):
+    session_factory = make_session_factory(tmp_path)
+    stats = StatsAggregator(session_factory)
+    buffer = WriteBehindBuffer(session_factory, on_written=stats.record_inserts)
+    buffer.add(media_hash="2" * 64, file_name="c.wav", file_type="audio", ai_classification="Real")
+    buffer.flush()
+
+    db = session_factory()
+    record = db.query(VerificationRecord).one()
+    changes = {"ai_classification": "Fake", "blockchain_verified": True}
+    db.query(VerificationRecord).update(changes, synchronize_session=False)
+    stats.record_change(db, record, changes)
+    db.commit()
+
+    snapshot = stats.snapshot()
+    assert snapshot["total_verifications"] == 1
+    assert snapshot["blockchain_verified"] == 1
+    assert snapshot["by_classification"] == {"Fake": 1}
+    assert snapshot["by_modality_classification"] == {"audio": {"Fake": 1}}
+    assert [bucket.get("Real", 0) for bucket in snapshot["daily"].values()] == [0]
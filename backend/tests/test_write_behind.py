@@ -0,0 +1,43 @@
+import threading
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, VerificationRecord, create_db_engine
+from database.write_behind import WriteBehindBuffer
+
+MEDIA_HASH = "a" * 64
+
+
+def test_failing_late_update_does_not_block_stop_and_is_retried(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'records.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    database_down = True
+
+    def update_while_in_flight(db, rows):
+        # A reanalysis finishing while the batch commits
+        buffer.update(MEDIA_HASH, ai_classification="Fake")
+
+    def on_updated(db, before, changes):
+        if database_down:
+            raise OperationalError("UPDATE", {}, Exception("connection refused"))
+
+    buffer = WriteBehindBuffer(session_factory, on_written=update_while_in_flight, on_updated=on_updated)
+    buffer.add(media_hash=MEDIA_HASH, file_name="a.jpg", file_type="image", ai_classification="Real")
+
+    stopper = threading.Thread(target=buffer.stop)
+    stopper.start()
+    stopper.join(timeout=5)
+    assert not stopper.is_alive()
+
+    # The change stays visible and is applied by the next flush
+    assert buffer.get(MEDIA_HASH).ai_classification == "Fake"
+    database_down = False
+    buffer.on_written = None
+    buffer.flush()
+    assert buffer.get(MEDIA_HASH) is None
+
+    db = session_factory()
+    assert db.query(VerificationRecord).one().ai_classification == "Fake"
+    db.close()